@@ -5,6 +5,7 @@ somef.
 """
 
 import configparser
+import logging
 import sys
 from pathlib import Path
 import click
@@ -14,7 +15,14 @@ from . import configuration
 
 
 @click.group(context_settings={'help_option_names':['-h','--help']})
-def trycli():
+@click.option(
+    "--log_level",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"]),
+    default="INFO",
+    help="Level of the progress messages"
+)
+def trycli(log_level):
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     print("SOMEF Command Line Interface")
 
 @trycli.command(help="Configure credentials")
@@ -36,6 +44,37 @@ def version(debug=False):
 class URLParamType(click.types.StringParamType):
     name = "url"
 
+
+class ShardParamType(click.ParamType):
+    name = "i/N"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
+        from somef.inputs import parse_shard
+        try:
+            return parse_shard(value)
+        except ValueError as error:
+            self.fail(str(error), param, ctx)
+
+
+# a number of releases, or "all"
+class MaxReleasesParamType(click.ParamType):
+    name = "N|all"
+
+    def convert(self, value, param, ctx):
+        if value is None or isinstance(value, int):
+            return value
+        if value == "all":
+            return None
+        try:
+            max_releases = int(value)
+        except ValueError:
+            self.fail(f"{value} is not a number or 'all'", param, ctx)
+        if max_releases < 0:
+            self.fail(f"{value} is negative", param, ctx)
+        return max_releases
+
 @trycli.command(help="Running the Command Line Interface")
 @click.option(
     "--threshold",
@@ -58,11 +97,30 @@ class URLParamType(click.types.StringParamType):
     type=click.Path(exists=True),
     help="Path to the README file source"
 )
+@optgroup.option(
+    "--local_repo",
+    "-l",
+    type=click.Path(exists=True),
+    help="Path to a local checkout (or tarball) of a repository. No GitHub API calls are made"
+)
 @optgroup.option(
     "--in_file",
     "-i",
-    type=click.Path(exists=True),
-    help="A file of newline separated links to GitHub repositories"
+    type=click.Path(exists=True, allow_dash=True),
+    help="""A file of links to GitHub repositories: one per line, a CSV file with a repo_url or url column,
+            or a JSON lines file ("-" reads from the standard input). Each repository is only described once"""
+)
+@optgroup.option(
+    "--doc_dir",
+    "-D",
+    type=click.Path(exists=True, file_okay=False),
+    help="Path to a directory of README files. Every file matching --pattern is described"
+)
+@click.option(
+    "--in_format",
+    type=click.Choice(["text", "csv", "jsonl"]),
+    help="""Format of --in_file: one link per line (text), csv or jsonl. By default it is given by the extension
+            of the file, or for the standard input by its first line"""
 )
 @optgroup.group('Output', cls=RequiredAnyOptionGroup)
 @optgroup.option(
@@ -78,6 +136,19 @@ class URLParamType(click.types.StringParamType):
     help="""Path to the output Knowledge Graph file. If supplied, the output will be a Knowledge Graph,
             in the format given in the --format option"""
 )
+@optgroup.option(
+    "--graph_store",
+    "-s",
+    type=click.Path(),
+    help="""Path to a persistent Knowledge Graph store. Each described repository replaces its own subgraph
+            in the store, and --graph_out (if supplied) is generated from the whole store"""
+)
+@optgroup.option(
+    "--db_out",
+    type=click.Path(dir_okay=False),
+    help="""Path to a SQLite database of the results, with the metadata and the excerpts of every category of each
+            repository. Describing a repository again updates its rows"""
+)
 @click.option(
     "--graph_format",
     "-f",
@@ -85,9 +156,567 @@ class URLParamType(click.types.StringParamType):
     default="turtle",
     help="""If the --graph_out option is given, this is the format that the graph will be stored in"""
 )
+@click.option(
+    "--profile",
+    "-p",
+    type=click.Path(),
+    help="""Path to a JSON report with the time, input sizes and HTTP calls of each stage, per repository"""
+)
+@click.option(
+    "--profile_stage",
+    type=click.Choice(["fetch", "header_analysis", "unmark", "create_excerpts", "run_classifiers", "classify",
+                       "extract_bibtex", "merge", "generate_graph", "save_graph"]),
+    help="""If the --profile option is given, also save cProfile data of this stage next to the report"""
+)
+@click.option(
+    "--profile_memory",
+    is_flag=True,
+    default=False,
+    help="""If the --profile option is given, also record the resident memory and its peak in each stage"""
+)
+@click.option(
+    "--profile_allocations",
+    type=click.IntRange(min=0),
+    default=0,
+    help="""If the --profile option is given, also record the N lines of code that allocated the most memory in
+            each stage (with tracemalloc, which slows down the run)"""
+)
+@click.option(
+    "--metrics_file",
+    type=click.Path(dir_okay=False),
+    help="""Path to an OpenMetrics text file with the counters and histograms of the run (repositories by outcome,
+            GitHub requests, backoffs and quota, cache hits, excerpts classified, stage durations)"""
+)
+@click.option(
+    "--metrics_interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=15,
+    help="""If the --metrics_file option is given, the seconds between updates of the file"""
+)
+@click.option(
+    "--pattern",
+    type=str,
+    help="""If the --doc_dir option is given, the glob pattern of the files to describe (*.md by default, or e.g.
+            **/README.md)"""
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    help="""If the --in_file or --doc_dir option is given, the number of worker processes"""
+)
+@click.option(
+    "--max_repos_per_worker",
+    type=click.IntRange(min=1),
+    help="""If the --in_file or --doc_dir option is given, replace each worker process after describing this many
+            repositories (or documents), so that the memory it used is given back"""
+)
+@click.option(
+    "--max_worker_memory",
+    type=click.FloatRange(min=0, min_open=True),
+    help="""If the --in_file or --doc_dir option is given, replace a worker process when its private memory is
+            over this many MiB after a repository (it is checked between repositories)"""
+)
+@click.option(
+    "--no_cache",
+    is_flag=True,
+    default=False,
+    help="""Do not use the cache of results, process every README again"""
+)
+@click.option(
+    "--cache_dir",
+    type=click.Path(file_okay=False),
+    help="""Directory of the cache of results. Defaults to ~/.somef/cache (or SOMEF_CACHE_DIR)"""
+)
+@click.option(
+    "--classifier_policy",
+    type=click.Choice(["all", "unlabeled"]),
+    default="all",
+    help="""Categories the classifiers are run for. With 'unlabeled', a category is not classified when header
+            analysis already found a section for it (or, for citations, when a BibTeX citation was found)"""
+)
+@click.option(
+    "--time_budget",
+    type=click.FloatRange(min=0),
+    help="""Maximum seconds to spend on each repository. When the budget is exhausted, the remaining stages
+            (releases, header analysis, BibTeX citations, classifiers) are skipped and listed in the 'partial'
+            field of the output"""
+)
+@click.option(
+    "--max_releases",
+    type=MaxReleasesParamType(),
+    default=30,
+    help="""Maximum number of releases to load from GitHub (default 30), or 'all' to load all the releases"""
+)
+@click.option(
+    "--no_release_body",
+    is_flag=True,
+    default=False,
+    help="""Do not keep the description (body) of the releases"""
+)
+@click.option(
+    "--shard",
+    type=ShardParamType(),
+    help="""Only describe the repositories (or documents) of the shard i (counting from 0) of N, assigned by a
+            hash of their url (or path), so that N machines can share a batch. Merge their outputs with somef merge"""
+)
 def describe(**kwargs):
     from somef import cli
-    cli.run_cli(**kwargs)
+    # the options of the batches are not ignored with a single repository or document
+    if kwargs["pattern"] is not None and kwargs["doc_dir"] is None:
+        raise click.UsageError("--pattern can only be used with --doc_dir")
+    if kwargs["in_format"] is not None and kwargs["in_file"] is None:
+        raise click.UsageError("--in_format can only be used with --in_file")
+    if kwargs["in_file"] is None and kwargs["doc_dir"] is None:
+        for option, given in (("--workers", kwargs["workers"] > 1),
+                              ("--max_repos_per_worker", kwargs["max_repos_per_worker"] is not None),
+                              ("--max_worker_memory", kwargs["max_worker_memory"] is not None)):
+            if given:
+                raise click.UsageError(f"{option} can only be used with --in_file or --doc_dir")
+    try:
+        cli.run_cli(**kwargs)
+    except cli.SomefError as error:
+        click.secho(f"Error: {error}", fg="red", err=True)
+        sys.exit(1)
+    click.secho(f"Success", fg="green")
+
+
+@trycli.command(help="Run a local HTTP service that describes repositories, keeping the models in memory")
+@click.option("--host", type=str, default="127.0.0.1", help="Address to listen on")
+@click.option("--port", type=int, default=8000, help="Port to listen on")
+@click.option("--threshold", "-t", type=float, default=0.8, help="Default threshold to classify the text")
+@click.option("--max_concurrency", type=int, default=4, help="Maximum number of requests processed at the same time")
+@click.option(
+    "--queue_timeout",
+    type=float,
+    default=30,
+    help="Seconds a request waits for a free slot before being rejected"
+)
+def serve(**kwargs):
+    from somef import server
+    server.run_server(**kwargs)
+
+
+@trycli.command(help="Merge Knowledge Graph shards, or JSON outputs, into a single Knowledge Graph or output")
+@click.argument("in_files", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(),
+    help="Path to the merged output of the .json and .jsonl files (a .jsonl path is written line by line)"
+)
+@click.option(
+    "--graph_out",
+    "-g",
+    type=click.Path(),
+    help="Path to the merged Knowledge Graph of the graph files"
+)
+@click.option(
+    "--graph_format",
+    "-f",
+    type=click.Choice(["turtle", "json-ld"]),
+    default="turtle",
+    help="""The format that the merged graph will be stored in"""
+)
+def merge(in_files, output, graph_out, graph_format):
+    from somef.data_to_graph import merge_graph_files
+    from somef.outputs import merge_output_files
+    output_files = [in_file for in_file in in_files if in_file.endswith((".json", ".jsonl"))]
+    graph_files = [in_file for in_file in in_files if not in_file.endswith((".json", ".jsonl"))]
+    if len(output_files) > 0 and output is None:
+        raise click.UsageError("--output is required to merge .json and .jsonl files")
+    if len(graph_files) > 0 and graph_out is None:
+        raise click.UsageError("--graph_out is required to merge Knowledge Graph files")
+    if len(output_files) > 0:
+        merge_output_files(output_files, output)
+    if len(graph_files) > 0:
+        merge_graph_files(graph_files, graph_out, graph_format=graph_format)
+    click.secho(f"Success", fg="green")
+
+
+@trycli.group(help="Describe a batch of repositories with a work queue shared by workers on several machines")
+def queue():
+    pass
+
+
+@queue.command(name="add", help="Add the repositories of a file to the queue")
+@click.argument("queue_path", type=click.Path(dir_okay=False))
+@click.option("--in_file", "-i", type=click.Path(exists=True, allow_dash=True), required=True,
+              help="A file of links to GitHub repositories, as in somef describe")
+@click.option("--in_format", type=click.Choice(["text", "csv", "jsonl"]),
+              help="Format of --in_file, as in somef describe")
+def queue_add(queue_path, in_file, in_format):
+    from somef.inputs import InputStats, read_urls, unique_urls
+    from somef.work_queue import WorkQueue
+    work_queue = WorkQueue(queue_path)
+    input_stats = InputStats()
+    added = work_queue.enqueue(unique_urls(read_urls(in_file, in_format), input_stats))
+    work_queue.close()
+    click.echo(f"{added} repositories added ({input_stats.duplicates} duplicates, "
+               f"{input_stats.unique - added} already in the queue)")
+
+
+@queue.command(name="work", help="Describe the repositories of the queue until it is finished")
+@click.argument("queue_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--threshold", "-t", type=float, default=0.8, help="Threshold to classify the text")
+@click.option("--workers", "-w", type=click.IntRange(min=1), default=1, help="Number of worker processes")
+@click.option("--worker_id", type=str, help="Name of the worker in the queue (by default, host name and process id)")
+@click.option("--batch_size", type=click.IntRange(min=1), default=1, help="Repositories leased at a time")
+@click.option("--lease_time", type=click.FloatRange(min=1), default=300,
+              help="Seconds a lease lasts without a heartbeat before the repositories are leased to another worker")
+@click.option("--max_attempts", type=click.IntRange(min=1), default=3,
+              help="Maximum number of times a repository is leased")
+@click.option("--time_budget", type=click.FloatRange(min=0), help="Maximum time, in seconds, for each repository")
+@click.option("--max_releases", type=MaxReleasesParamType(), default=30,
+              help="Maximum number of releases to load from GitHub (default 30), or 'all'")
+def queue_work(queue_path, threshold, workers, worker_id, batch_size, lease_time, max_attempts, time_budget,
+               max_releases):
+    from somef import cli
+    from somef.describer import Describer
+    from somef.work_queue import run_workers
+    try:
+        describer = Describer(threshold=threshold, time_budget=time_budget, max_releases=max_releases)
+    except cli.SomefError as error:
+        click.secho(f"Error: {error}", fg="red", err=True)
+        sys.exit(1)
+    crashed = run_workers(queue_path, describer, workers, worker=worker_id, batch_size=batch_size,
+                          lease_time=lease_time, max_attempts=max_attempts)
+    if crashed > 0:
+        click.secho(f"Error: {crashed} of {workers} worker processes crashed", fg="red", err=True)
+        sys.exit(1)
+    click.secho(f"Success", fg="green")
+
+
+@queue.command(name="status", help="Show the number of repositories in each state, and the failures")
+@click.argument("queue_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--requeue", is_flag=True, default=False,
+              help="Put the repositories with expired leases and the failed ones back in the queue")
+def queue_status(queue_path, requeue):
+    from somef.work_queue import WorkQueue
+    work_queue = WorkQueue(queue_path)
+    if requeue:
+        click.echo(f"{work_queue.requeue(failed_sources=True)} repositories put back in the queue")
+    for state, count in work_queue.stats().items():
+        click.echo(f"{state}: {count}")
+    for source, error in work_queue.failures():
+        click.echo(f"  {source}: {error}")
+    work_queue.close()
+
+
+@queue.command(name="export", help="Save the results of the queue")
+@click.argument("queue_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--output", "-o", type=click.Path(), help="Path to the output JSON file (.jsonl for JSON lines)")
+@click.option("--graph_out", "-g", type=click.Path(), help="Path to the output Knowledge Graph file")
+@click.option(
+    "--graph_format",
+    "-f",
+    type=click.Choice(["turtle", "json-ld"]),
+    default="turtle",
+    help="""The format that the graph will be stored in"""
+)
+@click.option("--db_out", type=click.Path(dir_okay=False), help="Path to a SQLite database of the results")
+def queue_export(queue_path, output, graph_out, graph_format, db_out):
+    import json
+    from somef.data_to_graph import DataGraph
+    from somef.work_queue import WorkQueue
+    work_queue = WorkQueue(queue_path)
+    if output is not None:
+        with open(output, "w") as fh:
+            if output.endswith(".jsonl"):
+                for _, result in work_queue.results():
+                    fh.write(json.dumps(result) + "\n")
+            else:
+                json.dump([result for _, result in work_queue.results()], fh)
+    if graph_out is not None:
+        # repositories with stages skipped because of their time budget are left out of the Knowledge Graph
+        data_graph = DataGraph.build_shard(result for _, result in work_queue.results() if "partial" not in result)
+        data_graph.serialize(graph_out, graph_format=graph_format)
+    if db_out is not None:
+        from somef.result_store import ResultStore
+        result_store = ResultStore(db_out)
+        for source, result in work_queue.results():
+            result_store.upsert(source, result)
+        result_store.close()
+    work_queue.close()
+    click.secho(f"Success", fg="green")
+
+
+@trycli.group(help="Local stand-in of the GitHub API, to test the fetch code without calling api.github.com")
+def mock():
+    pass
+
+
+## Function adds the options of the stand-in: fixtures and injected faults
+def mock_options(command):
+    options = [
+        click.option("--fixtures", "fixture_dir", type=click.Path(exists=True, file_okay=False),
+                     help="Directory of the fixtures saved by somef mock record"),
+        click.option("--no_synthetic", "synthetic", is_flag=True, default=True, flag_value=False,
+                     help="Answer Not Found for the repositories without a fixture, instead of making one up"),
+        click.option("--latency", type=click.FloatRange(min=0), default=0.0, help="Seconds added to every response"),
+        click.option("--jitter", type=click.FloatRange(min=0), default=0.0,
+                     help="Maximum random seconds added to the latency"),
+        click.option("--rate_limit_rate", type=click.FloatRange(0, 1), default=0.0,
+                     help="Fraction of the requests answered with a rate limit error"),
+        click.option("--error_rate", type=click.FloatRange(0, 1), default=0.0,
+                     help="Fraction of the requests answered with a 502 HTML page"),
+        click.option("--retry_after", type=click.FloatRange(min=0),
+                     help="Retry-After header of the faulty responses, in seconds (none by default)"),
+        click.option("--seed", type=int, default=0, help="Seed of the injected faults"),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+@mock.command(name="serve", help="Run the stand-in. Point somef to it with SOMEF_GITHUB_API_URL=http://host:port")
+@click.option("--host", type=str, default="127.0.0.1", help="Address to listen on")
+@click.option("--port", type=int, default=8001, help="Port to listen on")
+@mock_options
+def mock_serve(**kwargs):
+    from somef.github_mock import run_mock_server
+    run_mock_server(**kwargs)
+
+
+@mock.command(name="record", help="Save the responses of the GitHub API for some repositories as fixtures")
+@click.option("--in_file", "-i", type=click.Path(exists=True, allow_dash=True), required=True,
+              help="A file of links to GitHub repositories, as in somef describe")
+@click.option("--fixtures", "fixture_dir", type=click.Path(file_okay=False), required=True,
+              help="Directory where the fixtures are saved")
+@click.option("--in_format", type=click.Choice(["text", "csv", "jsonl"]),
+              help="Format of --in_file, as in somef describe")
+def mock_record(in_file, fixture_dir, in_format):
+    from somef import cli
+    from somef.github_mock import record_fixtures
+    from somef.inputs import read_urls, unique_urls
+    header = {}
+    try:
+        file_paths = cli.load_file_paths()
+        if 'Authorization' in file_paths:
+            header['Authorization'] = file_paths['Authorization']
+    except cli.ConfigurationError:
+        pass
+    recorded = record_fixtures(unique_urls(read_urls(in_file, in_format)), fixture_dir, header)
+    click.secho(f"{recorded} repositories recorded", fg="green")
+
+
+@mock.command(name="load_test", help="Load the metadata of many repositories with the fetch code of somef, "
+                                     "and report the requests/s, latency and backoffs")
+@click.option("--in_file", "-i", type=click.Path(exists=True, allow_dash=True),
+              help="A file of links to GitHub repositories (by default, synthetic ones)")
+@click.option("--in_format", type=click.Choice(["text", "csv", "jsonl"]),
+              help="Format of --in_file, as in somef describe")
+@click.option("--repositories", "-n", type=click.IntRange(min=1), default=200,
+              help="Number of synthetic repositories, without --in_file")
+@click.option("--workers", "-w", type=click.IntRange(min=1), default=8, help="Number of threads fetching")
+@click.option("--api_url", type=str,
+              help="Base url of a running stand-in (somef mock serve). By default one is started for the test")
+@click.option("--output", "-o", type=click.Path(), help="Path to the JSON report")
+@mock_options
+def mock_load_test(in_file, in_format, repositories, workers, api_url, output, **kwargs):
+    import json
+    from somef.github_mock import format_load_test, run_load_test
+    from somef.inputs import read_urls, unique_urls
+    if in_file is not None:
+        repo_urls = list(unique_urls(read_urls(in_file, in_format)))
+    else:
+        repo_urls = [f"https://github.com/somef-load-test/repository-{index}" for index in range(repositories)]
+    report = run_load_test(repo_urls, workers=workers, api_url=api_url, **kwargs)
+    for line in format_load_test(report):
+        click.echo(line)
+    if output is not None:
+        with open(output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+@trycli.command(help="Search the excerpts of a database of results (--db_out)")
+@click.argument("db_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("query")
+@click.option("--category", "-c", help="Category of the excerpts to search (installation, citation...)")
+@click.option("--limit", "-n", type=click.IntRange(min=1), default=20, help="Maximum number of hits")
+@click.option("--raw", is_flag=True, default=False,
+              help="Read the query as an FTS5 query (OR, NOT, \"phrases\", prefix*) instead of words that must all match")
+def search(db_path, query, category, limit, raw):
+    import sqlite3
+    import time
+    from somef.result_store import ResultStore
+    result_store = ResultStore(db_path)
+    start = time.perf_counter()
+    try:
+        hits = result_store.search(query, category, limit, raw)
+    except (RuntimeError, sqlite3.OperationalError) as error:
+        click.secho(f"Error: {error}", fg="red", err=True)
+        sys.exit(1)
+    finally:
+        result_store.close()
+    elapsed = (time.perf_counter() - start) * 1000
+    for source, hit_category, excerpt, confidence, score in hits:
+        excerpt = " ".join(excerpt.split())
+        click.echo(f"{-score:8.3f}  {source}  [{hit_category} {confidence:.2f}]  "
+                   f"{excerpt[:120] + '...' if len(excerpt) > 120 else excerpt}")
+    click.echo(f"{len(hits)} hits in {elapsed:.1f} ms", err=True)
+
+
+@trycli.command(help="Train the classifiers of the categories and save them with their cross validation metrics")
+@click.option(
+    "--corpus",
+    "-c",
+    type=click.Path(exists=True, file_okay=False),
+    required=True,
+    help="Directory with the description, installation, invocation, citation and none CSV files"
+)
+@click.option("--output_dir", "-o", type=click.Path(file_okay=False), required=True,
+              help="Directory where the models (<category>.sk) and metrics.json are saved")
+@click.option(
+    "--category",
+    "categories",
+    type=click.Choice(["description", "installation", "invocation", "citation"]),
+    multiple=True,
+    help="Category to train (can be repeated). By default all of them are trained"
+)
+@click.option("--workers", "-w", type=click.IntRange(min=1), default=1, help="Number of worker processes")
+@click.option("--folds", type=click.IntRange(min=2), default=5, help="Number of cross validation folds")
+@click.option("--negative_ratio", type=float, default=0.25,
+              help="Negative samples taken from each other file, relative to the positive samples")
+@click.option(
+    "--streaming",
+    is_flag=True,
+    default=False,
+    help="""Read the corpus in chunks and train a hashing vectorizer with an incremental classifier,
+            for corpora that do not fit in memory"""
+)
+@click.option("--n_features", type=click.IntRange(min=1), default=2 ** 20,
+              help="Number of features of the hashing vectorizer (with --streaming)")
+@click.option("--chunk_size", type=click.IntRange(min=1), default=10000,
+              help="Rows read from each file at a time (with --streaming)")
+@click.option("--epochs", type=click.IntRange(min=1), default=5, help="Passes over the corpus (with --streaming)")
+@click.option("--seed", type=int, default=0, help="Seed of the negative sampling")
+def train(corpus, categories, **kwargs):
+    from somef import training
+    metrics = training.train(corpus, categories=categories or training.training_categories, **kwargs)
+    for category, category_metrics in metrics["categories"].items():
+        f1 = category_metrics["cross_validation"].get("f1", {}).get("mean", float("nan"))
+        click.echo(f"{category}: f1 {f1:.3f}, fit {category_metrics['fit_time']:.2f} s -> {category_metrics['model']}")
+    click.secho(f"Success", fg="green")
+
+
+@trycli.command(help="Score candidate models on the training corpus, with their load time, latency and memory")
+@click.option(
+    "--models",
+    "-m",
+    type=click.Path(exists=True, file_okay=False),
+    required=True,
+    help="Directory with the candidate models (<category>.sk, or cit*.p, des*.p, ins*.p, inv*.p)"
+)
+@click.option(
+    "--corpus",
+    "-c",
+    type=click.Path(exists=True, file_okay=False),
+    required=True,
+    help="Directory with the description, installation, invocation, citation and none CSV files"
+)
+@click.option(
+    "--category",
+    "categories",
+    type=click.Choice(["description", "installation", "invocation", "citation"]),
+    multiple=True,
+    help="Category to evaluate (can be repeated). By default all of them are evaluated"
+)
+@click.option("--workers", "-w", type=click.IntRange(min=1), default=1, help="Number of worker processes")
+@click.option("--threshold", "-t", type=float, default=0.8, help="Threshold to classify the excerpts")
+@click.option("--latency_samples", type=click.IntRange(min=1), default=200,
+              help="Number of excerpts classified one by one to measure the latency")
+@click.option("--latency_budget", type=float, help="Maximum median latency per excerpt, in milliseconds, "
+                                                   "of the recommended models")
+@click.option("--output", "-o", type=click.Path(), help="Path to the JSON evaluation report")
+def evaluate(models, corpus, categories, workers, threshold, latency_samples, latency_budget, output):
+    from somef import evaluation, training
+    records = evaluation.evaluate(models, corpus, categories=categories or training.training_categories,
+                                  workers=workers, threshold=threshold, latency_samples=latency_samples)
+    recommended = evaluation.recommend(records, latency_budget / 1000 if latency_budget is not None else None)
+    evaluation.print_evaluation(records, recommended)
+    if output is not None:
+        evaluation.save_evaluation(records, recommended, output)
+    for category, record in recommended.items():
+        click.echo(f"Recommended {category} model: {record['model']}")
+    click.secho(f"Success", fg="green")
+
+
+@trycli.command(help="Prune the vocabulary of a classifier and compare the slimmed model with the original one")
+@click.option("--model", "-m", type=click.Path(exists=True, dir_okay=False), required=True,
+              help="Path to the model (a vectorizer + classifier pipeline)")
+@click.option(
+    "--corpus",
+    "-c",
+    type=click.Path(exists=True, file_okay=False),
+    required=True,
+    help="Directory with the description, installation, invocation, citation and none CSV files"
+)
+@click.option(
+    "--category",
+    type=click.Choice(["description", "installation", "invocation", "citation"]),
+    help="Category of the model. By default it is taken from the name of the file"
+)
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="Path to the slimmed model")
+@click.option("--keep", type=click.FloatRange(min=0, min_open=True),
+              help="Features with the highest weight to keep: a fraction if below 1, a number otherwise")
+@click.option("--min_weight", type=float, default=0.0, help="Minimum absolute weight of the features kept")
+@click.option("--min_df", type=click.IntRange(min=1), default=1,
+              help="Minimum number of excerpts of the corpus the features kept appear in")
+@click.option("--refit", is_flag=True, default=False, help="Train the model again with the features kept")
+@click.option("--threshold", "-t", type=float, default=0.8, help="Threshold to classify the excerpts")
+def prune(model, corpus, category, **kwargs):
+    from somef import evaluation, pruning
+    if category is None:
+        category = evaluation.model_category(model)
+        if category is None:
+            raise click.UsageError("The category cannot be found from the name of the model, use --category")
+    report = pruning.prune(model, corpus, category, **kwargs)
+    pruning.print_pruning(report)
+    click.secho(f"Success", fg="green")
+
+
+@trycli.command(help="Benchmark the offline pipeline over a corpus of README files")
+@click.option(
+    "--corpus",
+    "-c",
+    type=click.Path(exists=True, file_okay=False),
+    required=True,
+    help="Directory with the README files, e.g. experiments/training_corpus/repos"
+)
+@click.option(
+    "--scale",
+    "-s",
+    type=int,
+    multiple=True,
+    default=[1],
+    help="Make every README this many times bigger. Can be given several times"
+)
+@click.option("--threshold", "-t", type=float, default=0.8, help="Threshold to classify the text")
+@click.option("--repeat", type=int, default=1, help="Number of passes over the corpus")
+@click.option("--output", "-o", type=click.Path(), help="Path to the JSON benchmark report")
+@click.option("--baseline", "-b", type=click.Path(exists=True), help="Path to a previous benchmark report")
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.2,
+    help="Allowed relative growth of the median latency of a stage before failing against the baseline"
+)
+def benchmark(corpus, scale, threshold, repeat, output, baseline, tolerance):
+    from somef import benchmark
+    report = benchmark.run_benchmark(corpus, scales=scale, threshold=threshold, repeat=repeat)
+    benchmark.print_report(report)
+    if output is not None:
+        benchmark.save_report(report, output)
+    if baseline is not None:
+        regressions = benchmark.compare_with_baseline(report, benchmark.load_report(baseline), tolerance)
+        for regression in regressions:
+            click.secho(f"Regression in {regression['stage']} (scale {regression['scale']}): "
+                        f"{regression['p50'] * 1000:.2f} ms vs {regression['baseline_p50'] * 1000:.2f} ms",
+                        fg="red")
+        if len(regressions) > 0:
+            sys.exit(1)
     click.secho(f"Success", fg="green")
 
 
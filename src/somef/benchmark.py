@@ -0,0 +1,179 @@
+import glob
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from somef import cli
+from somef.data_to_graph import DataGraph
+from somef.profiling import Profiler
+
+logger = logging.getLogger(__name__)
+
+benchmark_stages = ["header_analysis", "unmark", "create_excerpts", "run_classifiers", "classify",
+                    "extract_bibtex", "merge", "generate_graph"]
+
+
+## Function reads the READMEs of the corpus, sorted by name so that every run sees the same order
+## Returns a list of (name, text) pairs
+def load_corpus(corpus_dir, pattern="*.md"):
+    corpus = []
+    for file_name in sorted(glob.glob(os.path.join(corpus_dir, pattern))):
+        with open(file_name, "r", encoding="utf-8", errors="replace") as fh:
+            corpus.append((os.path.basename(file_name), fh.read()))
+    return corpus
+
+
+## Function creates a synthetic README that is `scale` times bigger than the original one
+def scale_text(text, scale):
+    return "\n\n".join([text] * scale)
+
+
+## Function runs the offline part of the describe pipeline (no GitHub API calls) on one README
+def run_pipeline(name, text, threshold, file_paths, profiler):
+    profiler.start_repo(name)
+    try:
+        with profiler.stage("header_analysis") as stage:
+            header_predictions, string_list = cli.extract_categories_using_header(text)
+            stage["chars"] = len(text)
+        with profiler.stage("unmark"):
+            plain_text = cli.unmark(text)
+        with profiler.stage("create_excerpts") as stage:
+            excerpts = cli.create_excerpts(string_list)
+            stage["excerpts"] = len(excerpts)
+        with profiler.stage("run_classifiers"):
+            score_matrix = cli.run_classifiers(excerpts, file_paths)
+        with profiler.stage("classify"):
+            predictions = cli.classify(score_matrix, threshold)
+        with profiler.stage("extract_bibtex"):
+            citations = cli.extract_bibtex(plain_text)
+        with profiler.stage("merge"):
+            predictions = cli.merge(header_predictions, predictions, citations)
+        with profiler.stage("generate_graph"):
+            repo_data = cli.format_output({"fullName": f"benchmark/{name}"}, predictions)
+            DataGraph().add_somef_data(repo_data)
+    finally:
+        profiler.end_repo()
+
+
+## Function aggregates the per-README records of the profiler, and the peak memory of each stage from the
+## records of memory_profiler if it is given
+## Returns latency percentiles, throughput and peak memory of every stage
+def summarize(profiler, memory_profiler=None):
+    records = stage_records(profiler)
+    memory_records = stage_records(memory_profiler) if memory_profiler is not None else records
+
+    summary = {}
+    for stage in benchmark_stages:
+        if stage not in records:
+            continue
+        latencies = np.array([record["wall_time"] for record in records[stage]])
+        total_time = float(latencies.sum())
+        summary[stage] = {
+            "count": len(latencies),
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "throughput": len(latencies) / total_time if total_time > 0 else None,
+            "peak_memory": max(record.get("peak_memory", 0) for record in memory_records.get(stage, [{}])),
+        }
+    return summary
+
+
+## Function groups the records of the profiler by stage
+def stage_records(profiler):
+    records = {}
+    for repository in profiler.repositories:
+        for record in repository["stages"]:
+            records.setdefault(record["stage"], []).append(record)
+    return records
+
+
+## Function runs the pipeline on every README of the corpus, made scale times bigger, repeat times
+def run_corpus(corpus, scale, threshold, file_paths, profiler, repeat=1):
+    # the pipeline logs its progress, which would dominate the measurements
+    logging.disable(logging.INFO)
+    try:
+        for _ in range(repeat):
+            for name, text in corpus:
+                run_pipeline(name, scale_text(text, scale), threshold, file_paths, profiler)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+## Function runs the benchmark over the corpus, once for each scale factor. The peak memory is measured in a
+## separate pass over the corpus, because tracing the allocations slows down the timed runs
+## Returns the report, with a summary of every stage for each scale
+def run_benchmark(corpus_dir, scales=(1,), threshold=0.8, repeat=1, pattern="*.md", file_paths=None):
+    corpus = load_corpus(corpus_dir, pattern)
+    if len(corpus) == 0:
+        raise ValueError(f"No files matching {pattern} in {corpus_dir}")
+    if file_paths is None:
+        file_paths = cli.load_configuration()
+
+    report = {"corpus": corpus_dir, "documents": len(corpus), "threshold": threshold, "repeat": repeat,
+              "scales": {}}
+    for scale in scales:
+        logger.info(f"Running benchmark over {len(corpus)} documents with scale {scale}")
+        profiler = Profiler()
+        start = time.perf_counter()
+        run_corpus(corpus, scale, threshold, file_paths, profiler, repeat)
+        total_time = time.perf_counter() - start
+
+        logger.info(f"Measuring the peak memory of every stage with scale {scale}")
+        tracing = tracemalloc.is_tracing()
+        memory_profiler = Profiler(trace_memory=True)
+        try:
+            run_corpus(corpus, scale, threshold, file_paths, memory_profiler)
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        report["scales"][str(scale)] = {
+            "total_time": total_time,
+            "documents_per_second": len(corpus) * repeat / total_time,
+            "stages": summarize(profiler, memory_profiler),
+        }
+    return report
+
+
+## Function compares the report with a baseline report
+## Returns the list of stages whose median latency grew more than the tolerance
+def compare_with_baseline(report, baseline, tolerance=0.2):
+    regressions = []
+    for scale, scale_report in report["scales"].items():
+        if scale not in baseline["scales"]:
+            continue
+        baseline_stages = baseline["scales"][scale]["stages"]
+        for stage, summary in scale_report["stages"].items():
+            if stage not in baseline_stages:
+                continue
+            baseline_p50 = baseline_stages[stage]["p50"]
+            if summary["p50"] > baseline_p50 * (1 + tolerance):
+                regressions.append({"scale": scale, "stage": stage, "p50": summary["p50"],
+                                    "baseline_p50": baseline_p50})
+    return regressions
+
+
+def print_report(report):
+    for scale, scale_report in report["scales"].items():
+        print(f"Scale {scale}: {scale_report['documents_per_second']:.2f} documents/s")
+        print(f"  {'stage':<16}{'p50 (ms)':>10}{'p90 (ms)':>10}{'p99 (ms)':>10}{'docs/s':>10}{'peak (KiB)':>12}")
+        for stage, summary in scale_report["stages"].items():
+            throughput = summary["throughput"] if summary["throughput"] is not None else float("inf")
+            print(f"  {stage:<16}{summary['p50'] * 1000:>10.2f}{summary['p90'] * 1000:>10.2f}"
+                  f"{summary['p99'] * 1000:>10.2f}{throughput:>10.1f}{summary['peak_memory'] / 1024:>12.1f}")
+
+
+def save_report(report, outfile):
+    logger.info("Saving benchmark report to %s", outfile)
+    with open(outfile, "w") as output:
+        json.dump(report, output, indent=2)
+
+
+def load_report(infile):
+    with open(infile, "r") as fh:
+        return json.load(fh)
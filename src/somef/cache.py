@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import somef
+
+__DEFAULT_SOMEF_CACHE_DIR__ = "~/.somef/cache"
+
+# content hash of each model file, by (path, size, modification time), so that
+# every model is only hashed once per process
+model_fingerprints = {}
+
+
+def default_cache_dir():
+    return str(Path(os.getenv("SOMEF_CACHE_DIR", __DEFAULT_SOMEF_CACHE_DIR__)).expanduser())
+
+
+## Function hashes the content of a model file
+def model_fingerprint(file_name):
+    stat = os.stat(file_name)
+    key = (os.path.abspath(file_name), stat.st_size, stat.st_mtime)
+    if key not in model_fingerprints:
+        digest = hashlib.sha256()
+        with open(file_name, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+        model_fingerprints[key] = digest.hexdigest()
+    return model_fingerprints[key]
+
+
+# persistent cache of the predictions (the result of merge) of a README. Entries are keyed by the
+# content of the README, the threshold, the models and the version of somef, so a README only has
+# to be processed again when one of them changes. The least recently used entries are evicted
+# when there are more than max_entries.
+# The hits and misses are not counted here, since the lookups happen in the worker processes: they are
+# recorded in the "cache" stage of the profile of every repository
+class ResultCache:
+    def __init__(self, cache_dir=None, max_entries=100000):
+        self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+        self.max_entries = max_entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # the entries are only counted when the first one is added, so runs that only read the cache
+        # do not walk the cache directory
+        self.size = None
+
+    def entries(self):
+        return [os.path.join(root, file_name)
+                for root, _, files in os.walk(self.cache_dir)
+                for file_name in files if file_name.endswith(".json")]
+
+    def key(self, text, threshold, file_paths, categories, classifier_policy="all"):
+        digest = hashlib.sha256()
+        digest.update(somef.__version__.encode("utf-8"))
+        digest.update(repr(float(threshold)).encode("utf-8"))
+        digest.update(classifier_policy.encode("utf-8"))
+        for category in categories:
+            if category in file_paths and os.path.exists(file_paths[category]):
+                digest.update(f"{category}:{model_fingerprint(file_paths[category])}".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, "r") as fh:
+                predictions = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        # the modification time is used as the last access time for the eviction
+        os.utime(entry_path, None)
+        return predictions
+
+    def put(self, key, predictions):
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        is_new = not os.path.exists(entry_path)
+        # write to a temporary file first, so that concurrent readers never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(predictions, fh)
+        os.replace(tmp_path, entry_path)
+        if is_new:
+            self.size = len(self.entries()) if self.size is None else self.size + 1
+            if self.size > self.max_entries:
+                self.evict()
+
+    # removes the least recently used entries, down to 90% of max_entries
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: os.path.getmtime(entry))
+        excess = len(entries) - int(self.max_entries * 0.9)
+        for entry in entries[:max(excess, 0)]:
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+        self.size = len(entries) - max(excess, 0)
+
+    def clear(self):
+        for entry in self.entries():
+            os.remove(entry)
+        self.size = 0
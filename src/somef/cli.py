@@ -4,8 +4,10 @@
 ## output file: json with each excerpt marked with all four classification scores
 
 import argparse
+import glob
 import json
 import base64
+import logging
 from urllib.parse import urlparse
 import sys
 import os
@@ -20,14 +22,28 @@ import pprint
 import pandas as pd
 import numpy as np
 import re
+import threading
 
+from somef.cache import ResultCache
 from somef.data_to_graph import DataGraph
+from somef.deadline import Deadline
+from somef.errors import ConfigurationError, GithubApiError, GithubUrlError, InputError, SomefError
+from somef.excerpts import Excerpt, ScoreMatrix, Technique, predictions_from_json, predictions_to_json
+from somef.graph_store import GraphStore
+from somef.inputs import InputStats, canonical_github_url, in_shard, read_urls, unique_urls
+from somef.local_repository import load_local_metadata
+from somef.metrics import Metrics, MetricsWriter
+from somef.outputs import read_output_records
+from somef.profiling import Profiler
+from somef.result_store import ResultStore
 
 from . import createExcerpts
 from . import header_analysis
 
 import time
 
+logger = logging.getLogger(__name__)
+
 ## Markdown to plain text conversion: begin ##
 # code snippet from https://stackoverflow.com/a/54923798
 def unmark_element(element, stream=None):
@@ -44,12 +60,15 @@ def unmark_element(element, stream=None):
 
 # patching Markdown
 Markdown.output_formats["plain"] = unmark_element
-__md = Markdown(output_format="plain")
-__md.stripTopLevelTags = False
+# Markdown instances are not thread safe, so every thread gets its own one
+__md_local = threading.local()
 
 
 def unmark(text):
-    return __md.convert(text)
+    if not hasattr(__md_local, "md"):
+        __md_local.md = Markdown(output_format="plain")
+        __md_local.md.stripTopLevelTags = False
+    return __md_local.md.convert(text)
 
 
 ## Markdown to plain text conversion: end ##
@@ -62,6 +81,10 @@ def restricted_float(x):
 
 
 categories = ['description', 'citation', 'installation', 'invocation']
+
+# base url of the GitHub API. SOMEF_GITHUB_API_URL points somef to another server, for example the local
+# stand-in of somef.github_mock
+github_api_url = os.environ.get("SOMEF_GITHUB_API_URL", "https://api.github.com").rstrip("/")
 # keep_keys = ('description', 'name', 'owner', 'license', 'languages_url', 'forks_url')
 # instead of keep keys, we have this table
 # it says that we want the key "codeRepository", and that we'll get it from the path "html_url" within the result object
@@ -95,80 +118,171 @@ release_crosswalk_table = {
 }
 
 
-# the same as requests.get(args).json(), but protects against rate limiting
-def rate_limit_get(*args, backoff_rate=2, initial_backoff=1, **kwargs):
-    rate_limited = True
-    response = {}
-    while rate_limited:
-        req = requests.get(*args, **kwargs)
-        response = req.json()
-        if 'message' in response and 'API rate limit exceeded' in response['message']:
-            rate_limited = True
-            print(f"{response['message']}. Backing off for {initial_backoff} seconds")
-            time.sleep(initial_backoff)
-            
-
+# seconds that a request to GitHub may take, and the least that is given to a request when the time budget of
+# the repository is almost exhausted
+request_timeout = 30
+min_request_timeout = 1
+
+
+# the same as requests.get(args).json(), but protects against rate limiting and server errors
+# rate limited requests are retried until they succeed, server errors (5xx) at most max_retries times,
+# waiting for the Retry-After header of the response if it has one, or an increasing backoff otherwise.
+# A server error that is still there after max_retries retries raises requests.HTTPError
+# responses that are not JSON (e.g. the HTML page of a 502) are returned as {'message': ...}
+# every request times out after timeout seconds (request_timeout by default), or when the deadline is reached
+# if a deadline is given (but not before min_request_timeout seconds), raising requests.Timeout
+# if a deadline is given, the failed response is returned once the deadline is exhausted
+# if a session is given, its connections are reused
+def rate_limit_get(*args, backoff_rate=2, initial_backoff=1, max_retries=5, profiler=None, deadline=None,
+                   session=None, timeout=None, **kwargs):
+    retries = 0
+    while True:
+        if profiler is not None:
+            profiler.count_http()
+        request_time = timeout or request_timeout
+        if deadline is not None and deadline.remaining() is not None:
+            request_time = min(request_time, max(deadline.remaining(), min_request_timeout))
+        req = (session or requests).get(*args, timeout=request_time, **kwargs)
+        if profiler is not None and 'X-RateLimit-Remaining' in req.headers:
+            try:
+                profiler.record_rate_limit(int(req.headers['X-RateLimit-Remaining']))
+            except ValueError:
+                pass
+        try:
+            response = req.json()
+        except ValueError:
+            response = {'message': f"{req.status_code} {req.reason}: the response is not JSON"}
+        rate_limited = isinstance(response, dict) and 'API rate limit exceeded' in response.get('message', '')
+        server_error = req.status_code >= 500
+        if not rate_limited and not server_error:
+            break
+        if server_error:
+            if isinstance(response, dict) and 'message' not in response:
+                response['message'] = f"{req.status_code} {req.reason}"
+            if retries >= max_retries:
+                logger.error(f"{response['message']}. Giving up after {retries} retries")
+                req.raise_for_status()
+            retries += 1
+        if deadline is not None and not deadline.check("rate limit backoff"):
+            break
+        try:
+            wait = float(req.headers['Retry-After'])
+        except (KeyError, ValueError):
+            wait = initial_backoff
             # increase the backoff for next time
             initial_backoff *= backoff_rate
-        else:
-            rate_limited = False
+        logger.warning(f"{response['message']}. Backing off for {wait} seconds")
+        if profiler is not None:
+            profiler.count_backoff(wait)
+        time.sleep(wait)
 
     return response
 
-# error when github url is wrong
-class GithubUrlError(Exception):
-    pass
+## get only the fields that we want
+def do_crosswalk(data, crosswalk_table):
+    def get_path(obj, path):
+        if isinstance(path, list) or isinstance(path, tuple):
+            if len(path) == 1:
+                path = path[0]
+            else:
+                return get_path(obj[path[0]], path[1:])
+
+        if obj is not None and path in obj:
+            return obj[path]
+        else:
+            return None
+
+    output = {}
+    for codemeta_key, path in crosswalk_table.items():
+        value = get_path(data, path)
+        if value is not None:
+            output[codemeta_key] = value
+        else:
+            logger.debug(f"Key {path} not present in github repository")
+    return output
+
+
+# number of releases requested per page, the maximum allowed by the GitHub API
+releases_page_size = 100
+# number of releases loaded by default (one page of the GitHub API defaults)
+default_max_releases = 30
+
+
+## Function loads the releases of a repository page by page. Every page is crosswalked as soon as
+## it arrives, so only the fields that we want are kept in memory
+## At most max_releases releases are loaded (all of them if None), without their body if release_body is False
+## If a page after the first one cannot be loaded, the releases loaded so far are kept and marked as incomplete
+## Returns the list of releases, or None if the releases could not be loaded
+def load_releases(owner, repo_name, header, max_releases=default_max_releases, release_body=True, profiler=None,
+                  deadline=None, session=None):
+    if deadline is None:
+        deadline = Deadline()
+    crosswalk_table = release_crosswalk_table
+    if not release_body:
+        crosswalk_table = {key: value for key, value in release_crosswalk_table.items() if key != 'body'}
+    page_size = releases_page_size if max_releases is None else max(min(releases_page_size, max_releases), 1)
+
+    releases = []
+    page = 1
+    while max_releases is None or len(releases) < max_releases:
+        # the first page was already checked by the caller
+        if page > 1 and not deadline.check("releases"):
+            break
+        try:
+            releases_list = rate_limit_get(f"{github_api_url}/repos/{owner}/{repo_name}/releases",
+                                           params={'per_page': page_size, 'page': page},
+                                           headers=header, profiler=profiler, deadline=deadline,
+                                           session=session)
+        except requests.RequestException as error:
+            if page == 1:
+                raise
+            logger.warning(f"Releases Error: {error}")
+            deadline.mark_incomplete("releases")
+            break
+        if isinstance(releases_list, dict) and 'message' in releases_list.keys():
+            logger.warning("Releases Error: " + releases_list['message'])
+            if page == 1:
+                return None
+            deadline.mark_incomplete("releases")
+            break
+
+        for release in releases_list[:None if max_releases is None else max_releases - len(releases)]:
+            releases.append(do_crosswalk(release, crosswalk_table))
+        if len(releases_list) < page_size:
+            break
+        page += 1
+    return releases
 
 ## Function uses the repository_url provided to load required information from github.
 ## Information kept from the repository is written in keep_keys.
 ## Returns the readme text and required metadata
-def load_repository_metadata(repository_url, header):
-    print(f"Loading Repository {repository_url} Information....")
+def load_repository_metadata(repository_url, header, profiler=None, deadline=None,
+                             max_releases=default_max_releases, release_body=True, session=None):
+    if deadline is None:
+        deadline = Deadline()
+    logger.info(f"Loading Repository {repository_url} Information....")
     ## load general response of the repository
     if repository_url[-1] == '/':
         repository_url = repository_url[:-1]
     url = urlparse(repository_url)
     if url.netloc != 'github.com':
-        print("Error: repository must come from github")
+        logger.error("Error: repository must come from github")
         return " ", {}
     if len(url.path.split('/')) != 3:
-        print("Github link is not correct. \nThe correct format is https://github.com/owner/repo_name.")
+        logger.error("Github link is not correct. The correct format is https://github.com/owner/repo_name.")
         return " ", {}
     _, owner, repo_name = url.path.split('/')
 
-    general_resp = rate_limit_get(f"https://api.github.com/repos/{owner}/{repo_name}", headers=header)
+    general_resp = rate_limit_get(f"{github_api_url}/repos/{owner}/{repo_name}", headers=header, profiler=profiler,
+                                  deadline=deadline, session=session)
 
     if 'message' in general_resp:
         if general_resp['message'] == "Not Found":
-            print("Error: repository name is incorrect")
-        else:
-            message = general_resp['message']
-            print("Error: " + message)
-
-        raise GithubUrlError
-
-    ## get only the fields that we want
-    def do_crosswalk(data, crosswalk_table):
-        def get_path(obj, path):
-            if isinstance(path, list) or isinstance(path, tuple):
-                if len(path) == 1:
-                    path = path[0]
-                else:
-                    return get_path(obj[path[0]], path[1:])
-
-            if obj is not None and path in obj:
-                return obj[path]
-            else:
-                return None
-
-        output = {}
-        for codemeta_key, path in crosswalk_table.items():
-            value = get_path(data, path)
-            if value is not None:
-                output[codemeta_key] = value
-            else:
-                print(f"Error: key {path} not present in github repository")
-        return output
+            logger.error("Error: repository name is incorrect")
+            raise GithubUrlError
+        message = general_resp['message']
+        logger.error("Error: " + message)
+        raise GithubApiError(message)
 
     filtered_resp = do_crosswalk(general_resp, github_crosswalk_table)
     # add download URL
@@ -184,28 +298,31 @@ def load_repository_metadata(repository_url, header):
     # get keywords / topics
     topics_headers = header
     topics_headers['accept'] = 'application/vnd.github.mercy-preview+json'
-    topics_resp = rate_limit_get('https://api.github.com/repos/' + owner + "/" + repo_name + '/topics',
-                                 headers=topics_headers)
+    topics_resp = rate_limit_get(f"{github_api_url}/repos/{owner}/{repo_name}/topics",
+                                 headers=topics_headers, profiler=profiler, deadline=deadline,
+                                 session=session)
 
     if 'message' in topics_resp.keys():
-        print("Topics Error: " + topics_resp['message'])
+        logger.warning("Topics Error: " + topics_resp['message'])
     elif topics_resp and 'names' in topics_resp.keys():
         filtered_resp['topics'] = topics_resp['names']
 
     ## get languages
-    languages = rate_limit_get(filtered_resp['languages_url'], headers=header)
+    languages = rate_limit_get(filtered_resp['languages_url'], headers=header, profiler=profiler, deadline=deadline,
+                               session=session)
     if "message" in languages:
-        print("Languages Error: " + languages["message"])
+        logger.warning("Languages Error: " + languages["message"])
     else:
         filtered_resp['languages'] = list(languages.keys())
 
     del filtered_resp['languages_url']
 
     ## get default README
-    readme_info = rate_limit_get('https://api.github.com/repos/' + owner + "/" + repo_name + '/readme',
-                               headers=topics_headers)
+    readme_info = rate_limit_get(f"{github_api_url}/repos/{owner}/{repo_name}/readme",
+                               headers=topics_headers, profiler=profiler, deadline=deadline,
+                                 session=session)
     if 'message' in readme_info.keys():
-        print("README Error: " + readme_info['message'])
+        logger.warning("README Error: " + readme_info['message'])
         text = ""
     else:
         readme = base64.b64decode(readme_info['content']).decode("utf-8")
@@ -213,143 +330,179 @@ def load_repository_metadata(repository_url, header):
         filtered_resp['readme_url'] = readme_info['html_url']
 
     ## get releases
-    releases_list = rate_limit_get('https://api.github.com/repos/' + owner + "/" + repo_name + '/releases',
-                                 headers=header)
-
-    if isinstance(releases_list, dict) and 'message' in releases_list.keys():
-        print("Releases Error: " + releases_list['message'])
-    else:
-        filtered_resp['releases'] = [do_crosswalk(release, release_crosswalk_table) for release in releases_list]
+    if deadline.check("releases"):
+        releases = load_releases(owner, repo_name, header, max_releases=max_releases, release_body=release_body,
+                                 profiler=profiler, deadline=deadline, session=session)
+        if releases is not None:
+            filtered_resp['releases'] = releases
 
-    print("Repository Information Successfully Loaded. \n")
+    logger.info("Repository Information Successfully Loaded.")
     return text, filtered_resp
 
 
 ## Function takes readme text as input and divides it into excerpts
 ## Returns the extracted excerpts
 def create_excerpts(string_list):
-    print("Splitting text into valid excerpts for classification")
+    logger.info("Splitting text into valid excerpts for classification")
     divisions = createExcerpts.split_into_excerpts(string_list)
-    print("Text Successfully split. \n")
+    logger.info("Text Successfully split.")
     return divisions
 
 
+# unpickled classifiers, by file name. Loading a model is much slower than using it,
+# so each model is only loaded once per process
+loaded_classifiers = {}
+loaded_classifiers_lock = threading.Lock()
+
+
+## Function loads a pickled classifier, or returns it from memory if it was already loaded
+def load_classifier(file_name):
+    with loaded_classifiers_lock:
+        if file_name not in loaded_classifiers:
+            with open(file_name, 'rb') as fh:
+                loaded_classifiers[file_name] = pickle.load(fh)
+        return loaded_classifiers[file_name]
+
+
 ## Function takes readme text as input and runs the provided classifiers on it
-## Returns the dictionary containing scores for each excerpt.
-def run_classifiers(excerpts, file_paths):
-    score_dict = {}
-    if len(excerpts) > 0:
-        for category in categories:
-            if category not in file_paths.keys():
-                sys.exit("Error: Category " + category + " file path not present in config.json")
-            file_name = file_paths[category]
-            if not path.exists(file_name):
-                sys.exit(f"Error: File/Directory {file_name} does not exist")
-            print("Classifying excerpts for the catgory", category)
-            classifier = pickle.load(open(file_name, 'rb'))
-            scores = classifier.predict_proba(excerpts)
-            score_dict[category] = {'excerpt': excerpts, 'confidence': scores[:, 1]}
-            print("Excerpt Classification Successful for the Category", category)
-        print("\n")
-
-    return score_dict
+## Only the given categories are scored (all of them by default)
+## Returns the ScoreMatrix containing scores for each excerpt.
+def run_classifiers(excerpts, file_paths, selected_categories=None):
+    if selected_categories is None:
+        selected_categories = categories
+    if len(excerpts) == 0:
+        return ScoreMatrix(excerpts, [])
+    score_matrix = ScoreMatrix(excerpts, selected_categories)
+    for category in selected_categories:
+        if category not in file_paths.keys():
+            raise ConfigurationError("Category " + category + " file path not present in config.json")
+        file_name = file_paths[category]
+        if not path.exists(file_name):
+            raise ConfigurationError(f"File/Directory {file_name} does not exist")
+        logger.info("Classifying excerpts for the category %s", category)
+        classifier = load_classifier(file_name)
+        scores = classifier.predict_proba(excerpts)
+        score_matrix.set_confidence(category, scores[:, 1])
+        logger.info("Excerpt Classification Successful for the Category %s", category)
+
+    return score_matrix
+
+
+# policies to choose the categories the classifiers are run for
+# all: every category is scored
+# unlabeled: categories for which header analysis already found a section are not scored,
+#            and citation is not scored when a BibTeX citation was found
+classifier_policies = ["all", "unlabeled"]
+
+# the header analysis groups that make running the classifier of a category unnecessary
+category_header_groups = {
+    'description': ['description'],
+    'citation': ['citation'],
+    'installation': ['installation'],
+    'invocation': ['run', 'usage'],
+}
 
 
-## Function removes all excerpt lines which have been classified but contain only one word.
-## Returns the excerpt to be entered into the predictions
-def remove_unimportant_excerpts(excerpt_element):
-    excerpt_info = excerpt_element['excerpt']
-    excerpt_confidence = excerpt_element['confidence']
-    excerpt_lines = excerpt_info.split('\n')
-    final_excerpt = {'excerpt': "", 'confidence': [], 'technique': 'classifier'}
-    for i in range(len(excerpt_lines) - 1):
-        words = excerpt_lines[i].split(' ')
-        if len(words) == 2:
+## Function applies the classifier policy to the results of header analysis and the bibtex parser
+## Returns the list of categories that have to be scored by the classifiers
+def select_categories(policy, header_predictions, citations):
+    if policy == "all":
+        return list(categories)
+    if policy != "unlabeled":
+        raise ValueError(f"Unknown classifier policy {policy}")
+    selected = []
+    for category in categories:
+        if any(group in header_predictions for group in category_header_groups[category]):
+            continue
+        if category == 'citation' and len(citations) > 0:
             continue
-        final_excerpt['excerpt'] += excerpt_lines[i] + '\n';
-        final_excerpt['confidence'].append(excerpt_confidence[i])
-    return final_excerpt
+        selected.append(category)
+    return selected
 
 
-## Function takes scores dictionary and a threshold as input
+## Function removes all excerpt lines which have been classified but contain only one word.
+## Returns the Excerpt to be entered into the predictions, or None if no line is left
+def remove_unimportant_excerpts(excerpt_lines, excerpt_confidence):
+    keep = [i for i, line in enumerate(excerpt_lines) if ' ' in line]
+    if len(keep) == 0:
+        return None
+    excerpt = ''.join(excerpt_lines[i] + ' \n' for i in keep)
+    return Excerpt(excerpt, excerpt_confidence[keep], Technique.CLASSIFIER)
+
+
+## Function takes the ScoreMatrix and a threshold as input
 ## Returns predictions containing excerpts with a confidence above the given threshold.
+## Consecutive excerpts above the threshold are joined in a single prediction
 def classify(scores, threshold):
-    print("Checking Thresholds for Classified Excerpts.")
+    logger.info("Checking Thresholds for Classified Excerpts.")
     predictions = {}
-    for ele in scores.keys():
-        print("Running for", ele)
-        flag = False
+    for ele in scores.categories:
+        logger.debug("Running for %s", ele)
         predictions[ele] = []
-        excerpt = ""
-        confid = []
-        for i in range(len(scores[ele]['confidence'])):
-            if scores[ele]['confidence'][i] >= threshold:
-                if flag == False:
-                    excerpt = excerpt + scores[ele]['excerpt'][i] + ' \n'
-                    confid.append(scores[ele]['confidence'][i])
-                    flag = True
-                else:
-                    excerpt = excerpt + scores[ele]['excerpt'][i] + ' \n'
-                    confid.append(scores[ele]['confidence'][i])
-            else:
-                if flag == True:
-                    element = remove_unimportant_excerpts({'excerpt': excerpt, 'confidence': confid})
-                    if len(element['confidence']) != 0:
-                        predictions[ele].append(element)
-                    excerpt = ""
-                    confid = []
-                    flag = False
-        print("Run completed.")
-    print("All Excerpts below the given Threshold Removed. \n")
+        confidence = scores.confidence(ele)
+        start = None
+        for i, above_threshold in enumerate(confidence >= threshold):
+            if above_threshold:
+                if start is None:
+                    start = i
+            elif start is not None:
+                element = remove_unimportant_excerpts(scores.excerpts[start:i], confidence[start:i])
+                if element is not None:
+                    predictions[ele].append(element)
+                start = None
+        logger.debug("Run completed.")
+    logger.info("All Excerpts below the given Threshold Removed.")
     return predictions
 
 
 ## Function adds category information extracted using header information
 ## Returns json with the information added.
 def extract_categories_using_header(repo_data):
-    print("Extracting information using headers")
+    logger.info("Extracting information using headers")
     # this is a hack because if repo_data is "" this errors out
     if len(repo_data) == 0:
         return {}, []
 
     header_info, string_list = header_analysis.extract_categories_using_headers(repo_data)
-    print("Information extracted. \n")
+    logger.info("Information extracted.")
     return header_info, string_list
 
 
 ## Function takes readme text as input and runs a regex parser on it
 ## Returns a list of bibtex citations
 def extract_bibtex(readme_text):
-    print("Extracting bibtex citation from readme")
+    logger.info("Extracting bibtex citation from readme")
     regex = r'\@[a-zA-z]+\{[.\n\S\s]+?[author|title][.\n\S\s]+?[author|title][.\n\S\s]+?\n\}'
     excerpts = readme_text
     citations = re.findall(regex, excerpts)
-    print("Extracting bibtex citation from readme completed. \n")
+    logger.info("Extracting bibtex citation from readme completed.")
     return citations
 
 
 ## Function takes the predictions using header information, classifier and bibtek parser
 ## Returns a combined predictions
 def merge(header_predictions, predictions, citations):
-    print("Merge prediction using header information, classifier and bibtek parser")
+    logger.info("Merge prediction using header information, classifier and bibtek parser")
     for i in range(len(citations)):
         if 'citation' not in predictions.keys():
             predictions['citation'] = []
-        predictions['citation'].insert(0, {'excerpt': citations[i], 'confidence': [1.0], 'technique': 'classifier'})
+        predictions['citation'].insert(0, Excerpt(citations[i], [1.0], Technique.CLASSIFIER))
 
     for headers in header_predictions:
+        header_excerpts = [Excerpt.from_dict(h) for h in header_predictions[headers]]
         if headers not in predictions.keys():
-            predictions[headers] = header_predictions[headers]
+            predictions[headers] = header_excerpts
         else:
-            for h in header_predictions[headers]:
+            for h in header_excerpts:
                 predictions[headers].insert(0, h)
-    print("Merging successful. \n")
+    logger.info("Merging successful.")
     return predictions
 
 
 ## Function takes metadata, readme text predictions, bibtex citations and path to the output file
-## Performs some combinations
-def format_output(git_data, repo_data):
+## Performs some combinations, and converts the Excerpts to the output dictionaries
+def format_output(git_data, predictions):
+    repo_data = predictions_to_json(predictions)
     for i in git_data.keys():
         if i == 'description':
             if 'description' not in repo_data.keys():
@@ -363,7 +516,7 @@ def format_output(git_data, repo_data):
 
 # saves the final json Object in the file
 def save_json_output(repo_data, outfile):
-    print("Saving json data to", outfile)
+    logger.info("Saving json data to %s", outfile)
     with open(outfile, 'w') as output:
         json.dump(repo_data, output)
 
@@ -376,42 +529,202 @@ def save_json(git_data, repo_data, outfile):
     save_json_output(repo_data, outfile)
 
 
-def cli_get_data(threshold, repo_url=None, doc_src=None):
+def cli_get_data(threshold, repo_url=None, doc_src=None, readme_text=None, local_repo=None, profiler=None,
+                 cache=None, classifier_policy="all", time_budget=None, max_releases=default_max_releases,
+                 release_body=True, file_paths=None, session=None):
+    if profiler is None:
+        profiler = Profiler()
+    profiler.start_repo(next((source for source in (repo_url, doc_src, local_repo) if source is not None), None))
+    outcome = None
+    try:
+        repo_data = get_data(threshold, profiler, repo_url=repo_url, doc_src=doc_src, readme_text=readme_text,
+                             local_repo=local_repo, cache=cache, classifier_policy=classifier_policy,
+                             deadline=Deadline(time_budget), max_releases=max_releases, release_body=release_body,
+                             file_paths=file_paths, session=session)
+        if repo_data is None:
+            outcome = "not_found"
+        else:
+            outcome = "partial" if partial_key in repo_data else "described"
+        return repo_data
+    except Exception as error:
+        outcome = type(error).__name__
+        raise
+    finally:
+        profiler.end_repo(outcome)
+
+
+## Function reads the configuration file with the credentials and the paths of the models
+## Returns the configuration as a dictionary
+def load_file_paths():
     credentials_file = Path(
         os.getenv("SOMEF_CONFIGURATION_FILE", '~/.somef/config.json')
     ).expanduser()
     if credentials_file.exists():
         with credentials_file.open("r") as fh:
-            file_paths = json.load(fh)
+            try:
+                return json.load(fh)
+            except ValueError as error:
+                raise ConfigurationError(f"{credentials_file} is not valid JSON: {error}")
     else:
-        sys.exit("Error: Please provide a config.json file.")
+        raise ConfigurationError("Please provide a config.json file.")
+
+
+# the GitHub token, as written by somef configure
+authorization_pattern = re.compile(r"^(token|Bearer) [A-Za-z0-9_]+$")
+
+
+## Function checks the configuration before any repository is described, so that a mistake is found
+## before the first call to the GitHub API: every category needs a model file, and the token must be well formed.
+## If load_models is True the models are loaded too, and stay in memory for the classifiers (and the workers)
+## Raises a ConfigurationError listing every problem found
+def validate_file_paths(file_paths, load_models=True):
+    problems = []
+    if 'Authorization' in file_paths and not authorization_pattern.match(str(file_paths['Authorization'])):
+        problems.append("Authorization must have the form 'token <GitHub token>'")
+    for category in categories:
+        if category not in file_paths:
+            problems.append("Category " + category + " file path not present in config.json")
+        elif not path.isfile(file_paths[category]):
+            problems.append(f"Model file {file_paths[category]} of the category {category} does not exist")
+        elif load_models:
+            try:
+                classifier = load_classifier(file_paths[category])
+            except Exception as error:
+                problems.append(f"Model file {file_paths[category]} of the category {category} cannot be loaded: "
+                                f"{error!r}")
+                continue
+            if not hasattr(classifier, "predict_proba"):
+                problems.append(f"Model file {file_paths[category]} of the category {category} is not a classifier")
+    if len(problems) > 0:
+        raise ConfigurationError("Invalid configuration: " + "; ".join(problems))
+    return file_paths
+
+
+## Function reads and validates the configuration, once per run
+def load_configuration(load_models=True):
+    return validate_file_paths(load_file_paths(), load_models)
+
+
+## Function runs header analysis, the BibTeX parser and the classifiers on the text of a README, skipping the
+## stages for which the deadline is exhausted
+## Returns the merged predictions
+def predict(text, threshold, profiler, deadline, file_paths, classifier_policy="all"):
+    unfiltered_text = text
+    header_predictions, string_list = {}, []
+    if deadline.check("header_analysis"):
+        with profiler.stage("header_analysis") as stage:
+            header_predictions, string_list = extract_categories_using_header(unfiltered_text)
+            stage["chars"] = len(unfiltered_text)
+            stage["headers"] = sum(len(sections) for sections in header_predictions.values())
+            stage["unlabeled_sections"] = len(string_list)
+    citations = []
+    if deadline.check("citation"):
+        with profiler.stage("unmark") as stage:
+            text = unmark(text)
+            stage["chars"] = len(text)
+        with profiler.stage("extract_bibtex") as stage:
+            citations = extract_bibtex(text)
+            stage["chars"] = len(text)
+            stage["citations"] = len(citations)
+    # without classifiers, an empty list of excerpts gives no predictions
+    excerpts = []
+    if deadline.check("classifiers"):
+        with profiler.stage("create_excerpts") as stage:
+            excerpts = create_excerpts(string_list)
+            stage["excerpts"] = len(excerpts)
+    with profiler.stage("run_classifiers") as stage:
+        selected_categories = select_categories(classifier_policy, header_predictions, citations)
+        skipped_categories = [category for category in categories if category not in selected_categories]
+        if len(skipped_categories) > 0 and len(excerpts) > 0:
+            logger.info(f"Skipping classification of {len(excerpts)} excerpts for the categories "
+                        + ", ".join(skipped_categories))
+        score_matrix = run_classifiers(excerpts, file_paths, selected_categories)
+        stage["excerpts"] = len(excerpts)
+        stage["categories"] = len(score_matrix)
+        stage["skipped_categories"] = skipped_categories
+        stage["avoided_predictions"] = len(excerpts) * len(skipped_categories)
+    with profiler.stage("classify") as stage:
+        predictions = classify(score_matrix, threshold)
+        stage["predictions"] = sum(len(excerpts) for excerpts in predictions.values())
+    with profiler.stage("merge"):
+        predictions = merge(header_predictions, predictions, citations)
+    return predictions
+
+
+# the key of the output that lists the fields that are partial because the time budget was exhausted
+partial_key = 'partial'
+# the key of the output that lists the optional fields that could not be loaded completely. Unlike partial
+# repositories, these are added to the Knowledge Graph with the data that was loaded
+incomplete_key = 'incomplete'
+
+
+def get_data(threshold, profiler, repo_url=None, doc_src=None, readme_text=None, local_repo=None, cache=None,
+             classifier_policy="all", deadline=None, max_releases=default_max_releases, release_body=True,
+             file_paths=None, session=None):
+    if deadline is None:
+        deadline = Deadline()
+    if file_paths is None:
+        file_paths = load_file_paths()
     header = {}
     if 'Authorization' in file_paths.keys():
         header['Authorization'] = file_paths['Authorization']
     header['accept'] = 'application/vnd.github.v3+json'
-    if repo_url is not None:
-        assert (doc_src is None)
-        try:
-            text, github_data = load_repository_metadata(repo_url, header)
-        except GithubUrlError:
-            return None
-    else:
-        assert (doc_src is not None)
-        if not path.exists(doc_src):
-            sys.exit("Error: Document does not exist at given path")
-        with open(doc_src, 'r') as doc_fh:
-            text = doc_fh.read()
-        github_data = {}
+    with profiler.stage("fetch") as stage:
+        if repo_url is not None:
+            assert (doc_src is None)
+            try:
+                text, github_data = load_repository_metadata(repo_url, header, profiler=profiler, deadline=deadline,
+                                                             max_releases=max_releases, release_body=release_body,
+                                                             session=session)
+            except GithubUrlError:
+                return None
+        elif local_repo is not None:
+            assert (doc_src is None)
+            if not path.exists(local_repo):
+                raise InputError(f"Repository does not exist at {local_repo}")
+            text, github_data = load_local_metadata(local_repo, max_releases=max_releases,
+                                                    release_body=release_body)
+        elif readme_text is not None:
+            assert (doc_src is None)
+            text = readme_text
+            github_data = {}
+        else:
+            assert (doc_src is not None)
+            if not path.exists(doc_src):
+                raise InputError(f"Document does not exist at {doc_src}")
+            with open(doc_src, 'r') as doc_fh:
+                text = doc_fh.read()
+            github_data = {}
+        stage["chars"] = len(text)
+
+    predictions = None
+    if cache is not None:
+        with profiler.stage("cache") as stage:
+            cache_key = cache.key(text, threshold, file_paths, categories, classifier_policy)
+            cached_predictions = cache.get(cache_key)
+            stage["hit"] = cached_predictions is not None
+        if cached_predictions is not None:
+            logger.info("Predictions loaded from the cache.")
+            predictions = predictions_from_json(cached_predictions)
+
+    if predictions is None:
+        predictions = predict(text, threshold, profiler, deadline, file_paths, classifier_policy)
+        if cache is not None and len(deadline.skipped) == 0:
+            cache.put(cache_key, predictions_to_json(predictions))
+    # the stages skipped while fetching (e.g. the releases) are marked even if the predictions were cached
+    repo_data = format_output(github_data, predictions)
+    if len(deadline.skipped) > 0:
+        repo_data[partial_key] = deadline.skipped
+    if len(deadline.incomplete) > 0:
+        repo_data[incomplete_key] = deadline.incomplete
+    return repo_data
 
-    unfiltered_text = text
-    header_predictions, string_list = extract_categories_using_header(unfiltered_text)
-    text = unmark(text)
-    excerpts = create_excerpts(string_list)
-    score_dict = run_classifiers(excerpts, file_paths)
-    predictions = classify(score_dict, threshold)
-    citations = extract_bibtex(text)
-    predictions = merge(header_predictions, predictions, citations)
-    return format_output(github_data, predictions)
+
+## Function keeps the descriptions that are added to the Knowledge Graph: repositories that were not found are
+## left out, and so are those with stages skipped because their time budget was exhausted
+## Returns an iterator over the descriptions kept
+def graph_records(records):
+    return (repo for repo in records if repo is not None and partial_key not in repo)
 
 
 # Function runs all the required components of the cli on a given document file
@@ -419,45 +732,177 @@ def run_cli_document(doc_src, threshold, output):
     return run_cli(threshold=threshold, output=output, doc_src=doc_src)
 
 
+## Function finds the documents of a directory that match the glob pattern (*.md if None)
+## Returns the sorted list of paths
+def find_documents(doc_dir, pattern=None):
+    documents = glob.glob(os.path.join(doc_dir, pattern or "*.md"), recursive=True)
+    return sorted(document for document in documents if path.isfile(document))
+
+
+## Function describes the documents of a directory that match the glob pattern (only those of the shard, if given),
+## with workers processes. Each document is saved in the result store, if given, as soon as it is finished
+## Yields (path, description) pairs
+def describe_documents(describer, doc_dir, pattern=None, workers=1, profiler=None, shard=None, result_store=None,
+                       **recycling):
+    documents = [document for document in find_documents(doc_dir, pattern)
+                 if in_shard(os.path.relpath(document, doc_dir), shard)]
+    logger.info(f"Describing {len(documents)} documents from {doc_dir}")
+    for document, document_data in describer.describe_batch(documents, "doc_src", workers, profiler, **recycling):
+        if result_store is not None and document_data is not None:
+            result_store.upsert(document, document_data)
+        yield document, document_data
+
+
+## Function describes the repositories of an input file, saving them in the result store (if any)
+## The urls are read as they are needed, and every repository is only fetched once
+## Yields (url, description) as soon as each repository is finished
+def describe_repositories(describer, in_file, input_stats, workers=1, profiler=None, shard=None, result_store=None,
+                          in_format=None, **recycling):
+    repo_urls = unique_urls(read_urls(in_file, in_format), input_stats, shard)
+    for repo_url, repo_data in describer.describe_batch(repo_urls, "repo_url", workers, profiler, **recycling):
+        if result_store is not None and repo_data is not None:
+            result_store.upsert(repo_url, repo_data)
+        yield repo_url, repo_data
+
+
 # Function runs all the required components of the cli for a repository
+# With a shard (i, N), only the repositories (or documents) of the shard i of N are described
 def run_cli(*,
             threshold=0.8,
             repo_url=None,
             doc_src=None,
+            local_repo=None,
             in_file=None,
+            in_format=None,
+            doc_dir=None,
+            pattern=None,
+            workers=1,
             output=None,
             graph_out=None,
             graph_format="turtle",
+            graph_store=None,
+            profile=None,
+            profile_stage=None,
+            no_cache=False,
+            cache_dir=None,
+            classifier_policy="all",
+            time_budget=None,
+            max_releases=default_max_releases,
+            no_release_body=False,
+            shard=None,
+            db_out=None,
+            metrics_file=None,
+            metrics_interval=15,
+            profile_memory=False,
+            profile_allocations=0,
+            max_repos_per_worker=None,
+            max_worker_memory=None,
             ):
-    multiple_repos = in_file is not None
-    if multiple_repos:
-        with open(in_file, "r") as in_handle:
-            # get the line (with the final newline omitted) if the line is not empty
-            repo_list = [line[:-1] for line in in_handle if len(line) > 1]
-
-        # convert to a set to ensure uniqueness (we don't want to get the same data multiple times)
-        repo_set = set(repo_list)
-
-        repo_data = [cli_get_data(threshold, repo_url=repo_url) for repo_url in repo_set]
+    # imported here because the describer is built on top of this module
+    from somef.describer import Describer
+
+    metrics_writer = None
+    if metrics_file is not None:
+        logger.info("Saving metrics to %s every %s seconds", metrics_file, metrics_interval)
+        metrics_writer = MetricsWriter(Metrics(), metrics_file, metrics_interval)
+        metrics_writer.start()
+    profiler = Profiler(cprofile_stage=profile_stage, metrics=metrics_writer.metrics if metrics_writer else None,
+                        trace_rss=profile_memory, trace_allocations=profile_allocations)
+    # worker processes are recycled after max_repos_per_worker repositories, or max_worker_memory MiB
+    recycling = {"max_tasks_per_worker": max_repos_per_worker,
+                 "max_worker_rss": max_worker_memory * 2 ** 20 if max_worker_memory is not None else None}
+    cache = None if no_cache else ResultCache(cache_dir)
+    describer = Describer(threshold=threshold, cache=cache, classifier_policy=classifier_policy,
+                          time_budget=time_budget, max_releases=max_releases, release_body=not no_release_body)
+    saved_output = False
+    result_store = None
+    if db_out is not None:
+        logger.info("Saving results to the database %s", db_out)
+        result_store = ResultStore(db_out)
+    if in_file is not None:
+        # (we don't want to get the same data multiple times)
+        input_stats = InputStats()
+        repositories = describe_repositories(describer, in_file, input_stats, workers, profiler, shard, result_store,
+                                             in_format, **recycling)
+        if output is not None and output.endswith(".jsonl"):
+            # every repository is saved as a line as soon as it is finished, and not kept in memory:
+            # the Knowledge Graph is built from the saved records
+            logger.info("Saving json lines data to %s", output)
+            with open(output, "w") as out_handle:
+                for _, data in repositories:
+                    out_handle.write(json.dumps(data) + "\n")
+            saved_output = True
+            records = (data for _, data in read_output_records(output))
+        else:
+            repo_data = [data for _, data in repositories]
+            records = repo_data
+        logger.info(f"Read {input_stats.read} repositories from {in_file}, "
+                    f"{input_stats.duplicates} duplicates removed, {input_stats.other_shards} in other shards")
+
+    elif doc_dir is not None:
+        documents = describe_documents(describer, doc_dir, pattern, workers, profiler, shard, result_store,
+                                       **recycling)
+        if output is not None and output.endswith(".jsonl"):
+            # every document is saved as soon as it is finished, as {path: data}, and not kept in memory:
+            # the Knowledge Graph is built from the saved records
+            logger.info("Saving json lines data to %s", output)
+            with open(output, "w") as out_handle:
+                for document, document_data in documents:
+                    out_handle.write(json.dumps({document: document_data}) + "\n")
+            saved_output = True
+            records = (document_data for _, document_data in read_output_records(output))
+        else:
+            repo_data = {document: document_data for document, document_data in sorted(documents)}
+            records = list(repo_data.values())
 
     else:
         if repo_url:
-            repo_data = cli_get_data(threshold, repo_url=repo_url)
+            source = canonical_github_url(repo_url)
+            repo_data = describer.describe(repo_url=repo_url, profiler=profiler)
+        elif local_repo:
+            source = local_repo
+            repo_data = describer.describe(local_repo=local_repo, profiler=profiler)
         else:
-            repo_data = cli_get_data(threshold, doc_src=doc_src)
-
-    if output is not None:
+            source = doc_src
+            repo_data = describer.describe(doc_src=doc_src, profiler=profiler)
+        if result_store is not None and repo_data is not None:
+            result_store.upsert(source, repo_data)
+        records = [repo_data]
+
+    if result_store is not None:
+        result_store.close()
+    if metrics_writer is not None:
+        metrics_writer.stop()
+    # the lookups of the worker processes are counted from the profiles they send back
+    cache_lookups = profiler.summary().get("cache")
+    if cache_lookups is not None:
+        logger.info(f"Cache: {cache_lookups['hits']} hits, {cache_lookups['misses']} misses")
+
+    if output is not None and not saved_output:
         save_json_output(repo_data, output)
 
+    records = graph_records(records)
+
+    if graph_store is not None:
+        logger.info("Updating Knowledge Graph store %s", graph_store)
+        store = GraphStore(graph_store)
+        for repo in records:
+            store.replace_somef_data(repo)
+
     if graph_out is not None:
-        print("Generating Knowledge Graph")
-        data_graph = DataGraph()
-        if multiple_repos:
-            for repo in repo_data:
-                data_graph.add_somef_data(repo)
-        else:
-            data_graph.add_somef_data(repo_data)
+        logger.info("Generating Knowledge Graph")
+        with profiler.stage("generate_graph"):
+            if graph_store is not None:
+                data_graph = store.to_data_graph()
+            else:
+                data_graph = DataGraph.build_shard(records)
+
+        logger.info("Saving Knowledge Graph data to %s", graph_out)
+        with profiler.stage("save_graph"):
+            data_graph.serialize(graph_out, graph_format=graph_format)
+
+    if graph_store is not None:
+        store.close()
 
-        print("Saving Knowledge Graph ttl data to", graph_out)
-        with open(graph_out, "wb") as out_file:
-            out_file.write(data_graph.g.serialize(format=graph_format))
+    if profile is not None:
+        profiler.save(profile)
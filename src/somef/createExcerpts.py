@@ -14,6 +14,7 @@ import pprint
 import pandas as pd
 import numpy as np
 import re
+import threading
 
 ## Markdown to plain text conversion: begin ##
 # code snippet from https://stackoverflow.com/a/54923798
@@ -30,11 +31,14 @@ def unmark_element(element, stream=None):
 
 # patching Markdown
 Markdown.output_formats["plain"] = unmark_element
-__md = Markdown(output_format="plain")
-__md.stripTopLevelTags = False
+# Markdown instances are not thread safe, so every thread gets its own one
+__md_local = threading.local()
 
 def unmark(text):
-    return __md.convert(text)
+    if not hasattr(__md_local, "md"):
+        __md_local.md = Markdown(output_format="plain")
+        __md_local.md.stripTopLevelTags = False
+    return __md_local.md.convert(text)
 ## Markdown to plain text conversion: end ##
 
 ## Function takes readme text as input and divides it into excerpts
@@ -1,5 +1,6 @@
 from rdflib import RDF, Graph, Literal, URIRef, Namespace
 from rdflib.namespace import XSD
+from rdflib.util import guess_format
 from somef.schema.software_schema import software_prefixes, software_schema
 
 class DataGraph:
@@ -14,6 +15,43 @@ class DataGraph:
         for key, value in prefixes.items():
             self.g.bind(key, Namespace(value))
 
+    # builds an independent graph (a shard) from a list of somef outputs, so that
+    # every worker or input partition can produce and serialize its own piece of the graph
+    @staticmethod
+    def build_shard(somef_data_list):
+        shard = DataGraph()
+        for somef_data in somef_data_list:
+            if somef_data is not None:
+                shard.add_somef_data(somef_data)
+        return shard
+
+    # combines several DataGraphs into one. rdflib graphs are sets of triples,
+    # so triples that appear in more than one shard are only kept once
+    @staticmethod
+    def merge(data_graphs):
+        merged = DataGraph()
+        merged.prefixes.update(software_prefixes)
+        merged.bind_prefixes(software_prefixes)
+        for data_graph in data_graphs:
+            merged.prefixes.update(data_graph.prefixes)
+            merged.add_graph(data_graph.g)
+        return merged
+
+    @staticmethod
+    def load(source, graph_format=None):
+        if graph_format is None:
+            graph_format = guess_graph_format(source)
+        data_graph = DataGraph()
+        data_graph.g.parse(source, format=graph_format)
+        return data_graph
+
+    def add_graph(self, graph):
+        for triple in graph:
+            self.g.add(triple)
+
+    def serialize(self, destination, graph_format="turtle"):
+        self.g.serialize(destination=destination, format=graph_format)
+
     def add_somef_data(self, somef_data):
         # process the somef output into data
         data = DataGraph.process_somef(somef_data)
@@ -21,13 +59,18 @@ class DataGraph:
         self.prefixes.update(software_prefixes)
         self.bind_prefixes(software_prefixes)
         # add the data to the graph, using the software_schema
-        self.data_to_graph(data, software_schema)
+        return self.data_to_graph(data, software_schema)
+
+    # keys of the somef output that are not data about the software
+    ignored_keys = ("partial", "incomplete")
 
     # discard the excerpt and confidence stuff
     @staticmethod
     def process_somef(data):
         out = {}
         for key, value in data.items():
+            if key in DataGraph.ignored_keys:
+                continue
             # if the value is a list, preserve the list
             if isinstance(value, list) or isinstance(value, tuple):
                 if len(value) > 0:
@@ -127,8 +170,7 @@ class DataGraph:
                         lambda x: Literal(x["value"], datatype=x["type"]) if x["value"] is not None else None
                     )
                 else:
-                    exit(f"{attr_schema} not a valid value")
-                    return None  # needed because the linter doesn't know exit is a return
+                    raise ValueError(f"{attr_schema} not a valid value")
 
                 # add the object to the graph if it does not already exist
 
@@ -177,6 +219,28 @@ class DataGraph:
         else:
             return URIRef(type_name)
 
+# the formats that rdflib does not guess from the file extension
+graph_format_extensions = {
+    "jsonld": "json-ld",
+    "json": "json-ld",
+}
+
+
+def guess_graph_format(file_name):
+    extension = file_name.rsplit(".", 1)[-1].lower()
+    if extension in graph_format_extensions:
+        return graph_format_extensions[extension]
+    graph_format = guess_format(file_name)
+    return graph_format if graph_format is not None else "turtle"
+
+
+# merges serialized graph shards into a single graph file
+def merge_graph_files(in_files, out_file, graph_format="turtle"):
+    merged = DataGraph.merge(DataGraph.load(in_file) for in_file in in_files)
+    merged.serialize(out_file, graph_format=graph_format)
+    return merged
+
+
 if __name__ == "__main__":
     from somef.schema.software_schema import software_prefixes
 
@@ -0,0 +1,38 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# time budget for the processing of one repository. Every stage checks the deadline before
+# running; the stages that are skipped because the budget is exhausted are recorded so that
+# the output can mark which fields are partial. The optional fields that could only be loaded in
+# part (e.g. a page of releases failed) are recorded apart, since the rest of the repository is complete
+class Deadline:
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.end = time.monotonic() + budget if budget is not None else None
+        self.skipped = []
+        self.incomplete = []
+
+    def remaining(self):
+        if self.end is None:
+            return None
+        return max(self.end - time.monotonic(), 0.0)
+
+    def expired(self):
+        return self.end is not None and time.monotonic() >= self.end
+
+    # returns True if the stage can run, otherwise records it as skipped
+    def check(self, stage):
+        if not self.expired():
+            return True
+        logger.warning(f"Time budget of {self.budget} seconds exhausted, skipping {stage}")
+        if stage not in self.skipped:
+            self.skipped.append(stage)
+        return False
+
+    # records a field that could not be loaded completely
+    def mark_incomplete(self, field):
+        if field not in self.incomplete:
+            self.incomplete.append(field)
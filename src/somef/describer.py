@@ -0,0 +1,127 @@
+import logging
+import time
+
+import requests
+
+from somef import cli
+from somef.profiling import Profiler
+from somef.worker_pool import RecyclingPool
+
+logger = logging.getLogger(__name__)
+
+source_types = ("repo_url", "doc_src", "readme_text", "local_repo")
+
+
+# entry point of somef as a library. A Describer reads the configuration once and keeps the
+# HTTP session (and so its connections to GitHub) across the repositories it describes.
+# The configuration is validated and the models are loaded when the Describer is created, so a
+# misconfiguration fails before any repository is fetched, and the worker processes inherit the models.
+# Errors are raised as exceptions (subclasses of cli.SomefError) instead of exiting
+class Describer:
+    def __init__(self, threshold=0.8, file_paths=None, cache=None, classifier_policy="all", time_budget=None,
+                 max_releases=cli.default_max_releases, release_body=True, validate=True):
+        self.threshold = threshold
+        if file_paths is None:
+            file_paths = cli.load_file_paths()
+        self.file_paths = cli.validate_file_paths(file_paths) if validate else file_paths
+        self.cache = cache
+        self.classifier_policy = classifier_policy
+        self.time_budget = time_budget
+        self.max_releases = max_releases
+        self.release_body = release_body
+        self.session = requests.Session()
+
+    # the session is not sent to the worker processes, each one opens its own
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["session"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.session = requests.Session()
+
+    ## Function describes one repository, document, README text or local repository. Threads that describe
+    ## repositories at the same time must each give their own session
+    ## Returns the description, or None if the GitHub repository does not exist
+    def describe(self, repo_url=None, doc_src=None, readme_text=None, local_repo=None, profiler=None,
+                 threshold=None, session=None):
+        return cli.cli_get_data(self.threshold if threshold is None else threshold, repo_url=repo_url,
+                                doc_src=doc_src, readme_text=readme_text, local_repo=local_repo, profiler=profiler,
+                                cache=self.cache, classifier_policy=self.classifier_policy,
+                                time_budget=self.time_budget, max_releases=self.max_releases,
+                                release_body=self.release_body, file_paths=self.file_paths,
+                                session=session or self.session)
+
+    ## Function describes one source of a batch, profiled with the given settings (see Profiler.settings).
+    ## A failure only loses that source
+    ## Returns (source, description, profile record)
+    def describe_source(self, source_type, source, profile_settings=None):
+        profiler = Profiler(**(profile_settings or {}))
+        start = time.perf_counter()
+        try:
+            repo_data = self.describe(profiler=profiler, **{source_type: source})
+        except (cli.SomefError, requests.RequestException) as error:
+            logger.error("Error describing %s: %s", source, error, extra={"source": source})
+            repo_data = None
+        except Exception:
+            # an unexpected error (e.g. an unreadable tarball) is logged with its traceback, the outcome
+            # of the profile record is the name of the exception
+            logger.exception("Unexpected error describing %s", source, extra={"source": source})
+            repo_data = None
+        elapsed = time.perf_counter() - start
+        logger.info("Described %s in %.2f seconds", source, elapsed, extra={"source": source, "elapsed": elapsed})
+        return source, repo_data, profiler.repositories[0]
+
+    ## Function describes the sources, of type source_type, using a pool of worker processes. A worker process is
+    ## replaced after max_tasks_per_worker sources, or when its private memory is over max_worker_rss bytes after
+    ## a source (with any of them, the sources are described in a worker process even if workers is 1)
+    ## Yields (source, description) pairs as soon as each source is finished
+    def describe_batch(self, sources, source_type="repo_url", workers=1, profiler=None, max_tasks_per_worker=None,
+                       max_worker_rss=None):
+        if source_type not in source_types:
+            raise ValueError(f"Unknown source type {source_type}")
+        profile_settings = profiler.settings() if profiler is not None else None
+        tasks = ((source_type, source, profile_settings) for source in sources)
+        if workers > 1 or max_tasks_per_worker is not None or max_worker_rss is not None:
+            pool = RecyclingPool(describe_in_worker, workers, initializer=init_worker, initargs=(self,),
+                                 max_tasks=max_tasks_per_worker, max_rss=max_worker_rss)
+            results = pool.imap_unordered(tasks, on_lost=lost_source)
+        else:
+            pool = None
+            results = (self.describe_source(*task) for task in tasks)
+        finished = False
+        try:
+            for source, repo_data, profile_record in results:
+                if profiler is not None:
+                    profiler.add_repository(profile_record)
+                yield source, repo_data
+            finished = True
+        finally:
+            if pool is not None:
+                # if the caller stopped early, the pending sources are not described
+                if finished:
+                    pool.close()
+                else:
+                    pool.terminate()
+                pool.join()
+
+
+# the describer of a worker process, set by init_worker
+worker_describer = None
+
+
+def init_worker(describer):
+    global worker_describer
+    worker_describer = describer
+
+
+def describe_in_worker(task):
+    return worker_describer.describe_source(*task)
+
+
+## Function records a source whose worker process died, e.g. killed for using too much memory
+def lost_source(task, error):
+    _, source, _ = task
+    logger.error("Error describing %s: %s", source, error, extra={"source": source})
+    return source, None, {"repository": source, "stages": [], "http_calls": 0, "outcome": type(error).__name__}
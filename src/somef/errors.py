@@ -0,0 +1,24 @@
+# base class of the errors raised by somef, instead of exiting, so that it can be used as a library
+class SomefError(Exception):
+    pass
+
+
+# error when github url is wrong
+class GithubUrlError(SomefError):
+    pass
+
+
+# error when the GitHub API answers with an error other than "Not Found" (e.g. rate limit exceeded or bad
+# credentials), so the repository may exist and can be tried again
+class GithubApiError(SomefError):
+    pass
+
+
+# error when the configuration file is missing or points to missing models
+class ConfigurationError(SomefError):
+    pass
+
+
+# error when the document or local repository to describe does not exist
+class InputError(SomefError):
+    pass
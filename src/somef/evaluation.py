@@ -0,0 +1,157 @@
+import glob
+import json
+import logging
+import os
+import pickle
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from somef import training
+from somef.profiling import resident_memory
+
+logger = logging.getLogger(__name__)
+
+# prefix of the names of the candidate models in experiments/trained_models -> category
+model_prefixes = {"cit": "citation", "des": "description", "ins": "installation", "inv": "invocation"}
+
+
+## Function finds the category of a model file, from its name (citation.sk) or its prefix (citcvlr.p)
+def model_category(file_name):
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    if name in training.training_categories:
+        return name
+    return model_prefixes.get(name[:3])
+
+
+## Function finds the candidate models of the categories in a directory
+## Returns a sorted list of (category, path)
+def find_candidates(models_dir, categories=training.training_categories):
+    candidates = []
+    for file_name in sorted(glob.glob(os.path.join(models_dir, "*.p")) + glob.glob(os.path.join(models_dir, "*.sk"))):
+        category = model_category(file_name)
+        if category in categories:
+            candidates.append((category, file_name))
+    return candidates
+
+
+# the evaluation sets of the categories and the settings of a worker process, set by init_worker
+worker_test_sets = None
+worker_settings = None
+
+
+def init_worker(test_sets, settings):
+    global worker_test_sets, worker_settings
+    worker_test_sets = test_sets
+    worker_settings = settings
+
+
+## Function scores the excerpts with a model: the probability of the category if the model has
+## predict_proba (as run_classifiers requires), its prediction otherwise
+def model_scores(model, excerpts):
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(excerpts)[:, 1]
+    return model.predict(excerpts).astype(float)
+
+
+## Function evaluates a candidate model. It runs in its own worker process, so that the memory
+## measured is only the memory of that model
+## Returns the record of the model
+def evaluate_model(task):
+    category, model_file = task
+    threshold, latency_samples = worker_settings
+    excerpts, labels = worker_test_sets[category]
+    record = {"category": category, "model": model_file, "file_size": os.path.getsize(model_file)}
+
+    memory_before = resident_memory()
+    start = time.perf_counter()
+    try:
+        with open(model_file, "rb") as fh:
+            model = pickle.load(fh)
+    except Exception as error:
+        record["error"] = f"cannot be loaded: {error!r}"
+        return record
+    record["load_time"] = time.perf_counter() - start
+    record["usable"] = hasattr(model, "predict_proba")
+
+    try:
+        start = time.perf_counter()
+        scores = model_scores(model, excerpts)
+        batch_time = time.perf_counter() - start
+        latencies = []
+        for excerpt in excerpts[:latency_samples]:
+            start = time.perf_counter()
+            model_scores(model, [excerpt])
+            latencies.append(time.perf_counter() - start)
+    except Exception as error:
+        record["error"] = f"cannot be run: {error!r}"
+        return record
+
+    record.update(training.score(labels, scores >= threshold))
+    record["throughput"] = len(excerpts) / batch_time if batch_time > 0 else None
+    record["latency_p50"] = float(np.percentile(latencies, 50))
+    record["latency_p99"] = float(np.percentile(latencies, 99))
+    record["memory"] = resident_memory() - memory_before
+    return record
+
+
+## Function scores every candidate model of the categories on the corpus, one model per worker process
+## Returns the records of the models, by category and best f1 first
+def evaluate(models_dir, corpus_dir, categories=training.training_categories, workers=1, threshold=0.8,
+             latency_samples=200, negative_ratio=0.25, seed=0):
+    corpus = training.load_corpus(corpus_dir)
+    test_sets = {category: training.build_training_set(corpus, category, negative_ratio, seed)
+                 for category in categories}
+    candidates = find_candidates(models_dir, categories)
+    logger.info("Evaluating %d models in %d processes", len(candidates), workers)
+
+    # a new process for every model, so that the models loaded before do not count in its memory
+    with Pool(workers, initializer=init_worker, initargs=(test_sets, (threshold, latency_samples)),
+              maxtasksperchild=1) as pool:
+        records = pool.map(evaluate_model, candidates, chunksize=1)
+    for record in records:
+        if "error" in record:
+            logger.warning("%s %s", record["model"], record["error"])
+    return sorted(records, key=lambda record: (record["category"], -record.get("f1", -1)))
+
+
+## Function chooses the model of each category with the best f1 among the ones that can be used by
+## run_classifiers and whose median latency per excerpt is within the budget (in seconds)
+## Returns a dictionary category -> record
+def recommend(records, latency_budget=None):
+    recommended = {}
+    for record in records:
+        if "error" in record or not record["usable"]:
+            continue
+        if latency_budget is not None and record["latency_p50"] > latency_budget:
+            continue
+        best = recommended.get(record["category"])
+        if best is None or record["f1"] > best["f1"]:
+            recommended[record["category"]] = record
+    return recommended
+
+
+def print_evaluation(records, recommended=None):
+    print(f"{'model':<24}{'precision':>10}{'recall':>8}{'f1':>8}{'load (s)':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+          f"{'excerpts/s':>12}{'memory (MiB)':>14}")
+    for record in records:
+        name = os.path.basename(record["model"])
+        if "error" in record:
+            print(f"{name:<24}  {record['error']}")
+            continue
+        if recommended is not None and recommended.get(record["category"]) is record:
+            name += " *"
+        elif not record["usable"]:
+            name += " (no proba)"
+        throughput = record["throughput"] if record["throughput"] is not None else float("inf")
+        print(f"{name:<24}{record['precision']:>10.3f}{record['recall']:>8.3f}{record['f1']:>8.3f}"
+              f"{record['load_time']:>10.3f}{record['latency_p50'] * 1000:>10.3f}{record['latency_p99'] * 1000:>10.3f}"
+              f"{throughput:>12.0f}{record['memory'] / 2 ** 20:>14.1f}")
+
+
+def save_evaluation(records, recommended, outfile):
+    logger.info("Saving evaluation report to %s", outfile)
+    with open(outfile, "w") as fh:
+        json.dump({"models": records, "recommended": {category: record["model"]
+                                                      for category, record in recommended.items()}}, fh, indent=2)
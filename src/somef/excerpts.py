@@ -0,0 +1,65 @@
+from enum import Enum
+
+import numpy as np
+
+
+# how an excerpt was found. The values are the ones written in the output
+class Technique(str, Enum):
+    CLASSIFIER = "classifier"
+    HEADER_ANALYSIS = "wordnet"
+    METADATA = "metadata"
+
+
+# an excerpt of a README with the confidence of each of its lines
+# the dict of the output ({'excerpt', 'confidence', 'technique'}) is only created by to_dict
+class Excerpt:
+    __slots__ = ("excerpt", "confidence", "technique")
+
+    def __init__(self, excerpt, confidence, technique):
+        self.excerpt = excerpt
+        self.confidence = confidence
+        self.technique = technique
+
+    @staticmethod
+    def from_dict(data):
+        return Excerpt(data['excerpt'], data['confidence'], Technique(data['technique']))
+
+    def to_dict(self):
+        if isinstance(self.confidence, np.ndarray):
+            confidence = self.confidence.tolist()
+        else:
+            confidence = list(self.confidence)
+        return {'excerpt': self.excerpt, 'confidence': confidence, 'technique': self.technique.value}
+
+
+# the scores of the classifiers: one list of excerpts and one matrix of
+# shape (excerpts x categories), instead of one copy of the excerpts per category
+class ScoreMatrix:
+    __slots__ = ("excerpts", "categories", "scores")
+
+    def __init__(self, excerpts, categories):
+        self.excerpts = excerpts
+        self.categories = tuple(categories)
+        self.scores = np.zeros((len(excerpts), len(self.categories)))
+
+    def __len__(self):
+        return len(self.categories)
+
+    def __contains__(self, category):
+        return category in self.categories
+
+    def set_confidence(self, category, confidence):
+        self.scores[:, self.categories.index(category)] = confidence
+
+    def confidence(self, category):
+        return self.scores[:, self.categories.index(category)]
+
+
+## Function converts the predictions, a dictionary of lists of Excerpts, to the output dictionaries
+def predictions_to_json(predictions):
+    return {category: [excerpt.to_dict() for excerpt in excerpts] for category, excerpts in predictions.items()}
+
+
+## Function converts output dictionaries back to a dictionary of lists of Excerpts
+def predictions_from_json(data):
+    return {category: [Excerpt.from_dict(excerpt) for excerpt in excerpts] for category, excerpts in data.items()}
@@ -0,0 +1,379 @@
+import base64
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+
+from somef.inputs import github_url_pattern
+from somef.profiling import Profiler
+
+logger = logging.getLogger(__name__)
+
+# paths of the endpoints used by cli.load_repository_metadata
+repository_path_pattern = re.compile(r"^/repos/([^/]+)/([^/]+)(?:/(topics|languages|readme|releases))?/?$")
+
+rate_limit_message = "API rate limit exceeded for 127.0.0.1. (But here's the good news: Authenticated requests get " \
+                     "a higher rate limit. Check out the documentation for more details.)"
+
+server_error_page = "<html><head><title>502 Bad Gateway</title></head><body><h1>502 Bad Gateway</h1></body></html>"
+
+synthetic_readme = """# {name}
+
+{name} is a library to analyze the software metadata of {owner}.
+
+## Installation
+
+```bash
+pip install {name}
+```
+
+## Usage
+
+```bash
+{name} --input data.csv --output results.json
+```
+
+## Citation
+
+```
+@article{{{name}2020,
+  title={{{name}: a library}},
+  author={{{owner}}},
+  year={{2020}}
+}}
+```
+"""
+
+
+## Function creates the fixture of a repository that was not recorded, with the fields that somef reads
+## Returns a dictionary with the response of every endpoint
+def synthetic_fixture(owner, name, release_count=3):
+    full_name = f"{owner}/{name}"
+    return {
+        "repo": {
+            "id": zlib.crc32(full_name.encode("utf-8")),
+            "name": name,
+            "full_name": full_name,
+            "owner": {"login": owner, "type": "User"},
+            "description": f"Synthetic repository {full_name}",
+            "html_url": f"https://github.com/{full_name}",
+            "clone_url": f"https://github.com/{full_name}.git",
+            "created_at": "2020-01-01T00:00:00Z",
+            "updated_at": "2020-06-01T00:00:00Z",
+            "license": {"key": "mit", "name": "MIT License", "url": "https://api.github.com/licenses/mit"},
+            "languages_url": f"https://api.github.com/repos/{full_name}/languages",
+            "forks_count": 1,
+            "stargazers_count": 10,
+        },
+        "topics": {"names": ["research-software", "metadata"]},
+        "languages": {"Python": 10000, "Shell": 200},
+        "readme": {
+            "content": base64.b64encode(synthetic_readme.format(owner=owner, name=name).encode("utf-8"))
+                             .decode("ascii"),
+            "html_url": f"https://github.com/{full_name}/blob/master/README.md",
+        },
+        "releases": [{
+            "tag_name": f"v1.{index}",
+            "name": f"{name} 1.{index}",
+            "author": {"login": owner, "type": "User"},
+            "body": f"Changes of version 1.{index}",
+            "tarball_url": f"https://api.github.com/repos/{full_name}/tarball/v1.{index}",
+            "zipball_url": f"https://api.github.com/repos/{full_name}/zipball/v1.{index}",
+            "html_url": f"https://github.com/{full_name}/releases/tag/v1.{index}",
+            "url": f"https://api.github.com/repos/{full_name}/releases/{index}",
+            "created_at": "2020-06-01T00:00:00Z",
+            "published_at": "2020-06-01T00:00:00Z",
+        } for index in range(release_count)],
+    }
+
+
+# fixtures of the repositories served by the stand-in: the JSON files <fixture_dir>/<owner>/<name>.json
+# written by record_fixtures, one key per endpoint. Repositories without a fixture get a synthetic one,
+# unless synthetic is False, and then they are not found
+class FixtureSet:
+    def __init__(self, fixture_dir=None, synthetic=True):
+        self.fixture_dir = fixture_dir
+        self.synthetic = synthetic
+        self.fixtures = {}
+        self.lock = threading.Lock()
+
+    def fixture_path(self, owner, name):
+        return os.path.join(self.fixture_dir, owner.lower(), name.lower() + ".json")
+
+    ## Function returns the fixture of a repository, or None if there is none
+    def get(self, owner, name):
+        key = (owner.lower(), name.lower())
+        with self.lock:
+            if key in self.fixtures:
+                return self.fixtures[key]
+        fixture = None
+        if self.fixture_dir is not None and os.path.isfile(self.fixture_path(owner, name)):
+            with open(self.fixture_path(owner, name), "r") as fh:
+                fixture = json.load(fh)
+        elif self.synthetic:
+            fixture = synthetic_fixture(owner, name)
+        with self.lock:
+            self.fixtures[key] = fixture
+        return fixture
+
+
+## Function saves the responses of the GitHub API for the repositories, so that the stand-in can replay them
+## Only the first page (100 releases) of the releases is recorded
+## Returns the number of repositories recorded
+def record_fixtures(repo_urls, fixture_dir, header=None, api_url="https://api.github.com"):
+    # imported here because the stand-in itself does not need the classifiers
+    from somef.cli import rate_limit_get
+    header = dict(header or {})
+    header["accept"] = "application/vnd.github.mercy-preview+json"
+    session = requests.Session()
+    recorded = 0
+    for repo_url in repo_urls:
+        match = github_url_pattern.match(repo_url.strip())
+        if match is None:
+            logger.warning("%s is not a GitHub repository", repo_url)
+            continue
+        owner, name = match.group(1), match.group(2)
+        base_url = f"{api_url}/repos/{owner}/{name}"
+        fixture = {"repo": rate_limit_get(base_url, headers=header, session=session)}
+        if "message" in fixture["repo"]:
+            logger.warning("Cannot record %s: %s", repo_url, fixture["repo"]["message"])
+            continue
+        for endpoint in ("topics", "languages", "readme"):
+            response = rate_limit_get(f"{base_url}/{endpoint}", headers=header, session=session)
+            if "message" not in response:
+                fixture[endpoint] = response
+        fixture["releases"] = rate_limit_get(f"{base_url}/releases", params={"per_page": 100}, headers=header,
+                                             session=session)
+        os.makedirs(os.path.join(fixture_dir, owner.lower()), exist_ok=True)
+        with open(os.path.join(fixture_dir, owner.lower(), name.lower() + ".json"), "w") as fh:
+            json.dump(fixture, fh)
+        recorded += 1
+    return recorded
+
+
+# faults injected by the stand-in: every response waits latency seconds, plus up to jitter seconds, and is
+# replaced by a rate limit response (403) with probability rate_limit_rate or by an HTML 502 page with
+# probability error_rate. If retry_after is given, the faulty responses have a Retry-After header
+class FaultSettings:
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_rate=0.0, error_rate=0.0, retry_after=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    ## Function draws the fault of a request
+    ## Returns (delay, fault), the fault being None, "rate_limited" or "server_error"
+    def draw(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            draw = self.random.random()
+        if draw < self.rate_limit_rate:
+            return delay, "rate_limited"
+        if draw < self.rate_limit_rate + self.error_rate:
+            return delay, "server_error"
+        return delay, None
+
+
+class MockGithubHandler(BaseHTTPRequestHandler):
+    # keeps the connections open, as api.github.com does, so that the sessions of somef reuse them
+    protocol_version = "HTTP/1.1"
+    # otherwise the body waits for the ACK of the headers
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        delay, fault = self.server.faults.draw()
+        if delay > 0:
+            time.sleep(delay)
+        url = urlparse(self.path)
+        if fault == "rate_limited":
+            self.send_fault(403, "application/json", json.dumps({
+                "message": rate_limit_message,
+                "documentation_url": "https://docs.github.com/rest/overview/resources-in-the-rest-api#rate-limiting"
+            }), fault)
+            return
+        if fault == "server_error":
+            self.send_fault(502, "text/html", server_error_page, fault)
+            return
+
+        match = repository_path_pattern.match(url.path)
+        fixture = self.server.fixtures.get(match.group(1), match.group(2)) if match is not None else None
+        endpoint = (match.group(3) or "repo") if match is not None else None
+        if fixture is None or endpoint not in fixture:
+            self.send_json(404, {"message": "Not Found", "documentation_url": "https://docs.github.com/rest"},
+                           "not_found")
+            return
+
+        body = fixture[endpoint]
+        if endpoint == "repo":
+            # languages are loaded from the url given by the API, which must point to the stand-in
+            body = dict(body, languages_url=f"http://{self.headers.get('Host')}/repos/{match.group(1)}/"
+                                            f"{match.group(2)}/languages")
+        elif endpoint == "releases":
+            params = parse_qs(url.query)
+            per_page = int(params.get("per_page", ["30"])[0])
+            page = int(params.get("page", ["1"])[0])
+            body = body[(page - 1) * per_page:page * per_page]
+        self.send_json(200, body, "ok")
+
+    def send_json(self, status, body, kind):
+        self.send_body(status, "application/json", json.dumps(body), kind, {})
+
+    def send_fault(self, status, content_type, body, kind):
+        headers = {"X-RateLimit-Remaining": "0"} if kind == "rate_limited" else {}
+        if self.server.faults.retry_after is not None:
+            headers["Retry-After"] = str(self.server.faults.retry_after)
+        self.send_body(status, content_type, body, kind, headers)
+
+    def send_body(self, status, content_type, body, kind, headers):
+        data = body.encode("utf-8")
+        # counted before the client can read the response, so the counts include every response it received
+        self.server.count(kind)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+# local stand-in of the GitHub API, which replays the fixtures of the repositories with the injected faults
+class MockGithubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixtures=None, faults=None):
+        super().__init__(address, MockGithubHandler)
+        self.fixtures = fixtures if fixtures is not None else FixtureSet()
+        self.faults = faults if faults is not None else FaultSettings()
+        # number of responses of each kind: ok, not_found, rate_limited, server_error
+        self.responses = {}
+        self.responses_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind):
+        with self.responses_lock:
+            self.responses[kind] = self.responses.get(kind, 0) + 1
+
+    ## Function serves in a background thread
+    ## Returns the thread
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+## Function runs the stand-in until it is interrupted. Point somef to it with SOMEF_GITHUB_API_URL
+def run_mock_server(host="127.0.0.1", port=8001, fixture_dir=None, synthetic=True, **faults):
+    server = MockGithubServer((host, port), FixtureSet(fixture_dir, synthetic), FaultSettings(**faults))
+    logger.info(f"Serving the GitHub API stand-in on {server.url}, use SOMEF_GITHUB_API_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    logger.info("Responses: %s", server.responses)
+
+
+## Function loads the metadata of the repositories with the fetch code of somef (cli.load_repository_metadata,
+## and so rate_limit_get), with workers threads, from the GitHub API at api_url. If api_url is None, a stand-in
+## is started in this process with the fixtures and faults given
+## Returns the report: throughput, latency per repository, retries and time spent backing off
+def run_load_test(repo_urls, workers=8, api_url=None, fixture_dir=None, synthetic=True, **faults):
+    # imported here because the stand-in itself does not need the classifiers
+    from somef import cli
+    server = None
+    if api_url is None:
+        server = MockGithubServer(("127.0.0.1", 0), FixtureSet(fixture_dir, synthetic), FaultSettings(**faults))
+        server.start()
+        api_url = server.url
+    previous_api_url = cli.github_api_url
+    cli.github_api_url = api_url.rstrip("/")
+    local = threading.local()
+    profilers = []
+
+    def load(repo_url):
+        if not hasattr(local, "profiler"):
+            local.session = requests.Session()
+            local.profiler = Profiler()
+            profilers.append(local.profiler)
+        start = time.perf_counter()
+        try:
+            cli.load_repository_metadata(repo_url, {}, profiler=local.profiler, session=local.session)
+            failed = False
+        except (cli.GithubUrlError, cli.GithubApiError, requests.RequestException) as error:
+            logger.warning("Error loading %s: %s", repo_url, error)
+            failed = True
+        return time.perf_counter() - start, failed
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(load, repo_urls))
+    finally:
+        elapsed = time.perf_counter() - start
+        cli.github_api_url = previous_api_url
+        if server is not None:
+            server.stop()
+
+    latencies = np.array([latency for latency, _ in results]) if len(results) > 0 else np.zeros(1)
+    http_calls = sum(profiler.http_calls for profiler in profilers)
+    return {
+        "api_url": api_url,
+        "workers": workers,
+        "repositories": len(results),
+        "failed": sum(failed for _, failed in results),
+        "elapsed": elapsed,
+        "http_calls": http_calls,
+        "requests_per_second": http_calls / elapsed if elapsed > 0 else 0.0,
+        "repositories_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+        "latency": {"p50": float(np.percentile(latencies, 50)), "p95": float(np.percentile(latencies, 95)),
+                    "max": float(latencies.max())},
+        "backoffs": sum(profiler.backoffs for profiler in profilers),
+        "backoff_time": sum(profiler.backoff_time for profiler in profilers),
+        "responses": dict(server.responses) if server is not None else None,
+    }
+
+
+## Function formats the report of run_load_test
+## Returns the lines of text
+def format_load_test(report):
+    latency = report["latency"]
+    lines = [
+        f"{report['repositories']} repositories ({report['failed']} failed) from {report['api_url']} "
+        f"with {report['workers']} workers in {report['elapsed']:.2f} s",
+        f"  {report['http_calls']} requests, {report['requests_per_second']:.1f} requests/s, "
+        f"{report['repositories_per_second']:.1f} repositories/s",
+        f"  latency per repository: p50 {latency['p50'] * 1000:.1f} ms, p95 {latency['p95'] * 1000:.1f} ms, "
+        f"max {latency['max'] * 1000:.1f} ms",
+        f"  {report['backoffs']} retries, {report['backoff_time']:.2f} s backing off",
+    ]
+    if report["responses"] is not None:
+        lines.append("  responses: " + ", ".join(f"{kind} {count}"
+                                                 for kind, count in sorted(report["responses"].items())))
+    return lines
@@ -0,0 +1,58 @@
+import logging
+import sqlite3
+
+from somef.data_to_graph import DataGraph
+
+logger = logging.getLogger(__name__)
+
+
+# keeps the Knowledge Graph on disk as one subgraph per repository, keyed by the
+# id of the repository (obj:Software/{name}). Re-describing a repository replaces
+# only its own subgraph, so the graph can be refreshed incrementally
+class GraphStore:
+    def __init__(self, store_path):
+        self.connection = sqlite3.connect(store_path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS subgraphs (software_id TEXT PRIMARY KEY, ntriples TEXT NOT NULL)"
+            )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM subgraphs").fetchone()[0]
+
+    # builds the subgraph of the somef output and stores it in place of the previous one
+    # returns the id of the repository, or None if the output cannot be identified
+    def replace_somef_data(self, somef_data):
+        subgraph = DataGraph()
+        software_id = subgraph.add_somef_data(somef_data)
+        if software_id is None:
+            logger.error("Error: repository has no name, it cannot be added to the graph store")
+            return None
+
+        ntriples = subgraph.g.serialize(format="nt")
+        if isinstance(ntriples, bytes):
+            ntriples = ntriples.decode("utf-8")
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO subgraphs (software_id, ntriples) VALUES (?, ?)",
+                (str(software_id), ntriples)
+            )
+        return software_id
+
+    def remove(self, software_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM subgraphs WHERE software_id = ?", (str(software_id),))
+
+    # assembles the full graph from all the stored subgraphs
+    def to_data_graph(self):
+        def load_subgraphs():
+            for (ntriples,) in self.connection.execute("SELECT ntriples FROM subgraphs ORDER BY software_id"):
+                subgraph = DataGraph()
+                subgraph.g.parse(data=ntriples, format="nt")
+                yield subgraph
+
+        return DataGraph.merge(load_subgraphs())
+
+    def close(self):
+        self.connection.close()
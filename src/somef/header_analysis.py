@@ -12,6 +12,9 @@ import string
 import collections
 from textblob import Word
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Define wordnet groups
 group = dict()
@@ -89,7 +92,7 @@ def extract_header_content(text): # extract the header and content of text to da
         df = df.append({'Header': i, 'Content': j}, ignore_index=True)
     df['Content'].replace('', np.nan, inplace=True)
     df.dropna(subset=['Content'], inplace=True)
-    print('Extracting headers and content.')
+    logger.info('Extracting headers and content.')
     return df
 
 def find_sim(wordlist, wd):  # returns the max probability between a word and subgroup
@@ -137,7 +140,7 @@ def cleanhtml(text):
 def extract_categories_using_headers(text): # main function
     text = cleanhtml(text)
     data = extract_header_content(text)
-    print('Labeling headers.')
+    logger.info('Labeling headers.')
     if data.empty:
         return {}, [] 
     data['Group'] = data['Header'].apply(lambda row: label_header(row))
@@ -158,7 +161,7 @@ def extract_categories_using_headers(text): # main function
     for key in group_json.keys():
         for ind in range(len(group_json[key])):
             del group_json[key][ind]['Group']
-    print('Converting to json files.')
+    logger.info('Converting to json files.')
 
     # strings without tag
     str_list = data.loc[data['Group'].isna(), ['Content']].values.squeeze().tolist()
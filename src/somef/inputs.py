@@ -0,0 +1,193 @@
+import csv
+from array import array
+import hashlib
+import itertools
+import json
+import logging
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+# names of the column (CSV) or key (JSON lines) with the url of the repository
+url_fields = ("repo_url", "url", "URL", "repository", "codeRepository")
+
+github_url_pattern = re.compile(r"^(?:(?:https?://)?(?:www\.)?github\.com/+|git@github\.com:)([^/\s?#]+)/+([^/\s?#]+?)"
+                                r"(?:\.git)?(?:[/?#].*)?$", flags=re.IGNORECASE)
+
+
+## Function converts the different ways of writing the url of a GitHub repository (http or https, with or
+## without www, a trailing slash or .git, git@github.com:owner/name, a path inside the repository) to
+## https://github.com/owner/name. GitHub names are case insensitive, so they are lowercased
+## Returns the canonical url, or the url without surrounding spaces if it is not a GitHub repository
+def canonical_github_url(url):
+    url = url.strip()
+    match = github_url_pattern.match(url)
+    if match is None:
+        return url
+    return f"https://github.com/{match.group(1).lower()}/{match.group(2).lower()}"
+
+
+# formats of the input files: one url per line, CSV or JSON lines
+in_formats = ("text", "csv", "jsonl")
+
+
+## Function finds the format of an input file from its extension, or for the standard input ("-") from its
+## first line: a JSON object or string is JSON lines, and a line with commas is CSV
+## Returns the format, one of in_formats
+def detect_format(in_file, first_line=""):
+    if in_file == "-":
+        first_line = first_line.strip()
+        if first_line.startswith(("{", '"')):
+            return "jsonl"
+        if "," in first_line:
+            return "csv"
+        return "text"
+    if in_file.endswith(".csv"):
+        return "csv"
+    if in_file.endswith(".jsonl"):
+        return "jsonl"
+    return "text"
+
+
+## Function reads the urls of an input file: one url per line, a CSV file with a url column (or the urls in
+## its first column) or a JSON lines file of urls or objects with a url key. "-" reads from the standard input.
+## The format is in_format, or detected by detect_format if it is None.
+## Empty lines and lines starting with # are ignored, and so are the lines of a JSON lines file that are not valid JSON
+## Yields the urls, one at a time
+def read_urls(in_file, in_format=None):
+    handle = sys.stdin if in_file == "-" else open(in_file, "r", newline="")
+    try:
+        lines = iter(handle)
+        if in_format is None:
+            # the first line is read to detect the format of the standard input, and then read again
+            first_line = next(lines, "")
+            lines = itertools.chain([first_line], lines)
+            in_format = detect_format(in_file, first_line)
+        if in_format == "csv":
+            reader = csv.reader(lines)
+            header = next(reader, [])
+            column = next((header.index(field) for field in url_fields if field in header), None)
+            if column is None:
+                # without a known header, the urls are in the first column, starting with the first line
+                column = 0
+                reader = itertools.chain([header], reader)
+            for row in reader:
+                if len(row) > column and row[column].strip():
+                    yield row[column]
+        else:
+            for line_number, line in enumerate(lines, 1):
+                line = line.strip()
+                if len(line) == 0 or line.startswith("#"):
+                    continue
+                if in_format == "jsonl":
+                    try:
+                        record = json.loads(line)
+                    except ValueError as error:
+                        logger.warning(f"Skipping line {line_number} of {in_file}, it is not valid JSON: {error}")
+                        continue
+                    if isinstance(record, dict):
+                        record = next((record[field] for field in url_fields if field in record), None)
+                    if not isinstance(record, str):
+                        continue
+                    line = record
+                yield line
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+# set of the 64 bit digests of the strings seen, in an open addressing hash table, so that deduplicating
+# takes 8 bytes (16 with the free slots) per unique string whatever its length
+class DigestSet:
+    def __init__(self, capacity=1 << 16):
+        self.table = array("Q", bytes(8 * capacity))
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def digest(text):
+        digest = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        # 0 marks the free slots
+        return digest or 1
+
+    def insert(self, digest):
+        table = self.table
+        mask = len(table) - 1
+        slot = digest & mask
+        while table[slot] != 0:
+            if table[slot] == digest:
+                return False
+            slot = (slot + 1) & mask
+        table[slot] = digest
+        self.size += 1
+        return True
+
+    def grow(self):
+        old_table = self.table
+        self.table = array("Q", bytes(16 * len(old_table)))
+        self.size = 0
+        for digest in old_table:
+            if digest != 0:
+                self.insert(digest)
+
+    ## Function adds a string to the set
+    ## Returns False if it was already in the set
+    def add(self, text):
+        if (self.size + 1) * 2 > len(self.table):
+            self.grow()
+        return self.insert(self.digest(text))
+
+
+## Function parses a shard written as "i/N" (the shard i, counting from 0, of N shards)
+## Returns (i, N)
+def parse_shard(shard):
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"{shard} is not a shard, use i/N")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"The shard {shard} must be between 0/{count} and {count - 1}/{count}")
+    return index, count
+
+
+## Function assigns a repository (by its canonical url) or a document (by its path) to a shard, with a hash
+## that is the same in every machine and every run
+def shard_of(key, shard_count):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") % shard_count
+
+
+def in_shard(key, shard):
+    return shard is None or shard_of(key, shard[1]) == shard[0]
+
+
+# counts of the urls read by unique_urls
+class InputStats:
+    def __init__(self):
+        self.read = 0
+        self.duplicates = 0
+        self.other_shards = 0
+
+    @property
+    def unique(self):
+        return self.read - self.duplicates - self.other_shards
+
+
+## Function canonicalizes the urls and leaves out the ones already seen, and the ones of other shards
+## (given as (i, N)) if a shard is given
+## Yields the unique canonical urls, counting them in stats
+def unique_urls(urls, stats=None, shard=None):
+    if stats is None:
+        stats = InputStats()
+    seen = DigestSet()
+    for url in urls:
+        stats.read += 1
+        url = canonical_github_url(url)
+        if not in_shard(url, shard):
+            stats.other_shards += 1
+        elif seen.add(url):
+            yield url
+        else:
+            stats.duplicates += 1
@@ -0,0 +1,311 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import tarfile
+import tempfile
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# extension of the source files -> language, as named by GitHub
+language_extensions = {
+    ".py": "Python",
+    ".ipynb": "Jupyter Notebook",
+    ".r": "R",
+    ".java": "Java",
+    ".scala": "Scala",
+    ".kt": "Kotlin",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".c": "C",
+    ".h": "C",
+    ".cc": "C++",
+    ".cpp": "C++",
+    ".cxx": "C++",
+    ".hpp": "C++",
+    ".cu": "Cuda",
+    ".cs": "C#",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".rb": "Ruby",
+    ".php": "PHP",
+    ".pl": "Perl",
+    ".sh": "Shell",
+    ".bash": "Shell",
+    ".m": "MATLAB",
+    ".jl": "Julia",
+    ".f90": "Fortran",
+    ".f": "Fortran",
+    ".hs": "Haskell",
+    ".lua": "Lua",
+    ".swift": "Swift",
+    ".html": "HTML",
+    ".css": "CSS",
+    ".tex": "TeX",
+    ".dockerfile": "Dockerfile",
+}
+
+# regular expression found in the license file -> name of the license, as named by GitHub
+license_patterns = [
+    (r"Apache License,?\s+Version 2\.0", "Apache License 2.0"),
+    (r"MIT License|Permission is hereby granted, free of charge", "MIT License"),
+    (r"GNU AFFERO GENERAL PUBLIC LICENSE", "GNU Affero General Public License v3.0"),
+    (r"GNU LESSER GENERAL PUBLIC LICENSE", "GNU Lesser General Public License"),
+    (r"GNU GENERAL PUBLIC LICENSE\s+Version 3", "GNU General Public License v3.0"),
+    (r"GNU GENERAL PUBLIC LICENSE\s+Version 2", "GNU General Public License v2.0"),
+    (r"Mozilla Public License,?\s+(Version|v\.?)\s*2\.0", "Mozilla Public License 2.0"),
+    (r"BSD 3-Clause|Neither the name of", "BSD 3-Clause \"New\" or \"Revised\" License"),
+    (r"BSD 2-Clause|Redistribution and use in source and binary forms", "BSD 2-Clause \"Simplified\" License"),
+    (r"The Unlicense|This is free and unencumbered software", "The Unlicense"),
+    (r"Creative Commons", "Creative Commons"),
+]
+
+readme_names = ["readme.md", "readme.markdown", "readme.rst", "readme.txt", "readme"]
+license_names = ["license", "license.md", "license.txt", "licence", "licence.md", "copying", "copying.md",
+                 "copying.txt"]
+
+
+## Function runs a git command in the repository
+## Returns its output, or None if git is not available or the path is not a git repository
+def run_git(repository_path, *args):
+    try:
+        result = subprocess.run(["git", "-C", repository_path] + list(args), stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+## Function finds a file in the root of the repository, with a case insensitive name
+def find_file(repository_path, names):
+    files = {file_name.lower(): file_name for file_name in os.listdir(repository_path)
+             if os.path.isfile(os.path.join(repository_path, file_name))}
+    for name in names:
+        if name in files:
+            return os.path.join(repository_path, files[name])
+    return None
+
+
+def read_file(file_name):
+    with open(file_name, "r", encoding="utf-8", errors="replace") as fh:
+        return fh.read()
+
+
+## Function parses the owner and name of a GitHub repository from a remote url
+## (https://github.com/owner/name.git or git@github.com:owner/name.git)
+## Returns (owner, name), or None if the remote is not on GitHub
+def parse_github_remote(remote_url):
+    if remote_url.startswith("git@github.com:"):
+        path = remote_url[len("git@github.com:"):]
+    else:
+        url = urlparse(remote_url)
+        if url.netloc.split("@")[-1] != "github.com":
+            return None
+        path = url.path
+    parts = [part for part in path.split("/") if part]
+    if len(parts) != 2:
+        return None
+    owner, name = parts
+    if name.endswith(".git"):
+        name = name[:-4]
+    return owner, name
+
+
+## Function finds the languages of the repository from the extensions of its files
+## Returns the languages, sorted by number of bytes as GitHub does
+def detect_languages(repository_path):
+    language_bytes = {}
+    for root, dirs, files in os.walk(repository_path):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in ("node_modules", "__pycache__")]
+        for file_name in files:
+            extension = os.path.splitext(file_name)[1].lower()
+            if file_name == "Dockerfile":
+                extension = ".dockerfile"
+            if extension in language_extensions:
+                language = language_extensions[extension]
+                try:
+                    size = os.path.getsize(os.path.join(root, file_name))
+                except OSError:
+                    continue
+                language_bytes[language] = language_bytes.get(language, 0) + size
+    return sorted(language_bytes, key=lambda language: -language_bytes[language])
+
+
+def detect_license(license_file):
+    text = read_file(license_file)
+    for pattern, name in license_patterns:
+        if re.search(pattern, text, flags=re.IGNORECASE):
+            return name
+    return "Other"
+
+
+## Function reads the keywords of the packaging files, which are the closest thing to GitHub topics
+def detect_keywords(repository_path):
+    keywords = []
+    setup_cfg = os.path.join(repository_path, "setup.cfg")
+    pyproject = os.path.join(repository_path, "pyproject.toml")
+    package_json = os.path.join(repository_path, "package.json")
+    if os.path.isfile(setup_cfg):
+        match = re.search(r"^keywords\s*=\s*(.+)$", read_file(setup_cfg), flags=re.MULTILINE)
+        if match:
+            keywords += re.split(r"[,\s]+", match.group(1).strip())
+    if os.path.isfile(pyproject):
+        match = re.search(r"^keywords\s*=\s*\[([^\]]*)\]", read_file(pyproject), flags=re.MULTILINE)
+        if match:
+            keywords += re.findall(r"[\"']([^\"']+)[\"']", match.group(1))
+    if os.path.isfile(package_json):
+        try:
+            package_keywords = json.loads(read_file(package_json)).get("keywords", [])
+        except ValueError:
+            package_keywords = []
+        keywords += [keyword for keyword in package_keywords if isinstance(keyword, str)]
+
+    topics = []
+    for keyword in keywords:
+        topic = keyword.strip().lower().replace(" ", "-")
+        if topic and topic not in topics:
+            topics.append(topic)
+    return topics
+
+
+## Function gets the tags of the git repository, which stand for the GitHub releases
+## At most max_releases tags are loaded (all of them if None), without their body if release_body is False
+def load_tags(repository_path, max_releases=None, release_body=True):
+    if max_releases == 0:
+        return []
+    count = [f"--count={max_releases}"] if max_releases is not None else []
+    tags = run_git(repository_path, "for-each-ref", "--sort=-creatordate", *count, "refs/tags",
+                   "--format=%(refname:short)%09%(creatordate:iso-strict)%09%(taggername)%(authorname)%09"
+                   "%(contents:subject)")
+    releases = []
+    if not tags:
+        return releases
+    for line in tags.splitlines():
+        tag_name, date, author, subject = (line.split("\t") + ["", "", ""])[:4]
+        release = {"tag_name": tag_name, "name": tag_name}
+        if date:
+            release["dateCreated"] = date
+            release["datePublished"] = date
+        if author:
+            release["author_name"] = author
+        if subject and release_body:
+            release["body"] = subject
+        releases.append(release)
+    return releases
+
+
+## Function derives the metadata of a local checkout from its working tree and git metadata,
+## using the same keys as load_repository_metadata. No network calls are made
+## The repository is named after its directory (or name, if given) unless it has a GitHub remote.
+## There is no readme_url: a path of this machine means nothing in the output
+## Returns the readme text and the metadata
+def load_local_repository_metadata(repository_path, max_releases=None, release_body=True, name=None):
+    logger.info(f"Loading Local Repository {repository_path} Information....")
+    repository_path = os.path.abspath(repository_path)
+    filtered_resp = {}
+
+    if name is None:
+        name = os.path.basename(repository_path.rstrip(os.sep))
+    owner = None
+    remote_url = run_git(repository_path, "config", "--get", "remote.origin.url")
+    github_remote = parse_github_remote(remote_url) if remote_url else None
+    if github_remote is not None:
+        owner, name = github_remote
+        filtered_resp["codeRepository"] = f"https://github.com/{owner}/{name}"
+        filtered_resp["issueTracker"] = f"https://api.github.com/repos/{owner}/{name}/issues{{/number}}"
+        filtered_resp["downloadUrl"] = f"https://github.com/{owner}/{name}/releases"
+    elif remote_url:
+        filtered_resp["codeRepository"] = remote_url
+
+    filtered_resp["name"] = name
+    if owner is not None:
+        filtered_resp["owner"] = owner
+        filtered_resp["fullName"] = f"{owner}/{name}"
+    else:
+        filtered_resp["fullName"] = name
+
+    first_commit = run_git(repository_path, "log", "--reverse", "--max-parents=0", "--format=%aI")
+    if first_commit:
+        filtered_resp["dateCreated"] = first_commit.splitlines()[0]
+    last_commit = run_git(repository_path, "log", "-1", "--format=%aI")
+    if last_commit:
+        filtered_resp["dateModified"] = last_commit
+
+    license_file = find_file(repository_path, license_names)
+    filtered_resp["license"] = {"name": detect_license(license_file)} if license_file is not None else {}
+
+    topics = detect_keywords(repository_path)
+    if len(topics) > 0:
+        filtered_resp["topics"] = topics
+    filtered_resp["languages"] = detect_languages(repository_path)
+    filtered_resp["releases"] = load_tags(repository_path, max_releases, release_body)
+
+    readme_file = find_file(repository_path, readme_names)
+    if readme_file is None:
+        logger.warning("README Error: no README file in the repository")
+        text = ""
+    else:
+        text = read_file(readme_file)
+
+    logger.info("Repository Information Successfully Loaded.")
+    return text, filtered_resp
+
+
+## Function selects the members of a tarball that can be extracted safely in target_dir: regular files and
+## directories whose path stays inside target_dir. Links (which could point outside target_dir, and then be
+## written through), devices and the rest are left out
+def safe_members(tar, target_dir):
+    target_dir = os.path.realpath(target_dir)
+    members = []
+    for member in tar.getmembers():
+        destination = os.path.realpath(os.path.join(target_dir, member.name))
+        if not (member.isfile() or member.isdir()) or \
+                os.path.commonpath([target_dir, destination]) != target_dir:
+            logger.warning("Skipping the member %s of the tarball", member.name)
+            continue
+        members.append(member)
+    return members
+
+
+# extensions of the tarballs, removed to name the repository after the file
+tarball_extensions = (".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".tbz2", ".txz", ".tar")
+
+
+## Function names a repository after its tarball, without the extension
+def tarball_name(tarball_path):
+    name = os.path.basename(tarball_path)
+    for extension in tarball_extensions:
+        if name.lower().endswith(extension):
+            return name[:-len(extension)]
+    return os.path.splitext(name)[0]
+
+
+## Function extracts a tarball of a repository and loads its metadata
+## If the tarball has a single top level directory, that directory is the repository. Otherwise the
+## repository is the whole tarball, named after the file
+def load_tarball_metadata(tarball_path, max_releases=None, release_body=True):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with tarfile.open(tarball_path) as tar:
+            members = safe_members(tar, tmp_dir)
+            if hasattr(tarfile, "data_filter"):
+                # the extraction filters of python 3.12 (and backported security releases) check the members too
+                tar.extractall(tmp_dir, members=members, filter="data")
+            else:
+                tar.extractall(tmp_dir, members=members)
+        entries = os.listdir(tmp_dir)
+        if len(entries) == 1 and os.path.isdir(os.path.join(tmp_dir, entries[0])):
+            return load_local_repository_metadata(os.path.join(tmp_dir, entries[0]), max_releases, release_body)
+        return load_local_repository_metadata(tmp_dir, max_releases, release_body, name=tarball_name(tarball_path))
+
+
+## Function loads a local repository, either a directory or a tarball
+def load_local_metadata(local_path, max_releases=None, release_body=True):
+    if os.path.isdir(local_path):
+        return load_local_repository_metadata(local_path, max_releases, release_body)
+    return load_tarball_metadata(local_path, max_releases, release_body)
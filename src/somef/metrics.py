@@ -0,0 +1,181 @@
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+openmetrics_content_type = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# upper bounds, in seconds, of the buckets of the duration histograms
+duration_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def format_labels(names, values):
+    if len(names) == 0:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# a metric with one value per combination of its labels. The metrics are not thread safe by themselves,
+# the Metrics that holds them takes a lock
+class Metric:
+    metric_type = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+
+    def render(self):
+        lines = [f"# TYPE {self.name} {self.metric_type}", f"# HELP {self.name} {self.help_text}"]
+        for labels in sorted(self.values):
+            lines.extend(self.samples(labels, self.values[labels]))
+        return lines
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        # counters without labels are exported from the start
+        if len(self.label_names) == 0:
+            self.values[()] = 0
+
+    def inc(self, amount=1, *labels):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self, labels, value):
+        return [f"{self.name}_total{format_labels(self.label_names, labels)} {format_value(value)}"]
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def samples(self, labels, value):
+        return [f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"]
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=duration_buckets):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, *labels):
+        # counts per bucket (not cumulative), count and sum
+        state = self.values.setdefault(labels, [[0] * len(self.buckets), 0, 0.0])
+        state[0][next(index for index, bound in enumerate(self.buckets) if value <= bound)] += 1
+        state[1] += 1
+        state[2] += value
+
+    def samples(self, labels, value):
+        bucket_counts, count, total = value
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            bucket_labels = format_labels(self.label_names + ("le",), labels + (format_value(float(bound)),))
+            samples.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        samples.append(f"{self.name}_count{format_labels(self.label_names, labels)} {count}")
+        samples.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {format_value(float(total))}")
+        return samples
+
+
+# counters and histograms of a batch or service run, updated with the profile record of every repository
+# (see Profiler) and rendered in the OpenMetrics text format
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.repositories = Counter("somef_repositories", "Repositories processed, by outcome (described, "
+                                                          "partial, not_found, or the error)", ["outcome"])
+        self.http_requests = Counter("somef_github_requests", "Requests sent to the GitHub API")
+        self.backoffs = Counter("somef_github_backoffs", "Requests retried after a rate limit or server error")
+        self.backoff_seconds = Counter("somef_github_backoff_seconds", "Seconds spent waiting to retry requests")
+        self.rate_limit_remaining = Gauge("somef_github_rate_limit_remaining",
+                                          "Requests left in the GitHub API quota, as last reported by GitHub")
+        self.cache_lookups = Counter("somef_cache_lookups", "Lookups of the predictions cache", ["result"])
+        self.excerpts = Counter("somef_excerpts_classified", "Excerpts scored by the classifiers")
+        self.repository_seconds = Histogram("somef_repository_duration_seconds",
+                                            "Time to describe a repository")
+        self.stage_seconds = Histogram("somef_stage_duration_seconds", "Time of each stage of the pipeline",
+                                       ["stage"])
+        self.start_time = Gauge("somef_start_time_seconds", "Time the run started, as a Unix timestamp")
+        self.start_time.set(time.time())
+
+    def metrics(self):
+        return [self.repositories, self.http_requests, self.backoffs, self.backoff_seconds,
+                self.rate_limit_remaining, self.cache_lookups, self.excerpts, self.repository_seconds,
+                self.stage_seconds, self.start_time]
+
+    ## Function updates the metrics with the profile record of a repository
+    def observe_repository(self, record):
+        with self.lock:
+            self.repositories.inc(1, record.get("outcome") or "described")
+            self.http_requests.inc(record.get("http_calls", 0))
+            self.backoffs.inc(record.get("backoffs", 0))
+            self.backoff_seconds.inc(float(record.get("backoff_time", 0.0)))
+            if record.get("rate_limit_remaining") is not None:
+                self.rate_limit_remaining.set(record["rate_limit_remaining"])
+            if "wall_time" in record:
+                self.repository_seconds.observe(record["wall_time"])
+            for stage in record.get("stages", []):
+                self.stage_seconds.observe(stage["wall_time"], stage["stage"])
+                if stage["stage"] == "cache":
+                    self.cache_lookups.inc(1, "hit" if stage.get("hit") else "miss")
+                elif stage["stage"] == "run_classifiers" and stage.get("categories", 0) > 0:
+                    self.excerpts.inc(stage.get("excerpts", 0))
+
+    def render(self):
+        with self.lock:
+            lines = [line for metric in self.metrics() for line in metric.render()]
+        return "\n".join(lines + ["# EOF"]) + "\n"
+
+    ## Function writes the metrics to a file, replacing it at once so that a reader never sees half of it
+    def save(self, metrics_file):
+        temporary_file = f"{metrics_file}.tmp"
+        with open(temporary_file, "w") as fh:
+            fh.write(self.render())
+        os.replace(temporary_file, metrics_file)
+
+
+# writes the metrics to a file every interval seconds in a background thread, and once more when stopped
+class MetricsWriter(threading.Thread):
+    def __init__(self, metrics, metrics_file, interval=15):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.metrics_file = metrics_file
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.save()
+
+    def save(self):
+        try:
+            self.metrics.save(self.metrics_file)
+        except OSError as error:
+            logger.warning("Cannot save the metrics to %s: %s", self.metrics_file, error)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.save()
@@ -0,0 +1,61 @@
+import itertools
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+## Function tells the output of --doc_dir (a dictionary of the descriptions by path) from the description of a
+## repository, whose values are lists of excerpts or metadata excerpts ({'excerpt', 'confidence', 'technique'})
+def is_document_map(data):
+    return isinstance(data, dict) and len(data) > 0 and \
+        all(value is None or (isinstance(value, dict) and 'excerpt' not in value) for value in data.values())
+
+
+## Function reads the records of an output of somef: a list of repositories (--in_file), a dictionary of
+## documents by path (--doc_dir) or a single repository, or a JSON lines file with one of those per line
+## Yields (path, description) for the documents and (None, description) for the repositories
+def read_output_records(in_file):
+    with open(in_file, "r") as fh:
+        if in_file.endswith(".jsonl"):
+            outputs = (json.loads(line) for line in fh if line.strip())
+        else:
+            outputs = [json.load(fh)]
+        for data in outputs:
+            if isinstance(data, list):
+                for record in data:
+                    yield None, record
+            elif is_document_map(data):
+                yield from data.items()
+            else:
+                yield None, data
+
+
+## Function merges the outputs of several runs (for example, one per shard) into one output. A .jsonl output is
+## written record by record; a .json output is a list of repositories, or a dictionary of documents by path
+## Returns the number of records merged
+def merge_output_files(in_files, out_file):
+    records = itertools.chain.from_iterable(read_output_records(in_file) for in_file in in_files)
+    count = 0
+    logger.info("Saving merged output to %s", out_file)
+    if out_file.endswith(".jsonl"):
+        with open(out_file, "w") as fh:
+            for document, record in records:
+                fh.write(json.dumps(record if document is None else {document: record}) + "\n")
+                count += 1
+        return count
+
+    repositories, documents = [], {}
+    for document, record in records:
+        if document is None:
+            repositories.append(record)
+        else:
+            documents[document] = record
+    if len(repositories) > 0 and len(documents) > 0:
+        raise ValueError("The outputs of --doc_dir cannot be merged with the outputs of repositories")
+    with open(out_file, "w") as fh:
+        if len(documents) > 0:
+            json.dump({document: documents[document] for document in sorted(documents)}, fh)
+        else:
+            json.dump(repositories, fh)
+    return len(repositories) + len(documents)
@@ -0,0 +1,232 @@
+import cProfile
+import json
+import logging
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+## Function measures the resident memory of the process, in bytes
+def resident_memory():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # without /proc, the peak resident memory is the closest measure (in KiB on Linux, in bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+## Function measures the memory of the process that is not shared with other processes (e.g. with the parent of
+## a forked worker), in bytes. Falls back to the resident memory where it cannot be measured
+def private_memory():
+    try:
+        with open("/proc/self/smaps_rollup") as fh:
+            return sum(int(line.split()[1]) * 1024 for line in fh if line.startswith(("Private_Clean:",
+                                                                                        "Private_Dirty:")))
+    except (OSError, ValueError):
+        return resident_memory()
+
+
+## Function measures the peak resident memory of the process (since the last reset_peak_resident_memory), in bytes
+def peak_resident_memory():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+## Function resets the peak resident memory of the process to its current resident memory (Linux only)
+## Returns False if it cannot be reset, and then the peak is the peak of the whole process
+def reset_peak_resident_memory():
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+## Function compares two tracemalloc snapshots
+## Returns the top allocations (by size allocated between them) as a list of {location, size, count}
+def top_allocations(snapshot_start, snapshot_end, top):
+    statistics = snapshot_end.compare_to(snapshot_start, "lineno")
+    return [{"location": f"{statistic.traceback[0].filename}:{statistic.traceback[0].lineno}",
+             "size": statistic.size_diff, "count": statistic.count_diff}
+            for statistic in statistics[:top] if statistic.size_diff > 0]
+
+
+# records the wall time, CPU time, input sizes and HTTP calls of every stage of the
+# describe pipeline, per repository. Stages that run outside of a repository
+# (e.g. generating the Knowledge Graph) are recorded at the run level.
+# If metrics (somef.metrics.Metrics) are given, they are updated with every repository finished
+class Profiler:
+    def __init__(self, cprofile_stage=None, trace_memory=False, metrics=None, trace_rss=False, trace_allocations=0):
+        self.repositories = []
+        self.metrics = metrics
+        self.stages = []
+        self.current = None
+        self.http_calls = 0
+        # requests retried because of rate limiting or server errors, and the time spent waiting for them
+        self.backoffs = 0
+        self.backoff_time = 0.0
+        # requests left in the GitHub API quota, as reported by the last response
+        self.rate_limit_remaining = None
+        # if given, the stage with this name is also profiled with cProfile
+        self.cprofile_stage = cprofile_stage
+        self.cprofile = cProfile.Profile() if cprofile_stage is not None else None
+        # if True, the peak memory allocated by Python during each stage is recorded too
+        self.trace_memory = trace_memory
+        # if True, the resident memory of the process at the end of each stage, and its peak during the stage,
+        # are recorded too
+        self.trace_rss = trace_rss
+        self.peak_rss_resets = trace_rss and reset_peak_resident_memory()
+        # if more than 0, the locations that allocated the most memory during each stage are recorded too
+        self.trace_allocations = trace_allocations
+        if (trace_memory or trace_allocations > 0) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # the settings of the profilers of the worker processes, whose records are added with add_repository
+    def settings(self):
+        return {"trace_memory": self.trace_memory, "trace_rss": self.trace_rss,
+                "trace_allocations": self.trace_allocations}
+
+    def start_repo(self, name):
+        self.current = {"repository": name, "stages": [], "http_calls": self.http_calls, "backoffs": self.backoffs,
+                        "backoff_time": self.backoff_time}
+        self.repositories.append(self.current)
+
+    # outcome: described, partial, not_found or the name of the error raised
+    def end_repo(self, outcome=None):
+        if self.current is not None:
+            self.current["http_calls"] = self.http_calls - self.current["http_calls"]
+            self.current["backoffs"] = self.backoffs - self.current["backoffs"]
+            self.current["backoff_time"] = self.backoff_time - self.current["backoff_time"]
+            self.current["rate_limit_remaining"] = self.rate_limit_remaining
+            self.current["wall_time"] = sum(stage["wall_time"] for stage in self.current["stages"])
+            self.current["cpu_time"] = sum(stage["cpu_time"] for stage in self.current["stages"])
+            if self.trace_rss:
+                self.current["rss"] = resident_memory()
+                self.current["pid"] = os.getpid()
+            if outcome is not None:
+                self.current["outcome"] = outcome
+            if self.metrics is not None:
+                self.metrics.observe_repository(self.current)
+        self.current = None
+
+    # adds the record of a repository profiled by another Profiler, e.g. in a worker process
+    def add_repository(self, record):
+        self.repositories.append(record)
+        if self.metrics is not None:
+            self.metrics.observe_repository(record)
+
+    def count_http(self):
+        self.http_calls += 1
+
+    def record_rate_limit(self, remaining):
+        self.rate_limit_remaining = remaining
+
+    def count_backoff(self, wait):
+        self.backoffs += 1
+        self.backoff_time += wait
+
+    # times the code in the with block. The yielded dict can be used to record the input sizes
+    # of the stage, e.g. stage["excerpts"] = len(excerpts)
+    @contextmanager
+    def stage(self, name):
+        record = {"stage": name}
+        http_calls = self.http_calls
+        profile_stage = self.cprofile is not None and name == self.cprofile_stage
+        if profile_stage:
+            self.cprofile.enable()
+        if self.trace_memory:
+            memory_start = tracemalloc.get_traced_memory()[0]
+            # reset_peak is only available from python 3.9, before that the peak is the peak of the run
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+        if self.peak_rss_resets:
+            reset_peak_resident_memory()
+        snapshot_start = tracemalloc.take_snapshot() if self.trace_allocations > 0 else None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = time.perf_counter() - wall_start
+            record["cpu_time"] = time.process_time() - cpu_start
+            if profile_stage:
+                self.cprofile.disable()
+            if self.trace_memory:
+                record["peak_memory"] = tracemalloc.get_traced_memory()[1] - memory_start
+            if self.trace_rss:
+                record["rss"] = resident_memory()
+                # without resetting the peak, it is the peak of the process so far
+                record["peak_rss"] = peak_resident_memory()
+            if snapshot_start is not None:
+                record["top_allocations"] = top_allocations(snapshot_start, tracemalloc.take_snapshot(),
+                                                            self.trace_allocations)
+            record["http_calls"] = self.http_calls - http_calls
+            if self.current is not None:
+                self.current["stages"].append(record)
+            else:
+                self.stages.append(record)
+
+    # totals of every stage over all the repositories, with the maximum peak resident memory and the
+    # locations that allocated the most memory over all of them, if they were recorded, and the
+    # hits and misses of the cache lookups
+    def summary(self):
+        summary = {}
+        allocations = {}
+        for repository in self.repositories:
+            for record in repository["stages"]:
+                totals = summary.setdefault(record["stage"], {"count": 0, "wall_time": 0.0, "cpu_time": 0.0,
+                                                              "http_calls": 0})
+                totals["count"] += 1
+                totals["wall_time"] += record["wall_time"]
+                totals["cpu_time"] += record["cpu_time"]
+                totals["http_calls"] += record["http_calls"]
+                if "hit" in record:
+                    totals["hits"] = totals.get("hits", 0) + int(record["hit"])
+                    totals["misses"] = totals.get("misses", 0) + int(not record["hit"])
+                if "peak_rss" in record:
+                    totals["peak_rss"] = max(totals.get("peak_rss", 0), record["peak_rss"])
+                for allocation in record.get("top_allocations", []):
+                    stage_allocations = allocations.setdefault(record["stage"], {})
+                    size, count = stage_allocations.get(allocation["location"], (0, 0))
+                    stage_allocations[allocation["location"]] = (size + allocation["size"],
+                                                                 count + allocation["count"])
+        for stage, stage_allocations in allocations.items():
+            locations = sorted(stage_allocations, key=lambda location: stage_allocations[location][0], reverse=True)
+            summary[stage]["top_allocations"] = [
+                {"location": location, "size": stage_allocations[location][0],
+                 "count": stage_allocations[location][1]}
+                for location in locations[:self.trace_allocations or len(locations)]
+            ]
+        return summary
+
+    def report(self):
+        return {
+            "summary": self.summary(),
+            "repositories": self.repositories,
+            "stages": self.stages,
+            "http_calls": self.http_calls,
+            "backoffs": self.backoffs,
+            "backoff_time": self.backoff_time,
+        }
+
+    # saves the JSON report, and the cProfile dump (if any) next to it
+    def save(self, report_file):
+        logger.info("Saving profiling report to %s", report_file)
+        with open(report_file, "w") as output:
+            json.dump(self.report(), output, indent=2)
+        if self.cprofile is not None:
+            cprofile_file = f"{report_file}.{self.cprofile_stage}.prof"
+            logger.info("Saving cProfile data to %s", cprofile_file)
+            self.cprofile.dump_stats(cprofile_file)
@@ -0,0 +1,139 @@
+import copy
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+from sklearn.base import clone
+
+from somef import training
+
+logger = logging.getLogger(__name__)
+
+
+## Function splits a pipeline of the classifiers (vectorizer + classifier) into its two steps
+def pipeline_steps(model):
+    vectorizer, classifier = model.steps[0][1], model.steps[-1][1]
+    if not hasattr(vectorizer, "vocabulary_"):
+        raise ValueError(f"{type(vectorizer).__name__} has no vocabulary to prune")
+    return vectorizer, classifier
+
+
+## Function computes how much each feature counts in the decision of the classifier: the absolute value of
+## the coefficient of linear models, or the difference of the log probabilities of both classes for Naive Bayes
+def feature_weights(classifier):
+    if hasattr(classifier, "coef_"):
+        return np.abs(np.asarray(classifier.coef_)).max(axis=0)
+    if hasattr(classifier, "feature_log_prob_"):
+        return np.abs(classifier.feature_log_prob_[1] - classifier.feature_log_prob_[0])
+    raise ValueError(f"The features of {type(classifier).__name__} cannot be pruned")
+
+
+## Function counts the documents of the corpus each feature of the vectorizer appears in
+def document_frequencies(vectorizer, excerpts):
+    return np.asarray((vectorizer.transform(excerpts) > 0).sum(axis=0)).ravel()
+
+
+## Function chooses the features to keep: the ones in at least min_df excerpts of the corpus, with a weight of
+## at least min_weight, and of those the keep (fraction if below 1, number otherwise) with the highest weight
+## Returns the sorted indices of the features kept
+def select_features(weights, frequencies=None, keep=None, min_weight=0.0, min_df=1):
+    candidates = weights >= min_weight
+    if frequencies is not None:
+        candidates &= frequencies >= min_df
+    indices = np.flatnonzero(candidates)
+    if keep is not None:
+        count = int(round(keep * len(weights))) if keep < 1 else int(keep)
+        indices = indices[np.argsort(-weights[indices], kind="stable")[:count]]
+    return np.sort(indices)
+
+
+## Function removes the features that are not kept from the vocabulary of the vectorizer and from the
+## classifier, without training again. The terms pruned by max_df/min_df when the model was trained
+## (stop_words_) are only needed for introspection and are dropped too
+## Returns the slimmed model
+def slim_model(model, kept):
+    model = copy.deepcopy(model)
+    vectorizer, classifier = pipeline_steps(model)
+    new_index = {int(old): new for new, old in enumerate(kept)}
+    vectorizer.vocabulary_ = {term: new_index[index] for term, index in vectorizer.vocabulary_.items()
+                              if index in new_index}
+    if hasattr(vectorizer, "stop_words_"):
+        vectorizer.stop_words_ = set()
+    if hasattr(vectorizer, "idf_"):
+        vectorizer.idf_ = vectorizer.idf_[kept]
+        # recent versions of scikit-learn check the number of features in the inner TfidfTransformer
+        if hasattr(getattr(vectorizer, "_tfidf", None), "n_features_in_"):
+            vectorizer._tfidf.n_features_in_ = len(kept)
+    for attribute in ("coef_", "feature_log_prob_", "feature_count_"):
+        if hasattr(classifier, attribute):
+            setattr(classifier, attribute, np.asarray(getattr(classifier, attribute))[:, kept])
+    if hasattr(classifier, "n_features_in_"):
+        classifier.n_features_in_ = len(kept)
+    return model
+
+
+## Function trains the model again, with its vocabulary restricted to the features kept
+def refit_model(model, kept, excerpts, labels):
+    vectorizer, _ = pipeline_steps(model)
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    refitted = clone(model)
+    refitted.steps[0][1].set_params(vocabulary=[terms[index] for index in kept])
+    refitted.fit(excerpts, labels)
+    return refitted
+
+
+## Function measures a model on the corpus as run_classifiers uses it (predict_proba over all the excerpts)
+def measure(model, excerpts, labels, threshold=0.8, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scores = model.predict_proba(excerpts)[:, 1]
+        timings.append(time.perf_counter() - start)
+    record = training.score(labels, scores >= threshold)
+    record["features"] = len(model.steps[0][1].vocabulary_)
+    record["model_size"] = len(pickle.dumps(model))
+    record["classify_time"] = min(timings)
+    return record
+
+
+## Function prunes the features of the model of a category, evaluating it on the corpus before and after
+## The slimmed model is saved in output (if given)
+## Returns the report, with the measures of the original and the pruned model
+def prune(model_file, corpus_dir, category, output=None, keep=None, min_weight=0.0, min_df=1, refit=False,
+          threshold=0.8, negative_ratio=0.25, seed=0):
+    with open(model_file, "rb") as fh:
+        model = pickle.load(fh)
+    vectorizer, classifier = pipeline_steps(model)
+    excerpts, labels = training.build_training_set(training.load_corpus(corpus_dir), category, negative_ratio, seed)
+
+    frequencies = document_frequencies(vectorizer, excerpts) if min_df > 1 else None
+    kept = select_features(feature_weights(classifier), frequencies, keep, min_weight, min_df)
+    if len(kept) == 0:
+        raise ValueError("No feature is left after pruning")
+    logger.info("Keeping %d of %d features", len(kept), len(vectorizer.vocabulary_))
+    pruned = refit_model(model, kept, excerpts, labels) if refit else slim_model(model, kept)
+
+    report = {"model": model_file, "category": category, "refit": refit,
+              "original": measure(model, excerpts, labels, threshold),
+              "pruned": measure(pruned, excerpts, labels, threshold)}
+    report["accuracy_delta"] = report["pruned"]["accuracy"] - report["original"]["accuracy"]
+    report["f1_delta"] = report["pruned"]["f1"] - report["original"]["f1"]
+    if output is not None:
+        logger.info("Saving pruned model to %s", output)
+        with open(output, "wb") as fh:
+            pickle.dump(pruned, fh)
+        report["output"] = output
+        report["pruned"]["file_size"] = os.path.getsize(output)
+    report["original"]["file_size"] = os.path.getsize(model_file)
+    return report
+
+
+def print_pruning(report):
+    print(f"{'':<10}{'features':>10}{'size (KiB)':>12}{'accuracy':>10}{'f1':>8}{'classify (ms)':>15}")
+    for name in ("original", "pruned"):
+        record = report[name]
+        print(f"{name:<10}{record['features']:>10}{record['model_size'] / 1024:>12.1f}{record['accuracy']:>10.3f}"
+              f"{record['f1']:>8.3f}{record['classify_time'] * 1000:>15.2f}")
+    print(f"accuracy delta {report['accuracy_delta']:+.4f}, f1 delta {report['f1_delta']:+.4f}")
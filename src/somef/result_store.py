@@ -0,0 +1,185 @@
+import json
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# metadata of the output kept as columns of the repositories table, so that they can be queried
+metadata_columns = {
+    "full_name": "fullName",
+    "name": "name",
+    "owner": "owner",
+    "code_repository": "codeRepository",
+    "date_created": "dateCreated",
+    "date_modified": "dateModified",
+}
+
+
+## Function reads the value of a metadata field of the output ({'excerpt', 'confidence', 'technique'})
+def metadata_value(repo_data, key):
+    value = repo_data.get(key)
+    if isinstance(value, dict):
+        return value.get("excerpt")
+    return None
+
+
+## Function finds the excerpts of the categories of the output (every field that is a list of excerpts)
+## Yields (category, position, excerpt, confidence, technique)
+def output_excerpts(repo_data):
+    for category, excerpts in repo_data.items():
+        if not isinstance(excerpts, list):
+            continue
+        for position, excerpt in enumerate(excerpts):
+            if not isinstance(excerpt, dict) or "excerpt" not in excerpt:
+                continue
+            confidence = excerpt.get("confidence") or [0.0]
+            yield (category, position, str(excerpt["excerpt"]), float(max(confidence)),
+                   excerpt.get("technique"))
+
+
+## Function turns the words of a query into FTS5 strings, so that punctuation (pip install -e .) is not
+## read as the FTS5 query syntax
+def quote_query(query):
+    return " ".join('"' + token.replace('"', '""') + '"' for token in query.split())
+
+
+# stores the outputs of somef in a SQLite database: one row per repository (its metadata and the whole
+# output as JSON) and one row per excerpt of every category, with indexes to find the repositories by
+# name, category and confidence. Describing a repository again replaces its rows. The database is in
+# WAL mode, so several processes can write to it while others read it.
+# The excerpts are also in a full text index (FTS5), kept up to date by triggers, if SQLite has FTS5
+class ResultStore:
+    def __init__(self, store_path):
+        self.connection = sqlite3.connect(store_path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS repositories (repo_id INTEGER PRIMARY KEY, source TEXT NOT NULL UNIQUE, "
+                + ", ".join(f"{column} TEXT" for column in metadata_columns)
+                + ", license TEXT, languages TEXT, topics TEXT, partial TEXT, data TEXT NOT NULL, updated REAL)"
+            )
+            # the excerpts have an explicit id, used as the rowid of the full text index: the implicit rowid
+            # of a table without one can change with VACUUM
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS excerpts (excerpt_id INTEGER PRIMARY KEY, repo_id INTEGER NOT NULL "
+                "REFERENCES repositories ON DELETE CASCADE, category TEXT NOT NULL, position INTEGER NOT NULL, "
+                "excerpt TEXT NOT NULL, confidence REAL NOT NULL, technique TEXT, UNIQUE (repo_id, category, position))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS repositories_full_name ON repositories (full_name)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS excerpts_category ON excerpts (category, confidence, repo_id)"
+            )
+        self.has_index = self.create_index()
+
+    ## Function creates the full text index of the excerpts, and the triggers that update it with the table
+    ## Returns False if SQLite was built without FTS5
+    def create_index(self):
+        exists = self.connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'excerpts_index'"
+        ).fetchone()[0] > 0
+        if exists:
+            return True
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "CREATE VIRTUAL TABLE excerpts_index USING fts5(category UNINDEXED, excerpt, content='excerpts', "
+                    "content_rowid='excerpt_id')"
+                )
+                self.connection.execute(
+                    "CREATE TRIGGER excerpts_insert AFTER INSERT ON excerpts BEGIN "
+                    "INSERT INTO excerpts_index (rowid, category, excerpt) VALUES (new.excerpt_id, new.category, "
+                    "new.excerpt); END"
+                )
+                self.connection.execute(
+                    "CREATE TRIGGER excerpts_delete AFTER DELETE ON excerpts BEGIN "
+                    "INSERT INTO excerpts_index (excerpts_index, rowid, category, excerpt) VALUES ('delete', "
+                    "old.excerpt_id, old.category, old.excerpt); END"
+                )
+                # the excerpts stored before the index existed (by a SQLite without FTS5)
+                self.connection.execute("INSERT INTO excerpts_index (excerpts_index) VALUES ('rebuild')")
+        except sqlite3.OperationalError as error:
+            logger.warning("The excerpts cannot be indexed for full text search: %s", error)
+            return False
+        return True
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM repositories").fetchone()[0]
+
+    ## Function stores the output of a repository, replacing the one stored for the same source
+    ## Returns the id of the repository in the database
+    def upsert(self, source, repo_data):
+        metadata = [metadata_value(repo_data, key) for key in metadata_columns.values()]
+        metadata = [value if value is None or isinstance(value, str) else json.dumps(value) for value in metadata]
+        license_info = metadata_value(repo_data, "license")
+        license_name = license_info.get("name") if isinstance(license_info, dict) else None
+        languages = metadata_value(repo_data, "languages")
+        topics = metadata_value(repo_data, "topics")
+        partial = repo_data.get("partial")
+        row = [source] + metadata + [license_name,
+                                     json.dumps(languages) if languages is not None else None,
+                                     json.dumps(topics) if topics is not None else None,
+                                     json.dumps(partial) if partial is not None else None,
+                                     json.dumps(repo_data), time.time()]
+        columns = ["source"] + list(metadata_columns) + ["license", "languages", "topics", "partial", "data",
+                                                          "updated"]
+        with self.connection:
+            self.connection.execute(
+                f"INSERT INTO repositories ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (source) DO UPDATE SET "
+                + ", ".join(f"{column} = excluded.{column}" for column in columns[1:]),
+                row
+            )
+            (repo_id,) = self.connection.execute("SELECT repo_id FROM repositories WHERE source = ?",
+                                                 (source,)).fetchone()
+            self.connection.execute("DELETE FROM excerpts WHERE repo_id = ?", (repo_id,))
+            self.connection.executemany(
+                "INSERT INTO excerpts (repo_id, category, position, excerpt, confidence, technique) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((repo_id,) + excerpt for excerpt in output_excerpts(repo_data))
+            )
+        return repo_id
+
+    def remove(self, source):
+        with self.connection:
+            self.connection.execute("DELETE FROM repositories WHERE source = ?", (source,))
+
+    ## Function returns the output stored for a source, or None
+    def get(self, source):
+        row = self.connection.execute("SELECT data FROM repositories WHERE source = ?", (source,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    ## Function finds the repositories with at least one excerpt of the category with the given confidence
+    ## Returns the sorted list of their sources
+    def sources_with(self, category, min_confidence=0.0):
+        return [source for (source,) in self.connection.execute(
+            "SELECT source FROM repositories WHERE repo_id IN "
+            "(SELECT repo_id FROM excerpts WHERE category = ? AND confidence >= ?) ORDER BY source",
+            (category, min_confidence)
+        )]
+
+    ## Function returns the (excerpt, confidence, technique) of a category of a repository
+    def excerpts(self, source, category):
+        return self.connection.execute(
+            "SELECT excerpt, confidence, technique FROM excerpts JOIN repositories USING (repo_id) "
+            "WHERE source = ? AND category = ? ORDER BY position", (source, category)
+        ).fetchall()
+
+    ## Function finds the excerpts that match the query (all of its words, or an FTS5 query if raw is True),
+    ## in one category or in all of them, best matches (by BM25) first
+    ## Returns a list of (source, category, excerpt, confidence, score)
+    def search(self, query, category=None, limit=20, raw=False):
+        if not self.has_index:
+            raise RuntimeError("SQLite was built without FTS5, the excerpts cannot be searched")
+        condition = "" if category is None else "AND excerpts_index.category = ? "
+        parameters = [query if raw else quote_query(query)] + ([] if category is None else [category]) + [limit]
+        return self.connection.execute(
+            "SELECT source, excerpts.category, excerpts.excerpt, confidence, bm25(excerpts_index) AS score "
+            "FROM excerpts_index JOIN excerpts ON excerpts.excerpt_id = excerpts_index.rowid JOIN repositories "
+            "USING (repo_id) WHERE excerpts_index MATCH ? " + condition + "ORDER BY score LIMIT ?",
+            parameters
+        ).fetchall()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,126 @@
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+
+from somef import header_analysis
+from somef.describer import Describer
+from somef.metrics import Metrics, openmetrics_content_type
+from somef.profiling import Profiler
+
+logger = logging.getLogger(__name__)
+
+
+## Function loads the WordNet tables before the first request arrives, so that no request pays for them
+## (the classifiers are loaded by the Describer)
+def warm_up():
+    # the WordNet data is only read from disk the first time a word is looked up
+    header_analysis.label_header("installation")
+
+
+class DescribeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self.send_body(200, openmetrics_content_type, self.server.metrics.render().encode("utf-8"))
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    # expects a JSON body with one of "repo_url" or "readme" (the text of a README),
+    # and optionally a "threshold"
+    def do_POST(self):
+        if self.path != "/describe":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {"error": "The body must be a JSON object"})
+            return
+        if not isinstance(request, dict) or ("repo_url" in request) == ("readme" in request):
+            self.send_json(400, {"error": "Exactly one of repo_url or readme must be given"})
+            return
+        threshold = request.get("threshold", self.server.describer.threshold)
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+            self.send_json(400, {"error": "The threshold must be a number between 0 and 1"})
+            return
+
+        start = time.perf_counter()
+        if not self.server.slots.acquire(timeout=self.server.queue_timeout):
+            self.send_json(503, {"error": "Too many concurrent requests"})
+            return
+        # every slot has its own session, so that concurrent requests do not share one
+        session = self.server.sessions.get()
+        try:
+            queued_time = time.perf_counter() - start
+            profiler = Profiler(metrics=self.server.metrics)
+            result = self.server.describer.describe(repo_url=request.get("repo_url"),
+                                                    readme_text=request.get("readme"), profiler=profiler,
+                                                    threshold=threshold, session=session)
+        except Exception as error:
+            self.send_json(500, {"error": str(error)})
+            return
+        finally:
+            self.server.sessions.put(session)
+            self.server.slots.release()
+
+        timing = {
+            "total_time": time.perf_counter() - start,
+            "queued_time": queued_time,
+            "stages": profiler.repositories[0]["stages"],
+        }
+        if result is None:
+            self.send_json(404, {"error": "Repository not found", "timing": timing})
+        else:
+            self.send_json(200, {"result": result, "timing": timing})
+
+    def send_json(self, status, body):
+        self.send_body(status, "application/json", json.dumps(body).encode("utf-8"))
+
+    def send_body(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# describe service: at most max_concurrency requests are processed at the same time, each one with its own
+# HTTP session, and the rest wait up to queue_timeout seconds
+class DescribeServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, describer, max_concurrency=4, queue_timeout=30):
+        super().__init__(address, DescribeHandler)
+        self.describer = describer
+        self.metrics = Metrics()
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.sessions = queue.Queue()
+        for _ in range(max_concurrency):
+            self.sessions.put(requests.Session())
+        self.queue_timeout = queue_timeout
+
+
+## Function runs the describe service until it is interrupted
+## At most max_concurrency requests are processed at the same time, the rest wait up to queue_timeout seconds
+def run_server(host="127.0.0.1", port=8000, threshold=0.8, max_concurrency=4, queue_timeout=30):
+    logger.info("Loading models")
+    describer = Describer(threshold=threshold)
+    warm_up()
+
+    server = DescribeServer((host, port), describer, max_concurrency, queue_timeout)
+    logger.info(f"Serving on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+from somef import benchmark
+from somef.profiling import Profiler
+
+
+# profiles two stages of a README without the classifiers, and records whether the allocations were traced
+def fake_pipeline(traced):
+    def run_pipeline(name, text, threshold, file_paths, profiler):
+        traced.append(tracemalloc.is_tracing())
+        profiler.start_repo(name)
+        with profiler.stage("header_analysis"):
+            sections = [text.upper() for _ in range(100)]
+        with profiler.stage("classify"):
+            len(sections)
+        profiler.end_repo()
+    return run_pipeline
+
+
+def scale_report(p50s):
+    return {"stages": {stage: {"p50": p50} for stage, p50 in p50s.items()}}
+
+
+class BenchmarkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for name, text in (("b.md", "# B\n"), ("a.md", "# A\n"), ("notes.txt", "notes")):
+            with open(os.path.join(self.tmp_dir.name, name), "w") as fh:
+                fh.write(text)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_corpus(self):
+        self.assertEqual(benchmark.load_corpus(self.tmp_dir.name), [("a.md", "# A\n"), ("b.md", "# B\n")])
+        self.assertEqual(benchmark.load_corpus(self.tmp_dir.name, "*.txt"), [("notes.txt", "notes")])
+        self.assertEqual(benchmark.scale_text("a", 3), "a\n\na\n\na")
+
+    def test_summarize(self):
+        profiler = Profiler()
+        tracing = tracemalloc.is_tracing()
+        memory_profiler = Profiler(trace_memory=True)
+        fake_pipeline([])("a.md", "# A\n" * 1000, 0.8, {}, memory_profiler)
+        if not tracing:
+            tracemalloc.stop()
+        for _ in range(4):
+            fake_pipeline([])("a.md", "# A\n", 0.8, {}, profiler)
+        summary = benchmark.summarize(profiler, memory_profiler)
+        self.assertEqual(list(summary), ["header_analysis", "classify"])
+        self.assertEqual(summary["header_analysis"]["count"], 4)
+        self.assertLessEqual(summary["header_analysis"]["p50"], summary["header_analysis"]["p99"])
+        self.assertGreater(summary["header_analysis"]["peak_memory"], 4000 * 100)
+        # without memory profiler, the records of the timed runs have no peak memory
+        self.assertEqual(benchmark.summarize(profiler)["classify"]["peak_memory"], 0)
+
+    def test_run_benchmark(self):
+        traced = []
+        with mock.patch.object(benchmark, "run_pipeline", fake_pipeline(traced)):
+            report = benchmark.run_benchmark(self.tmp_dir.name, scales=(1, 2), repeat=3, file_paths={})
+        self.assertEqual(list(report["scales"]), ["1", "2"])
+        self.assertEqual(report["scales"]["2"]["stages"]["header_analysis"]["count"], 6)
+        self.assertGreater(report["scales"]["2"]["stages"]["header_analysis"]["peak_memory"], 0)
+        # the timed runs are not traced, and tracing is stopped once the memory is measured
+        self.assertEqual(traced, [False] * 6 + [True] * 2 + [False] * 6 + [True] * 2)
+        self.assertFalse(tracemalloc.is_tracing())
+        with self.assertRaises(ValueError):
+            benchmark.run_benchmark(self.tmp_dir.name, pattern="*.rst", file_paths={})
+
+    def test_compare_with_baseline(self):
+        baseline = {"scales": {"1": scale_report({"header_analysis": 0.010, "classify": 0.002}),
+                               "4": scale_report({"header_analysis": 0.040})}}
+        report = {"scales": {"1": scale_report({"header_analysis": 0.0115, "classify": 0.003, "merge": 1.0}),
+                             "8": scale_report({"header_analysis": 1.0})}}
+        # the stages and scales that are not in the baseline are not compared
+        self.assertEqual(benchmark.compare_with_baseline(report, baseline),
+                         [{"scale": "1", "stage": "classify", "p50": 0.003, "baseline_p50": 0.002}])
+        self.assertEqual(len(benchmark.compare_with_baseline(report, baseline, tolerance=0.1)), 2)
+        self.assertEqual(benchmark.compare_with_baseline(report, baseline, tolerance=1.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import time
+import unittest
+
+from somef.cache import ResultCache
+
+
+class Cache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model = os.path.join(self.tmp_dir.name, "citation.sk")
+        with open(self.model, "wb") as fh:
+            fh.write(b"model")
+        self.file_paths = {"citation": self.model}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_inputs(self):
+        cache = ResultCache(os.path.join(self.tmp_dir.name, "cache"))
+        key = cache.key("readme", 0.8, self.file_paths, ["citation"])
+
+        self.assertEqual(key, cache.key("readme", 0.8, self.file_paths, ["citation"]))
+        self.assertNotEqual(key, cache.key("readme!", 0.8, self.file_paths, ["citation"]))
+        self.assertNotEqual(key, cache.key("readme", 0.9, self.file_paths, ["citation"]))
+        # the predictions depend on the classifier policy
+        self.assertEqual(key, cache.key("readme", 0.8, self.file_paths, ["citation"], "all"))
+        self.assertNotEqual(key, cache.key("readme", 0.8, self.file_paths, ["citation"], "unlabeled"))
+
+        with open(self.model, "wb") as fh:
+            fh.write(b"retrained model")
+        os.utime(self.model, (time.time() + 10, time.time() + 10))
+        self.assertNotEqual(key, cache.key("readme", 0.8, self.file_paths, ["citation"]))
+
+    def test_get_put_and_evict(self):
+        ResultCache(os.path.join(self.tmp_dir.name, "cache")).put("d" * 64, {})
+        cache = ResultCache(os.path.join(self.tmp_dir.name, "cache"), max_entries=2)
+        # the existing entries are counted when the first one is added
+        self.assertIsNone(cache.size)
+        predictions = {"citation": [{"excerpt": "@article{x}", "confidence": [1.0], "technique": "classifier"}]}
+
+        self.assertIsNone(cache.get("a" * 64))
+        cache.put("a" * 64, predictions)
+        self.assertEqual(cache.size, 2)
+        self.assertEqual(cache.get("a" * 64), predictions)
+
+        cache.put("b" * 64, predictions)
+        cache.put("c" * 64, predictions)
+        self.assertLessEqual(cache.size, 2)
+        self.assertEqual(cache.size, len(cache.entries()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from click.testing import CliRunner
+
+from somef import cli
+from somef.__main__ import MaxReleasesParamType, trycli
+from somef.inputs import in_shard
+from somef.result_store import ResultStore
+
+
+# describes the documents without reading them, with the options of the batch
+class FakeDescriber:
+    def __init__(self):
+        self.batches = []
+
+    def describe_batch(self, sources, source_type="repo_url", workers=1, profiler=None, **recycling):
+        self.batches.append((source_type, workers, recycling))
+        for source in reversed(list(sources)):
+            yield source, {"fullName": {"excerpt": os.path.basename(os.path.dirname(source)), "confidence": [1.0],
+                                        "technique": "metadata"}}
+
+
+class DocumentsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.doc_dir = os.path.join(self.tmp_dir.name, "docs")
+        for name in ("b/README.md", "a/README.md", "a/NOTES.md", "top.md", "c/README.md/empty"):
+            os.makedirs(os.path.dirname(os.path.join(self.doc_dir, name)), exist_ok=True)
+            with open(os.path.join(self.doc_dir, name), "w") as fh:
+                fh.write("# Tool\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_find_documents(self):
+        self.assertEqual(cli.find_documents(self.doc_dir), [os.path.join(self.doc_dir, "top.md")])
+        # directories that match the pattern are left out
+        self.assertEqual(cli.find_documents(self.doc_dir, "**/README.md"),
+                         [os.path.join(self.doc_dir, "a/README.md"), os.path.join(self.doc_dir, "b/README.md")])
+        self.assertEqual(cli.find_documents(self.doc_dir, "*.rst"), [])
+
+    def test_describe_documents(self):
+        describer = FakeDescriber()
+        db_path = os.path.join(self.tmp_dir.name, "results.db")
+        result_store = ResultStore(db_path)
+        documents = dict(cli.describe_documents(describer, self.doc_dir, "**/*.md", workers=2,
+                                                result_store=result_store, max_tasks_per_worker=10))
+        result_store.close()
+        self.assertEqual(sorted(os.path.relpath(document, self.doc_dir) for document in documents),
+                         ["a/NOTES.md", "a/README.md", "b/README.md", "top.md"])
+        self.assertEqual(describer.batches, [("doc_src", 2, {"max_tasks_per_worker": 10})])
+        result_store = ResultStore(db_path)
+        self.assertEqual(len(result_store), 4)
+        self.assertIsNotNone(result_store.get(os.path.join(self.doc_dir, "top.md")))
+        result_store.close()
+
+        # every document is in one shard
+        shards = [dict(cli.describe_documents(describer, self.doc_dir, "**/*.md", shard=(index, 2)))
+                  for index in range(2)]
+        self.assertEqual(sorted(list(shards[0]) + list(shards[1])), sorted(documents))
+        for index, shard in enumerate(shards):
+            self.assertTrue(all(in_shard(os.path.relpath(document, self.doc_dir), (index, 2)) for document in shard))
+
+    def test_in_file_json_lines(self):
+        in_file = os.path.join(self.tmp_dir.name, "urls.txt")
+        with open(in_file, "w") as fh:
+            fh.write("https://github.com/a/one\nhttps://github.com/b/two\nhttps://github.com/a/one/\n")
+        describer = FakeDescriber()
+        for output in ("out.jsonl", "out.json"):
+            output = os.path.join(self.tmp_dir.name, output)
+            with mock.patch("somef.describer.Describer", lambda **settings: describer):
+                cli.run_cli(in_file=in_file, output=output, no_cache=True)
+            with open(output) as fh:
+                if output.endswith(".jsonl"):
+                    # one repository per line
+                    records = [json.loads(line) for line in fh]
+                else:
+                    records = json.load(fh)
+            self.assertEqual(sorted(record["fullName"]["excerpt"] for record in records), ["a", "b"])
+
+    def test_batch_options(self):
+        runner = CliRunner()
+        output = os.path.join(self.tmp_dir.name, "out.json")
+        readme = os.path.join(self.doc_dir, "top.md")
+        for options, message in ((["--pattern", "**/README.md"], "--pattern can only be used with --doc_dir"),
+                                 (["--in_format", "jsonl"], "--in_format can only be used with --in_file"),
+                                 (["--workers", "2"], "--workers can only be used with --in_file or --doc_dir"),
+                                 (["--max_worker_memory", "500"],
+                                  "--max_worker_memory can only be used with --in_file or --doc_dir")):
+            result = runner.invoke(trycli, ["describe", "-d", readme, "-o", output] + options)
+            self.assertEqual(result.exit_code, 2, result.output)
+            self.assertIn(message, result.output)
+        self.assertFalse(os.path.exists(output))
+
+    def test_max_releases(self):
+        param_type = MaxReleasesParamType()
+        self.assertIsNone(param_type.convert("all", None, None))
+        self.assertEqual(param_type.convert("10", None, None), 10)
+        self.assertEqual(param_type.convert(30, None, None), 30)
+        runner = CliRunner()
+        output = os.path.join(self.tmp_dir.name, "out.json")
+        for value in ("-1", "many"):
+            result = runner.invoke(trycli, ["describe", "-d", os.path.join(self.doc_dir, "top.md"), "-o", output,
+                                            "--max_releases", value])
+            self.assertEqual(result.exit_code, 2, result.output)
+            self.assertIn("--max_releases", result.output)
+
+
+# scores every excerpt with the same confidence
+class ConstantModel:
+    def __init__(self, confidence):
+        self.confidence = confidence
+
+    def predict_proba(self, excerpts):
+        return np.array([[1 - self.confidence, self.confidence]] * len(excerpts))
+
+
+class ClassifierPolicyTest(unittest.TestCase):
+    def test_select_categories(self):
+        header_predictions = {"installation": [], "usage": []}
+        citations = ["@article{paper, title={A paper}}"]
+        self.assertEqual(cli.select_categories("all", header_predictions, citations), cli.categories)
+        # the categories found by header analysis, and citation with a BibTeX citation, are not scored
+        self.assertEqual(cli.select_categories("unlabeled", header_predictions, citations), ["description"])
+        self.assertEqual(cli.select_categories("unlabeled", {"run": []}, []),
+                         ["description", "citation", "installation"])
+        self.assertEqual(cli.select_categories("unlabeled", {}, []), cli.categories)
+        with self.assertRaises(ValueError):
+            cli.select_categories("none", {}, [])
+
+    def test_run_classifiers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_file = os.path.join(tmp_dir, "description.sk")
+            with open(model_file, "w") as fh:
+                fh.write("model")
+            cli.loaded_classifiers[model_file] = ConstantModel(0.9)
+            self.addCleanup(cli.loaded_classifiers.pop, model_file)
+            # the models of the skipped categories are not needed
+            score_matrix = cli.run_classifiers(["first excerpt", "second excerpt"], {"description": model_file},
+                                               ["description"])
+            self.assertEqual(score_matrix.categories, ("description",))
+            self.assertEqual(list(score_matrix.confidence("description")), [0.9, 0.9])
+            with self.assertRaises(cli.ConfigurationError):
+                cli.run_classifiers(["first excerpt"], {"description": model_file}, ["description", "citation"])
+
+
+class ConfigurationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_paths = {}
+        for category in cli.categories:
+            self.file_paths[category] = self.write_model(f"{category}.sk", ConstantModel(0.5))
+
+    def tearDown(self):
+        for file_name in list(cli.loaded_classifiers):
+            if file_name.startswith(self.tmp_dir.name):
+                del cli.loaded_classifiers[file_name]
+        self.tmp_dir.cleanup()
+
+    def write_model(self, name, model):
+        file_name = os.path.join(self.tmp_dir.name, name)
+        with open(file_name, "wb") as fh:
+            pickle.dump(model, fh)
+        return file_name
+
+    def assert_invalid(self, file_paths, problem):
+        with self.assertRaises(cli.ConfigurationError) as context:
+            cli.validate_file_paths(file_paths)
+        self.assertIn(problem, str(context.exception))
+
+    def test_validate_file_paths(self):
+        file_paths = dict(self.file_paths, Authorization="token ghp_abc123")
+        self.assertEqual(cli.validate_file_paths(file_paths), file_paths)
+        # the models stay loaded for the classifiers
+        self.assertIsInstance(cli.loaded_classifiers[self.file_paths["citation"]], ConstantModel)
+
+        self.assert_invalid(dict(self.file_paths, Authorization="ghp_abc123"), "Authorization must have the form")
+        self.assert_invalid(dict(self.file_paths, Authorization="token ghp abc"), "Authorization must have the form")
+        del file_paths["installation"]
+        self.assert_invalid(file_paths, "Category installation file path not present")
+        self.assert_invalid(dict(self.file_paths, invocation=os.path.join(self.tmp_dir.name, "missing.sk")),
+                            "of the category invocation does not exist")
+
+        broken_model = os.path.join(self.tmp_dir.name, "broken.sk")
+        with open(broken_model, "wb") as fh:
+            fh.write(b"not a pickle")
+        self.assert_invalid(dict(self.file_paths, description=broken_model),
+                            "of the category description cannot be loaded")
+        self.assert_invalid(dict(self.file_paths, citation=self.write_model("dict.sk", {"model": None})),
+                            "of the category citation is not a classifier")
+        # every problem is reported at once
+        with self.assertRaises(cli.ConfigurationError) as context:
+            cli.validate_file_paths({"Authorization": "secret"})
+        self.assertEqual(str(context.exception).count(";"), len(cli.categories))
+
+    def test_load_configuration(self):
+        config_file = os.path.join(self.tmp_dir.name, "config.json")
+        with mock.patch.dict(os.environ, {"SOMEF_CONFIGURATION_FILE": config_file}):
+            with self.assertRaisesRegex(cli.ConfigurationError, "Please provide a config.json file"):
+                cli.load_configuration()
+            with open(config_file, "w") as fh:
+                fh.write('{"citation": ')
+            with self.assertRaisesRegex(cli.ConfigurationError, "is not valid JSON"):
+                cli.load_configuration()
+            with open(config_file, "w") as fh:
+                json.dump(dict(self.file_paths, citation=os.path.join(self.tmp_dir.name, "missing.sk")), fh)
+            with self.assertRaisesRegex(cli.ConfigurationError, "of the category citation does not exist"):
+                cli.load_configuration(load_models=False)
+            with open(config_file, "w") as fh:
+                json.dump(self.file_paths, fh)
+            self.assertEqual(cli.load_configuration(), self.file_paths)
+
+
+if __name__ == '__main__':
+    unittest.main()
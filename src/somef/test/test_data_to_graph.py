@@ -1,6 +1,8 @@
+import os
+import tempfile
 import unittest
 
-from somef.data_to_graph import DataGraph
+from somef.data_to_graph import DataGraph, merge_graph_files
 
 
 class Base(unittest.TestCase):
@@ -120,6 +122,42 @@ class ResolvePath(Base):
 
         self.assertEqual(out, [[1, 2], [3, 4]])
 
+class Shards(Base):
+    def setUp(self):
+        self.somef_data = [
+            {
+                "fullName": {"excerpt": "test/one", "confidence": [1.0], "technique": "metadata"},
+                "owner": {"excerpt": "test", "confidence": [1.0], "technique": "metadata"}
+            },
+            {
+                "fullName": {"excerpt": "test/two", "confidence": [1.0], "technique": "metadata"},
+                "owner": {"excerpt": "test", "confidence": [1.0], "technique": "metadata"}
+            }
+        ]
+
+    def test_merge_deduplicates(self):
+        shard_a = DataGraph.build_shard(self.somef_data)
+        shard_b = DataGraph.build_shard(self.somef_data[1:])
+        merged = DataGraph.merge([shard_a, shard_b])
+
+        self.assertEqual(len(merged.g), len(shard_a.g))
+        self.assertIn("https://w3id.org/okn/o/sd#", [str(ns) for _, ns in merged.g.namespaces()])
+
+    def test_serialized_shards_round_trip(self):
+        shards = [DataGraph.build_shard([data]) for data in self.somef_data]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_files = []
+            for i, shard in enumerate(shards):
+                in_file = os.path.join(tmp_dir, f"shard_{i}.ttl")
+                shard.serialize(in_file)
+                in_files.append(in_file)
+
+            out_file = os.path.join(tmp_dir, "merged.jsonld")
+            merge_graph_files(in_files, out_file, graph_format="json-ld")
+            merged = DataGraph.load(out_file)
+
+        self.assertEqual(len(merged.g), len(DataGraph.build_shard(self.somef_data).g))
+
 
 if __name__ == '__main__':
     unittest.main()
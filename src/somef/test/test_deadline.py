@@ -0,0 +1,127 @@
+import tempfile
+import time
+import unittest
+
+from somef import cli
+from somef.cache import ResultCache
+from somef.data_to_graph import DataGraph
+from somef.deadline import Deadline
+from somef.github_mock import MockGithubServer
+from somef.profiling import Profiler
+
+readme = """Tool is a tool.
+
+```
+@misc{tool,
+  title={Tool},
+  author={Owner},
+  year={2020}
+}
+```
+"""
+
+
+# deadline whose budget is exhausted for the given stages only
+class StageDeadline(Deadline):
+    def __init__(self, exhausted_stages):
+        super().__init__()
+        self.exhausted_stages = exhausted_stages
+
+    def check(self, stage):
+        if stage not in self.exhausted_stages:
+            return True
+        self.skipped.append(stage)
+        return False
+
+
+# deadline whose budget is exhausted right after the given stage started
+class ExpiringDeadline(Deadline):
+    def __init__(self, last_stage):
+        super().__init__()
+        self.last_stage = last_stage
+        self.exhausted = False
+
+    def check(self, stage):
+        if self.exhausted:
+            self.skipped.append(stage)
+            return False
+        self.exhausted = stage == self.last_stage
+        return True
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_without_budget(self):
+        deadline = Deadline()
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired())
+        self.assertTrue(deadline.check("releases"))
+        self.assertEqual(deadline.skipped, [])
+
+    def test_budget(self):
+        deadline = Deadline(60)
+        self.assertTrue(0 < deadline.remaining() <= 60)
+        self.assertTrue(deadline.check("releases"))
+
+        deadline = Deadline(0.05)
+        time.sleep(0.1)
+        self.assertEqual(deadline.remaining(), 0.0)
+        self.assertTrue(deadline.expired())
+        self.assertFalse(deadline.check("releases"))
+        self.assertFalse(deadline.check("citation"))
+        self.assertFalse(deadline.check("releases"))
+        self.assertEqual(deadline.skipped, ["releases", "citation"])
+
+    def test_partial_output(self):
+        deadline = StageDeadline({"header_analysis", "classifiers"})
+        repo_data = cli.get_data(0.8, Profiler(), readme_text=readme, deadline=deadline, file_paths={})
+        self.assertEqual(repo_data[cli.partial_key], ["header_analysis", "classifiers"])
+        # the citation stage ran
+        self.assertIn("citation", repo_data)
+        self.assertEqual(list(cli.graph_records([repo_data, None])), [])
+
+    def test_incomplete_output(self):
+        deadline = Deadline()
+        # e.g. a page of releases failed while fetching
+        deadline.mark_incomplete("releases")
+        repo_data = cli.get_data(0.8, Profiler(), readme_text="", deadline=deadline, file_paths={})
+        self.assertEqual(repo_data, {cli.incomplete_key: ["releases"]})
+        # the repository is still added to the Knowledge Graph
+        self.assertEqual(list(cli.graph_records([repo_data])), [repo_data])
+        self.assertEqual(DataGraph.process_somef(repo_data), {})
+
+    def test_cached_partial_output(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ResultCache(cache_dir)
+            predictions = {"description": [{"excerpt": "Tool is a tool.", "confidence": [0.9],
+                                            "technique": "classifier"}]}
+            cache.put(cache.key(readme, 0.8, {}, cli.categories), predictions)
+            # the releases are skipped while fetching, before the cache is read
+            deadline = StageDeadline({"releases"})
+            deadline.check("releases")
+            profiler = Profiler()
+            profiler.start_repo("tool")
+            repo_data = cli.get_data(0.8, profiler, readme_text=readme, deadline=deadline, file_paths={},
+                                     cache=cache)
+        self.assertTrue(profiler.current["stages"][-1]["hit"])
+        self.assertEqual(repo_data["description"], predictions["description"])
+        self.assertEqual(repo_data[cli.partial_key], ["releases"])
+        self.assertEqual(list(cli.graph_records([repo_data])), [])
+
+    def test_exhausted_after_the_releases(self):
+        server = MockGithubServer(("127.0.0.1", 0))
+        server.start()
+        self.addCleanup(server.stop)
+        previous_api_url = cli.github_api_url
+        cli.github_api_url = server.url
+        try:
+            # the budget runs out once the releases, the last stage of the fetch, started
+            repo_data = cli.get_data(0.8, Profiler(), repo_url="https://github.com/owner/name",
+                                     deadline=ExpiringDeadline("releases"), file_paths={})
+        finally:
+            cli.github_api_url = previous_api_url
+        self.assertEqual(len(repo_data["releases"]["excerpt"]), 3)
+        self.assertEqual(repo_data[cli.partial_key], ["header_analysis", "citation", "classifiers"])
+
+
+if __name__ == '__main__':
+    unittest.main()
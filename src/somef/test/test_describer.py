@@ -0,0 +1,112 @@
+import os
+import unittest
+
+import requests
+
+from somef.describer import Describer
+from somef.profiling import Profiler
+
+
+# describes the sources without fetching or classifying them: "unreachable" sources fail with a connection
+# error, "broken" ones with an unexpected error, and "crash" ones kill the worker process
+class FakeDescriber(Describer):
+    def describe(self, profiler=None, **source):
+        (_, source), = source.items()
+        profiler.start_repo(source)
+        if "unreachable" in source:
+            profiler.end_repo("ConnectionError")
+            raise requests.ConnectionError("connection refused")
+        if "broken" in source:
+            profiler.end_repo("KeyError")
+            raise KeyError("languages_url")
+        if "crash" in source:
+            os._exit(1)
+        profiler.end_repo("described")
+        return {"fullName": {"excerpt": source, "confidence": [1.0], "technique": "metadata"}, "pid": os.getpid()}
+
+
+sources = [f"https://github.com/owner/repository-{index}" for index in range(6)] + \
+          ["https://github.com/owner/unreachable"]
+
+
+class DescriberTest(unittest.TestCase):
+    def setUp(self):
+        self.describer = FakeDescriber(file_paths={}, validate=False)
+
+    def check_batch(self, results, profiler):
+        results = dict(results)
+        self.assertEqual(sorted(results), sorted(sources))
+        self.assertIsNone(results["https://github.com/owner/unreachable"])
+        self.assertEqual(results[sources[0]]["fullName"]["excerpt"], sources[0])
+        self.assertEqual(sorted(record["repository"] for record in profiler.repositories), sorted(sources))
+        return results
+
+    def test_describe_source(self):
+        source, repo_data, record = self.describer.describe_source("repo_url", sources[0])
+        self.assertEqual((source, repo_data["fullName"]["excerpt"], record["outcome"]),
+                         (sources[0], sources[0], "described"))
+        # the error only loses that source
+        source, repo_data, record = self.describer.describe_source("repo_url", "https://github.com/owner/unreachable")
+        self.assertIsNone(repo_data)
+        self.assertEqual(record["outcome"], "ConnectionError")
+        # errors of somef, as a missing document, too
+        describer = Describer(file_paths={}, validate=False)
+        source, repo_data, record = describer.describe_source("doc_src", "/nonexistent/README.md")
+        self.assertEqual((source, repo_data, record["outcome"]), ("/nonexistent/README.md", None, "InputError"))
+
+    def test_serial_batch(self):
+        profiler = Profiler()
+        results = self.check_batch(self.describer.describe_batch(sources, "repo_url", profiler=profiler), profiler)
+        # without workers, the sources are described in this process
+        self.assertEqual({data["pid"] for data in results.values() if data is not None}, {os.getpid()})
+
+    def test_pool_batch(self):
+        profiler = Profiler()
+        results = self.check_batch(self.describer.describe_batch(sources, "repo_url", workers=2, profiler=profiler),
+                                   profiler)
+        pids = {data["pid"] for data in results.values() if data is not None}
+        self.assertNotIn(os.getpid(), pids)
+        self.assertLessEqual(len(pids), 2)
+
+        # recycling the workers uses the pool even with one worker
+        profiler = Profiler()
+        results = self.check_batch(self.describer.describe_batch(sources, "repo_url", profiler=profiler,
+                                                                 max_tasks_per_worker=2), profiler)
+        self.assertEqual(len({data["pid"] for data in results.values() if data is not None}), 3)
+
+    def test_lost_source(self):
+        profiler = Profiler()
+        crash = "https://github.com/owner/crash"
+        results = dict(self.describer.describe_batch(sources[:2] + [crash], "repo_url", workers=2,
+                                                     profiler=profiler))
+        self.assertIsNone(results[crash])
+        self.assertIsNotNone(results[sources[0]])
+        outcomes = {record["repository"]: record["outcome"] for record in profiler.repositories}
+        self.assertEqual(outcomes[crash], "WorkerLostError")
+
+    def check_unexpected_error(self, **options):
+        broken = "https://github.com/owner/broken"
+        batch = sources[:3] + [broken] + sources[3:]
+        profiler = Profiler()
+        results = dict(self.describer.describe_batch(batch, "repo_url", profiler=profiler, **options))
+        # the batch goes on after the error
+        self.assertEqual(sorted(results), sorted(batch))
+        self.assertIsNone(results[broken])
+        self.assertTrue(all(results[source] is not None for source in sources[:6]))
+        outcomes = {record["repository"]: record["outcome"] for record in profiler.repositories}
+        self.assertEqual(outcomes[broken], "KeyError")
+
+    def test_unexpected_error(self):
+        with self.assertLogs("somef.describer", "ERROR") as logs:
+            self.check_unexpected_error()
+        # with its traceback
+        self.assertEqual([record.exc_info[0] for record in logs.records if record.exc_info], [KeyError])
+        self.check_unexpected_error(workers=2)
+
+    def test_unknown_source_type(self):
+        with self.assertRaises(ValueError):
+            list(self.describer.describe_batch(sources, "url"))
+
+
+if __name__ == '__main__':
+    unittest.main()
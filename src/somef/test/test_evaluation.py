@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+
+from somef import evaluation, training
+from somef.test.test_training import write_corpus
+
+
+class Evaluation(unittest.TestCase):
+    def test_model_category(self):
+        self.assertEqual(evaluation.model_category("models/citation.sk"), "citation")
+        self.assertEqual(evaluation.model_category("trained_models/instfxgb.p"), "installation")
+        self.assertIsNone(evaluation.model_category("trained_models/other.p"))
+
+    def test_evaluate(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        corpus_dir = os.path.join(tmp_dir.name, "corpus")
+        write_corpus(corpus_dir)
+        models_dir = os.path.join(tmp_dir.name, "models")
+        training.train(corpus_dir, models_dir, categories=("citation",), folds=2, negative_ratio=0.5)
+        with open(os.path.join(models_dir, "citbroken.p"), "wb") as fh:
+            fh.write(b"not a pickle")
+
+        records = evaluation.evaluate(models_dir, corpus_dir, categories=("citation",), threshold=0.5,
+                                      latency_samples=5)
+        self.assertEqual([os.path.basename(record["model"]) for record in records], ["citation.sk", "citbroken.p"])
+        self.assertIn("error", records[1])
+        self.assertGreater(records[0]["f1"], 0.5)
+        self.assertGreater(records[0]["throughput"], 0)
+
+        recommended = evaluation.recommend(records)
+        self.assertIs(recommended["citation"], records[0])
+        self.assertEqual(evaluation.recommend(records, latency_budget=0), {})
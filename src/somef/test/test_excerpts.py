@@ -0,0 +1,71 @@
+import json
+import unittest
+
+import numpy as np
+
+from somef import cli
+from somef.excerpts import Excerpt, ScoreMatrix, Technique, predictions_from_json, predictions_to_json
+
+excerpts = ["Install it with pip", "pip", "Then run the tool", "below", "Usage notes are here", "Cite",
+            "the paper please", "last"]
+scores = {
+    "installation": [0.9, 0.95, 0.85, 0.1, 0.2, 0.9, 0.3, 0.1],
+    "invocation": [0.1, 0.1, 0.9, 0.9, 0.85, 0.2, 0.2, 0.1],
+    "citation": [0.1, 0.1, 0.1, 0.1, 0.1, 0.9, 0.95, 0.2],
+    "description": [0.1, 0.9, 0.2, 0.1, 0.1, 0.1, 0.1, 0.1],
+}
+# the output of classify with a threshold of 0.8 before the score matrix was introduced:
+# one word lines are removed, and so are the excerpts that are left without lines
+expected_predictions = {
+    "installation": [{"excerpt": "Install it with pip \nThen run the tool \n", "confidence": [0.9, 0.85],
+                      "technique": "classifier"}],
+    "invocation": [{"excerpt": "Then run the tool \nUsage notes are here \n", "confidence": [0.9, 0.85],
+                    "technique": "classifier"}],
+    "citation": [{"excerpt": "the paper please \n", "confidence": [0.95], "technique": "classifier"}],
+    "description": [],
+}
+
+
+class Excerpts(unittest.TestCase):
+    def test_score_matrix(self):
+        score_matrix = ScoreMatrix(excerpts, ["installation", "citation"])
+        self.assertEqual(len(score_matrix), 2)
+        self.assertIn("citation", score_matrix)
+        self.assertNotIn("description", score_matrix)
+        self.assertEqual(score_matrix.scores.shape, (len(excerpts), 2))
+        score_matrix.set_confidence("citation", scores["citation"])
+        self.assertEqual(list(score_matrix.confidence("citation")), scores["citation"])
+        self.assertEqual(list(score_matrix.confidence("installation")), [0.0] * len(excerpts))
+
+    def test_json_round_trip(self):
+        predictions = {
+            "installation": [Excerpt("pip install tool \n", np.array([0.9]), Technique.CLASSIFIER),
+                             Excerpt("Installation", [1.0], Technique.HEADER_ANALYSIS)],
+            "description": [Excerpt("A tool", [1.0], Technique.METADATA)],
+        }
+        data = predictions_to_json(predictions)
+        self.assertEqual(data["installation"][0], {"excerpt": "pip install tool \n", "confidence": [0.9],
+                                                   "technique": "classifier"})
+        self.assertEqual(data["installation"][1]["technique"], "wordnet")
+        # the output only has plain JSON types
+        self.assertEqual(json.loads(json.dumps(data)), data)
+
+        loaded = predictions_from_json(data)
+        self.assertIs(loaded["description"][0].technique, Technique.METADATA)
+        self.assertEqual(predictions_to_json(loaded), data)
+
+    def test_classify(self):
+        score_matrix = ScoreMatrix(excerpts, scores.keys())
+        for category, confidence in scores.items():
+            score_matrix.set_confidence(category, confidence)
+        self.assertEqual(predictions_to_json(cli.classify(score_matrix, 0.8)), expected_predictions)
+
+    def test_remove_unimportant_excerpts(self):
+        excerpt = cli.remove_unimportant_excerpts(["Install it with pip", "pip"], np.array([0.9, 0.95]))
+        self.assertEqual(excerpt.to_dict(), {"excerpt": "Install it with pip \n", "confidence": [0.9],
+                                             "technique": "classifier"})
+        self.assertIsNone(cli.remove_unimportant_excerpts(["Cite", ""], np.array([0.9, 0.9])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import requests
+
+from somef import cli
+from somef.deadline import Deadline
+from somef.github_mock import (FaultSettings, FixtureSet, MockGithubServer, format_load_test, run_load_test,
+                               synthetic_fixture)
+from somef.profiling import Profiler
+
+
+class MockGithubServerTest(unittest.TestCase):
+    def start(self, fixtures=None, faults=None):
+        server = MockGithubServer(("127.0.0.1", 0), fixtures, faults)
+        server.start()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_synthetic_fixtures(self):
+        server = self.start()
+        repo = requests.get(f"{server.url}/repos/owner/name").json()
+        self.assertEqual(repo["full_name"], "owner/name")
+        # languages are loaded from the stand-in too
+        self.assertEqual(repo["languages_url"], f"{server.url}/repos/owner/name/languages")
+        self.assertEqual(requests.get(repo["languages_url"]).json(), {"Python": 10000, "Shell": 200})
+        releases = requests.get(f"{server.url}/repos/owner/name/releases", params={"per_page": 2, "page": 2}).json()
+        self.assertEqual([release["tag_name"] for release in releases], ["v1.2"])
+        self.assertEqual(requests.get(f"{server.url}/users/owner").status_code, 404)
+        self.assertEqual(server.responses, {"ok": 3, "not_found": 1})
+
+    def test_recorded_fixtures(self):
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            fixture = synthetic_fixture("Owner", "Recorded")
+            del fixture["readme"]
+            os.makedirs(os.path.join(fixture_dir, "owner"))
+            with open(os.path.join(fixture_dir, "owner", "recorded.json"), "w") as fh:
+                json.dump(fixture, fh)
+            server = self.start(FixtureSet(fixture_dir, synthetic=False))
+            self.assertEqual(requests.get(f"{server.url}/repos/owner/recorded/topics").json(), fixture["topics"])
+            readme = requests.get(f"{server.url}/repos/owner/recorded/readme")
+            self.assertEqual((readme.status_code, readme.json()["message"]), (404, "Not Found"))
+            self.assertEqual(requests.get(f"{server.url}/repos/owner/other").status_code, 404)
+
+    def test_faults(self):
+        server = self.start(faults=FaultSettings(rate_limit_rate=1.0, retry_after=2))
+        response = requests.get(f"{server.url}/repos/owner/name")
+        self.assertEqual(response.status_code, 403)
+        self.assertIn("API rate limit exceeded", response.json()["message"])
+        self.assertEqual(response.headers["Retry-After"], "2")
+
+        server = self.start(faults=FaultSettings(error_rate=1.0))
+        response = requests.get(f"{server.url}/repos/owner/name")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.headers["Content-Type"], "text/html")
+        self.assertNotIn("Retry-After", response.headers)
+        with self.assertRaises(ValueError):
+            response.json()
+
+    def test_max_retries(self):
+        # a server error that does not go away is an error, not a missing repository
+        server = self.start(faults=FaultSettings(error_rate=1.0))
+        with self.assertRaises(requests.HTTPError):
+            cli.rate_limit_get(f"{server.url}/repos/owner/name", initial_backoff=0, max_retries=2)
+        self.assertEqual(server.responses, {"server_error": 3})
+
+    def test_retry_after(self):
+        # the wait of the Retry-After header is used instead of the backoff (a second, then two)
+        server = self.start(faults=FaultSettings(error_rate=1.0, retry_after=0))
+        profiler = Profiler()
+        with self.assertRaises(requests.HTTPError):
+            cli.rate_limit_get(f"{server.url}/repos/owner/name", max_retries=2, profiler=profiler)
+        self.assertEqual((profiler.http_calls, profiler.backoffs, profiler.backoff_time), (3, 2, 0.0))
+
+    def test_not_json(self):
+        # once the time budget is exhausted, the HTML page of the 502 is returned as a message
+        server = self.start(faults=FaultSettings(error_rate=1.0))
+        deadline = Deadline(0)
+        response = cli.rate_limit_get(f"{server.url}/repos/owner/name", deadline=deadline)
+        self.assertEqual(response, {"message": "502 Bad Gateway: the response is not JSON"})
+        self.assertEqual(deadline.skipped, ["rate limit backoff"])
+
+    def test_timeout(self):
+        server = self.start(faults=FaultSettings(latency=2))
+        with self.assertRaises(requests.Timeout):
+            cli.rate_limit_get(f"{server.url}/repos/owner/name", timeout=0.2)
+        # the request may take the time left for the repository, but at least min_request_timeout seconds
+        start = time.perf_counter()
+        with self.assertRaises(requests.Timeout):
+            cli.rate_limit_get(f"{server.url}/repos/owner/name", deadline=Deadline(0.1))
+        self.assertLess(time.perf_counter() - start, 1.9)
+
+    def test_load_repository_metadata(self):
+        server = self.start(faults=FaultSettings(rate_limit_rate=0.3, error_rate=0.2, retry_after=0, seed=3))
+        profiler = Profiler()
+        previous_api_url = cli.github_api_url
+        cli.github_api_url = server.url
+        try:
+            text, github_data = cli.load_repository_metadata("https://github.com/owner/name", {},
+                                                             profiler=profiler)
+        finally:
+            cli.github_api_url = previous_api_url
+        self.assertEqual(github_data["fullName"], "owner/name")
+        self.assertEqual(len(github_data["releases"]), 3)
+        self.assertGreater(profiler.backoffs, 0)
+        self.assertEqual(profiler.backoffs, server.responses["rate_limited"] + server.responses["server_error"])
+        self.assertEqual(profiler.http_calls, sum(server.responses.values()))
+
+    def load_releases(self, server, **kwargs):
+        previous_api_url = cli.github_api_url
+        cli.github_api_url = server.url
+        try:
+            return cli.load_releases("owner", "name", {}, **kwargs)
+        finally:
+            cli.github_api_url = previous_api_url
+
+    def test_load_releases(self):
+        server = self.start()
+        previous_page_size = cli.releases_page_size
+        cli.releases_page_size = 2
+        try:
+            profiler = Profiler()
+            releases = self.load_releases(server, max_releases=None, profiler=profiler)
+            self.assertEqual([release["tag_name"] for release in releases], ["v1.0", "v1.1", "v1.2"])
+            self.assertEqual(profiler.http_calls, 2)
+            self.assertIn("body", releases[0])
+
+            releases = self.load_releases(server, max_releases=1, release_body=False)
+            self.assertEqual([release["tag_name"] for release in releases], ["v1.0"])
+            self.assertNotIn("body", releases[0])
+            self.assertEqual(self.load_releases(server, max_releases=0), [])
+        finally:
+            cli.releases_page_size = previous_page_size
+        # one page of 30 releases by default
+        self.assertEqual(len(self.load_releases(server)), 3)
+
+    def test_load_releases_error(self):
+        server = self.start()
+
+        # the second page cannot be loaded
+        class FailingSession(requests.Session):
+            def get(self, url, params=None, **kwargs):
+                if params is not None and params.get("page", 1) > 1:
+                    raise requests.ConnectionError("Connection refused")
+                return super().get(url, params=params, **kwargs)
+
+        previous_page_size = cli.releases_page_size
+        cli.releases_page_size = 2
+        try:
+            deadline = Deadline()
+            releases = self.load_releases(server, max_releases=None, deadline=deadline, session=FailingSession())
+        finally:
+            cli.releases_page_size = previous_page_size
+        self.assertEqual([release["tag_name"] for release in releases], ["v1.0", "v1.1"])
+        # the repository is not partial, only its releases are incomplete
+        self.assertEqual(deadline.skipped, [])
+        self.assertEqual(deadline.incomplete, ["releases"])
+
+    def test_load_test(self):
+        repo_urls = [f"https://github.com/owner/repository-{index}" for index in range(20)]
+        report = run_load_test(repo_urls, workers=4, rate_limit_rate=0.2, error_rate=0.1, retry_after=0)
+        responses = report["responses"]
+        self.assertEqual((report["repositories"], report["failed"]), (20, 0))
+        self.assertEqual(report["http_calls"], sum(responses.values()))
+        self.assertEqual(report["backoffs"], responses["rate_limited"] + responses["server_error"])
+        self.assertEqual(report["backoff_time"], 0.0)
+        lines = format_load_test(report)
+        self.assertIn(f"  {report['backoffs']} retries, 0.00 s backing off", lines)
+        self.assertTrue(lines[-1].startswith("  responses: ok "))
+
+    def test_fault_rates(self):
+        faults = FaultSettings(latency=0.1, jitter=0.05, rate_limit_rate=0.2, error_rate=0.3, seed=1)
+        draws = [faults.draw() for _ in range(2000)]
+        self.assertTrue(all(0.1 <= delay <= 0.15 for delay, _ in draws))
+        self.assertAlmostEqual(sum(fault == "rate_limited" for _, fault in draws) / 2000, 0.2, delta=0.03)
+        self.assertAlmostEqual(sum(fault == "server_error" for _, fault in draws) / 2000, 0.3, delta=0.03)
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from rdflib import Literal
+from rdflib.namespace import XSD
+
+from somef.graph_store import GraphStore
+
+
+def somef_output(full_name, description):
+    return {
+        "fullName": {"excerpt": full_name, "confidence": [1.0], "technique": "metadata"},
+        "description": [{"excerpt": description, "confidence": [1.0], "technique": "metadata"}]
+    }
+
+
+class Replace(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = GraphStore(os.path.join(self.tmp_dir.name, "graph.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_redescribe_replaces_subgraph(self):
+        self.store.replace_somef_data(somef_output("test/one", "old description"))
+        self.store.replace_somef_data(somef_output("test/two", "other"))
+        self.store.replace_somef_data(somef_output("test/one", "new description"))
+
+        self.assertEqual(len(self.store), 2)
+        objects = set(self.store.to_data_graph().g.objects())
+        self.assertIn(Literal("new description", datatype=XSD.string), objects)
+        self.assertNotIn(Literal("old description", datatype=XSD.string), objects)
+
+    def test_unnamed_output_is_skipped(self):
+        self.assertIsNone(self.store.replace_somef_data({}))
+        self.assertEqual(len(self.store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from somef.inputs import DigestSet, InputStats, canonical_github_url, read_urls, unique_urls
+
+
+class Inputs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, file_name, text):
+        file_name = os.path.join(self.tmp_dir.name, file_name)
+        with open(file_name, "w") as fh:
+            fh.write(text)
+        return file_name
+
+    def test_canonical_github_url(self):
+        for url in ["https://github.com/a/b", "https://github.com/a/b/", "http://github.com/A/B.git",
+                    "git@github.com:a/b.git", "github.com/a/b", "https://www.github.com/a/b/tree/master ", ]:
+            self.assertEqual(canonical_github_url(url), "https://github.com/a/b")
+        self.assertEqual(canonical_github_url(" https://gitlab.com/a/b "), "https://gitlab.com/a/b")
+
+    def test_read_text(self):
+        # the last line has no newline
+        in_file = self.write("repos.txt", "https://github.com/a/b\n\n# comment\nhttps://github.com/c/d")
+        self.assertEqual(list(read_urls(in_file)), ["https://github.com/a/b", "https://github.com/c/d"])
+
+    def test_read_csv(self):
+        in_file = self.write("repos.csv", "name,repo_url\nb,https://github.com/a/b\nd,https://github.com/c/d\n")
+        self.assertEqual(list(read_urls(in_file)), ["https://github.com/a/b", "https://github.com/c/d"])
+        in_file = self.write("urls.csv", "https://github.com/a/b\nhttps://github.com/c/d\n")
+        self.assertEqual(list(read_urls(in_file)), ["https://github.com/a/b", "https://github.com/c/d"])
+
+    def test_read_jsonl(self):
+        in_file = self.write("repos.jsonl", json.dumps({"url": "https://github.com/a/b"}) + "\n"
+                             + json.dumps("https://github.com/c/d") + "\n")
+        self.assertEqual(list(read_urls(in_file)), ["https://github.com/a/b", "https://github.com/c/d"])
+        # malformed lines are skipped
+        in_file = self.write("broken.jsonl", json.dumps({"url": "https://github.com/a/b"}) + "\n"
+                             + '{"url": "https://github.com/x/y"\n' + json.dumps({"name": "d"}) + "\n"
+                             + json.dumps("https://github.com/c/d") + "\n")
+        with self.assertLogs("somef.inputs", "WARNING") as logs:
+            self.assertEqual(list(read_urls(in_file)), ["https://github.com/a/b", "https://github.com/c/d"])
+        self.assertIn("line 2", logs.output[0])
+
+    def test_read_stdin(self):
+        urls = ["https://github.com/a/b", "https://github.com/c/d"]
+        inputs = {
+            "text": "\n".join(urls) + "\n",
+            "csv": "name,repo_url\nb,https://github.com/a/b\nd,https://github.com/c/d\n",
+            "jsonl": json.dumps({"url": urls[0]}) + "\n" + json.dumps(urls[1]) + "\n",
+        }
+        for in_format, text in inputs.items():
+            # the format is detected from the first line, or given
+            for given_format in (None, in_format):
+                with mock.patch("sys.stdin", io.StringIO(text)):
+                    self.assertEqual(list(read_urls("-", given_format)), urls, in_format)
+        # the given format is used whatever the extension
+        in_file = self.write("repos.txt", inputs["jsonl"])
+        self.assertEqual(list(read_urls(in_file, "jsonl")), urls)
+
+    def test_unique_urls(self):
+        stats = InputStats()
+        urls = ["https://github.com/a/b", "https://github.com/a/b/", "http://github.com/A/B.git",
+                "https://github.com/c/d"]
+        self.assertEqual(list(unique_urls(urls, stats)), ["https://github.com/a/b", "https://github.com/c/d"])
+        self.assertEqual((stats.read, stats.duplicates, stats.unique), (4, 2, 2))
+
+    def test_digest_set_grows(self):
+        seen = DigestSet(capacity=4)
+        self.assertTrue(all(seen.add(str(i)) for i in range(1000)))
+        self.assertFalse(any(seen.add(str(i)) for i in range(1000)))
+        self.assertEqual(len(seen), 1000)
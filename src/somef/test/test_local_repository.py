@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import unittest
+
+from somef.local_repository import load_local_metadata, parse_github_remote
+
+
+class GithubRemote(unittest.TestCase):
+    def test_parse_github_remote(self):
+        self.assertEqual(parse_github_remote("https://github.com/owner/name.git"), ("owner", "name"))
+        self.assertEqual(parse_github_remote("git@github.com:owner/name.git"), ("owner", "name"))
+        self.assertIsNone(parse_github_remote("https://gitlab.com/owner/name.git"))
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class LocalRepository(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo = os.path.join(self.tmp_dir.name, "tool")
+        os.makedirs(self.repo)
+        with open(os.path.join(self.repo, "README.md"), "w") as fh:
+            fh.write("# Tool\n\nA tool.\n")
+        with open(os.path.join(self.repo, "LICENSE"), "w") as fh:
+            fh.write("MIT License\n\nPermission is hereby granted, free of charge...\n")
+        with open(os.path.join(self.repo, "tool.py"), "w") as fh:
+            fh.write("print('tool')\n")
+
+        def git(*args):
+            subprocess.run(["git", "-C", self.repo, "-c", "user.name=test", "-c", "user.email=test@test"]
+                           + list(args), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        git("init")
+        git("add", ".")
+        git("commit", "-m", "first")
+        git("tag", "-a", "v1.0", "-m", "First release")
+        git("remote", "add", "origin", "git@github.com:owner/tool.git")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_directory(self):
+        text, metadata = load_local_metadata(self.repo)
+
+        self.assertIn("A tool.", text)
+        self.assertEqual(metadata["fullName"], "owner/tool")
+        self.assertEqual(metadata["codeRepository"], "https://github.com/owner/tool")
+        self.assertEqual(metadata["license"], {"name": "MIT License"})
+        self.assertEqual(metadata["languages"], ["Python"])
+        self.assertEqual(metadata["releases"][0]["tag_name"], "v1.0")
+        self.assertEqual(metadata["releases"][0]["body"], "First release")
+        # no path of this machine
+        self.assertNotIn("readme_url", metadata)
+
+    def test_releases(self):
+        text, metadata = load_local_metadata(self.repo, max_releases=1, release_body=False)
+        self.assertEqual(metadata["releases"], [{"tag_name": "v1.0", "name": "v1.0",
+                                                 "dateCreated": metadata["releases"][0]["dateCreated"],
+                                                 "datePublished": metadata["releases"][0]["dateCreated"],
+                                                 "author_name": "test"}])
+        text, metadata = load_local_metadata(self.repo, max_releases=0)
+        self.assertEqual(metadata["releases"], [])
+
+    def test_tarball(self):
+        tarball = os.path.join(self.tmp_dir.name, "tool.tar.gz")
+        with tarfile.open(tarball, "w:gz") as tar:
+            tar.add(self.repo, arcname="tool")
+
+        text, metadata = load_local_metadata(tarball)
+
+        self.assertIn("A tool.", text)
+        self.assertEqual(metadata["fullName"], "owner/tool")
+        self.assertNotIn("readme_url", metadata)
+
+    def test_tarball_without_top_level_directory(self):
+        shutil.rmtree(os.path.join(self.repo, ".git"))
+        tarball = os.path.join(self.tmp_dir.name, "my-tool-1.0.tar.gz")
+        with tarfile.open(tarball, "w:gz") as tar:
+            for name in os.listdir(self.repo):
+                tar.add(os.path.join(self.repo, name), arcname=name)
+
+        text, metadata = load_local_metadata(tarball)
+
+        self.assertIn("A tool.", text)
+        # named after the tarball, not the directory it was extracted to
+        self.assertEqual((metadata["name"], metadata["fullName"]), ("my-tool-1.0", "my-tool-1.0"))
+        self.assertNotIn("readme_url", metadata)
+        self.assertNotIn(tempfile.gettempdir(), json.dumps(metadata))
+
+    def test_malicious_tarball(self):
+        outside = os.path.join(self.tmp_dir.name, "outside")
+        os.makedirs(outside)
+        tarball = os.path.join(self.tmp_dir.name, "evil.tar")
+
+        def add_file(tar, name, data):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+        with tarfile.open(tarball, "w") as tar:
+            add_file(tar, "README.md", b"# Evil\n\nA tool.")
+            link = tarfile.TarInfo("link")
+            link.type = tarfile.SYMTYPE
+            link.linkname = outside
+            tar.addfile(link)
+            # written through the symbolic link, outside of the extraction directory
+            add_file(tar, "link/pwned", b"pwned")
+            hard_link = tarfile.TarInfo("passwd")
+            hard_link.type = tarfile.LNKTYPE
+            hard_link.linkname = os.path.join(outside, "target")
+            tar.addfile(hard_link)
+            add_file(tar, "../escaped", b"escaped")
+            add_file(tar, os.path.join(outside, "absolute"), b"absolute")
+
+        text, metadata = load_local_metadata(tarball)
+
+        self.assertIn("A tool.", text)
+        self.assertEqual(os.listdir(outside), [])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, "escaped")))
+
+
+if __name__ == '__main__':
+    unittest.main()
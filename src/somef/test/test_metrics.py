@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from somef.metrics import Metrics, MetricsWriter
+from somef.profiling import Profiler
+
+
+def profile_repository(profiler, name, outcome, cache_hit):
+    profiler.start_repo(name)
+    with profiler.stage("fetch"):
+        profiler.count_http()
+        profiler.count_http()
+        profiler.count_backoff(1.5)
+        profiler.record_rate_limit(4998)
+    with profiler.stage("cache") as stage:
+        stage["hit"] = cache_hit
+    if not cache_hit:
+        with profiler.stage("run_classifiers") as stage:
+            stage["excerpts"] = 7
+            stage["categories"] = 4
+    profiler.end_repo(outcome)
+
+
+class MetricsTest(unittest.TestCase):
+    def test_repositories(self):
+        metrics = Metrics()
+        profiler = Profiler(metrics=metrics)
+        profile_repository(profiler, "a", "described", cache_hit=False)
+        profile_repository(profiler, "b", "described", cache_hit=True)
+        # records of the worker processes
+        worker_profiler = Profiler()
+        profile_repository(worker_profiler, "c", "RequestException", cache_hit=False)
+        profiler.add_repository(worker_profiler.repositories[0])
+
+        lines = metrics.render().splitlines()
+        self.assertIn('somef_repositories_total{outcome="described"} 2', lines)
+        self.assertIn('somef_repositories_total{outcome="RequestException"} 1', lines)
+        self.assertIn("somef_github_requests_total 6", lines)
+        self.assertIn("somef_github_backoffs_total 3", lines)
+        self.assertIn("somef_github_backoff_seconds_total 4.5", lines)
+        self.assertIn("somef_github_rate_limit_remaining 4998", lines)
+        self.assertIn('somef_cache_lookups_total{result="hit"} 1', lines)
+        self.assertIn('somef_cache_lookups_total{result="miss"} 2', lines)
+        self.assertIn("somef_excerpts_classified_total 14", lines)
+        self.assertIn('somef_stage_duration_seconds_count{stage="fetch"} 3', lines)
+        self.assertIn('somef_stage_duration_seconds_bucket{stage="fetch",le="+Inf"} 3', lines)
+        self.assertIn("somef_repository_duration_seconds_count 3", lines)
+        self.assertIn("# TYPE somef_repository_duration_seconds histogram", lines)
+        self.assertEqual(lines[-1], "# EOF")
+
+    def test_histogram_buckets(self):
+        metrics = Metrics()
+        for wall_time in (0.0005, 0.3, 0.3, 1000):
+            metrics.observe_repository({"wall_time": wall_time})
+        lines = metrics.render().splitlines()
+        self.assertIn('somef_repository_duration_seconds_bucket{le="0.001"} 1', lines)
+        self.assertIn('somef_repository_duration_seconds_bucket{le="0.25"} 1', lines)
+        self.assertIn('somef_repository_duration_seconds_bucket{le="0.5"} 3', lines)
+        self.assertIn('somef_repository_duration_seconds_bucket{le="300.0"} 3', lines)
+        self.assertIn('somef_repository_duration_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("somef_repository_duration_seconds_sum 1000.6005", lines)
+
+    def test_writer(self):
+        metrics = Metrics()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            metrics_file = os.path.join(tmp_dir, "somef.prom")
+            writer = MetricsWriter(metrics, metrics_file, interval=60)
+            writer.start()
+            metrics.observe_repository({"outcome": "not_found", "http_calls": 1})
+            # the file is written once more when the writer stops
+            writer.stop()
+            with open(metrics_file) as fh:
+                self.assertIn('somef_repositories_total{outcome="not_found"} 1', fh.read().splitlines())
+            self.assertEqual(os.listdir(tmp_dir), ["somef.prom"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import unittest
+
+from somef.inputs import in_shard, parse_shard, shard_of
+from somef.outputs import merge_output_files, read_output_records
+
+repository_a = {"description": [{"excerpt": "a", "confidence": [1.0], "technique": "metadata"}],
+                "fullName": {"excerpt": "owner/a", "confidence": [1.0], "technique": "metadata"}}
+repository_b = {"fullName": {"excerpt": "owner/b", "confidence": [1.0], "technique": "metadata"}}
+
+
+class Outputs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, file_name, *outputs):
+        file_name = os.path.join(self.tmp_dir.name, file_name)
+        with open(file_name, "w") as fh:
+            if file_name.endswith(".jsonl"):
+                fh.writelines(json.dumps(output) + "\n" for output in outputs)
+            else:
+                json.dump(outputs[0], fh)
+        return file_name
+
+    def read(self, file_name):
+        with open(os.path.join(self.tmp_dir.name, file_name)) as fh:
+            return json.load(fh)
+
+    def test_shards(self):
+        self.assertEqual(parse_shard("1/4"), (1, 4))
+        for shard in ("4/4", "-1/4", "1", "a/b", "0/0"):
+            self.assertRaises(ValueError, parse_shard, shard)
+        urls = [f"https://github.com/owner/repo{i}" for i in range(100)]
+        shards = [[url for url in urls if in_shard(url, (i, 3))] for i in range(3)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(urls))
+        self.assertEqual(shard_of(urls[0], 3), shard_of(urls[0], 3))
+
+    def test_read_output_records(self):
+        self.assertEqual(list(read_output_records(self.write("repo.json", repository_a))), [(None, repository_a)])
+        self.assertEqual(list(read_output_records(self.write("repos.json", [repository_a, repository_b]))),
+                         [(None, repository_a), (None, repository_b)])
+        self.assertEqual(list(read_output_records(self.write("docs.jsonl", {"a.md": repository_a}, {"b.md": {}}))),
+                         [("a.md", repository_a), ("b.md", {})])
+
+    def test_merge_repositories(self):
+        shards = [self.write("shard0.json", [repository_a]), self.write("shard1.jsonl", repository_b)]
+        self.assertEqual(merge_output_files(shards, os.path.join(self.tmp_dir.name, "merged.json")), 2)
+        self.assertEqual(self.read("merged.json"), [repository_a, repository_b])
+
+    def test_merge_documents(self):
+        shards = [self.write("shard0.json", {"b.md": repository_b}), self.write("shard1.jsonl", {"a.md": repository_a})]
+        merge_output_files(shards, os.path.join(self.tmp_dir.name, "merged.json"))
+        self.assertEqual(self.read("merged.json"), {"a.md": repository_a, "b.md": repository_b})
+        self.assertRaises(ValueError, merge_output_files, shards + [self.write("repo.json", repository_a)],
+                          os.path.join(self.tmp_dir.name, "mixed.json"))
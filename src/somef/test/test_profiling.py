@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from somef.profiling import Profiler
+
+
+class Stages(unittest.TestCase):
+    def test_stages_per_repository(self):
+        profiler = Profiler(cprofile_stage="classify")
+        for repo in ("a", "b"):
+            profiler.start_repo(repo)
+            with profiler.stage("fetch") as stage:
+                profiler.count_http()
+                stage["chars"] = 10
+            with profiler.stage("classify"):
+                sum(range(1000))
+            profiler.end_repo()
+        with profiler.stage("generate_graph"):
+            pass
+
+        report = profiler.report()
+        self.assertEqual(report["summary"]["fetch"]["count"], 2)
+        self.assertEqual(report["summary"]["fetch"]["http_calls"], 2)
+        self.assertEqual(report["repositories"][1]["http_calls"], 1)
+        self.assertEqual(report["repositories"][0]["stages"][0]["chars"], 10)
+        self.assertEqual([stage["stage"] for stage in report["stages"]], ["generate_graph"])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_file = os.path.join(tmp_dir, "profile.json")
+            profiler.save(report_file)
+            with open(report_file) as fh:
+                self.assertEqual(json.load(fh)["http_calls"], 2)
+            self.assertTrue(os.path.exists(report_file + ".classify.prof"))
+
+
+    def test_cache_lookups(self):
+        profiler = Profiler()
+        for hit in (True, False, True):
+            worker_profiler = Profiler()
+            worker_profiler.start_repo("a")
+            with worker_profiler.stage("cache") as stage:
+                stage["hit"] = hit
+            worker_profiler.end_repo()
+            # as the records of the worker processes are received
+            profiler.add_repository(worker_profiler.repositories[0])
+        summary = profiler.summary()["cache"]
+        self.assertEqual((summary["count"], summary["hits"], summary["misses"]), (3, 2, 1))
+
+    def test_memory(self):
+        profiler = Profiler(trace_rss=True, trace_allocations=3)
+        self.addCleanup(tracemalloc.stop)
+        kept = []
+        for repo in ("a", "b"):
+            profiler.start_repo(repo)
+            with profiler.stage("allocate") as stage:
+                kept.append([str(index) for index in range(100000)])
+            profiler.end_repo()
+
+        record = profiler.repositories[0]["stages"][0]
+        self.assertGreaterEqual(record["peak_rss"], record["rss"])
+        self.assertLessEqual(len(record["top_allocations"]), 3)
+        self.assertTrue(any(os.path.basename(allocation["location"].rsplit(":", 1)[0]) == "test_profiling.py"
+                            and allocation["size"] > 1000000 for allocation in record["top_allocations"]))
+        self.assertIn("rss", profiler.repositories[1])
+        summary = profiler.summary()["allocate"]
+        self.assertGreaterEqual(summary["peak_rss"], record["peak_rss"])
+        self.assertEqual(summary["top_allocations"][0]["size"],
+                         sum(repository["stages"][0]["top_allocations"][0]["size"]
+                             for repository in profiler.repositories))
+        self.assertEqual(profiler.settings(), {"trace_memory": False, "trace_rss": True, "trace_allocations": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
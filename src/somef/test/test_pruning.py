@@ -0,0 +1,46 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from somef import pruning, training
+from somef.test.test_training import write_corpus
+
+
+class Pruning(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.corpus_dir = os.path.join(self.tmp_dir.name, "corpus")
+        write_corpus(self.corpus_dir)
+        models_dir = os.path.join(self.tmp_dir.name, "models")
+        training.train(self.corpus_dir, models_dir, categories=("installation",), folds=2, negative_ratio=0.5)
+        self.model = os.path.join(models_dir, "installation.sk")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_select_features(self):
+        weights = np.array([0.1, 0.5, 0.3, 0.9])
+        self.assertEqual(pruning.select_features(weights, keep=2).tolist(), [1, 3])
+        self.assertEqual(pruning.select_features(weights, keep=0.75).tolist(), [1, 2, 3])
+        self.assertEqual(pruning.select_features(weights, min_weight=0.3).tolist(), [1, 2, 3])
+        self.assertEqual(pruning.select_features(weights, np.array([5, 1, 5, 1]), min_df=2).tolist(), [0, 2])
+
+    def check_prune(self, refit):
+        output = os.path.join(self.tmp_dir.name, "slim.sk")
+        report = pruning.prune(self.model, self.corpus_dir, "installation", output=output, keep=0.5, refit=refit,
+                               threshold=0.5, negative_ratio=0.5)
+        self.assertLess(report["pruned"]["features"], report["original"]["features"])
+        self.assertLess(report["pruned"]["model_size"], report["original"]["model_size"])
+        with open(output, "rb") as fh:
+            slim = pickle.load(fh)
+        scores = slim.predict_proba(["pip install package100 and its requirements", "the weather was nice"])
+        self.assertGreater(scores[0, 1], scores[1, 1])
+
+    def test_prune(self):
+        self.check_prune(refit=False)
+
+    def test_prune_refit(self):
+        self.check_prune(refit=True)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from somef.result_store import ResultStore
+
+
+def repository(name, installation_confidence):
+    return {
+        "installation": [{"excerpt": "pip install " + name, "confidence": [installation_confidence],
+                          "technique": "classifier"}],
+        "citation": [{"excerpt": "@article{" + name + "}", "confidence": [1.0], "technique": "wordnet"}],
+        "fullName": {"excerpt": "owner/" + name, "confidence": [1.0], "technique": "metadata"},
+        "license": {"excerpt": {"name": "MIT License"}, "confidence": [1.0], "technique": "metadata"},
+        "languages": {"excerpt": ["Python"], "confidence": [1.0], "technique": "metadata"},
+    }
+
+
+class ResultStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ResultStore(os.path.join(self.tmp_dir.name, "results.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_upsert(self):
+        self.store.upsert("https://github.com/owner/a", repository("a", 0.9))
+        self.store.upsert("https://github.com/owner/b", repository("b", 0.5))
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.sources_with("installation", 0.8), ["https://github.com/owner/a"])
+        self.assertEqual(self.store.sources_with("citation"),
+                         ["https://github.com/owner/a", "https://github.com/owner/b"])
+        self.assertEqual(self.store.excerpts("https://github.com/owner/a", "installation"),
+                         [("pip install a", 0.9, "classifier")])
+        row = self.store.connection.execute(
+            "SELECT full_name, license, languages FROM repositories WHERE source = ?", ("https://github.com/owner/a",)
+        ).fetchone()
+        self.assertEqual(row, ("owner/a", "MIT License", '["Python"]'))
+
+        # describing the repository again replaces its rows
+        updated = repository("a", 0.5)
+        del updated["citation"]
+        self.store.upsert("https://github.com/owner/a", updated)
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.sources_with("installation", 0.8), [])
+        self.assertEqual(self.store.sources_with("citation"), ["https://github.com/owner/b"])
+        self.assertEqual(self.store.get("https://github.com/owner/a"), updated)
+
+    def test_remove(self):
+        self.store.upsert("a.md", repository("a", 0.9))
+        self.store.remove("a.md")
+        self.assertIsNone(self.store.get("a.md"))
+        self.assertEqual(self.store.connection.execute("SELECT COUNT(*) FROM excerpts").fetchone()[0], 0)
+        self.assertEqual(self.store.search("pip install"), [])
+
+    def test_search(self):
+        self.store.upsert("https://github.com/owner/a", repository("numpy", 0.9))
+        self.store.upsert("https://github.com/owner/b", repository("numpy scipy numpy", 0.5))
+        self.store.upsert("https://github.com/owner/c", repository("requests", 0.8))
+        hits = self.store.search("numpy")
+        self.assertEqual({(hit[0], hit[1]) for hit in hits},
+                         {("https://github.com/owner/a", "installation"), ("https://github.com/owner/a", "citation"),
+                          ("https://github.com/owner/b", "installation"), ("https://github.com/owner/b", "citation")})
+        self.assertEqual([hit[0] for hit in self.store.search("scipy pip", category="installation")],
+                         ["https://github.com/owner/b"])
+        # punctuation is not read as FTS5 syntax, unless the query is raw
+        self.assertEqual(len(self.store.search("@article{requests}")), 1)
+        self.assertEqual(len(self.store.search("numpy OR requests", category="citation", raw=True)), 3)
+        self.assertEqual(len(self.store.search("numpy", limit=1)), 1)
+
+        # the index follows the updates of the excerpts
+        self.store.upsert("https://github.com/owner/a", repository("pandas", 0.9))
+        self.assertEqual({hit[0] for hit in self.store.search("numpy")}, {"https://github.com/owner/b"})
+        self.assertEqual({hit[0] for hit in self.store.search("pandas")}, {"https://github.com/owner/a"})
+
+    def test_index_existing_database(self):
+        self.store.upsert("https://github.com/owner/a", repository("numpy", 0.9))
+        # a database written before the index existed is indexed when opened
+        self.store.connection.execute("DROP TABLE excerpts_index")
+        self.store.connection.execute("DROP TRIGGER excerpts_insert")
+        self.store.connection.execute("DROP TRIGGER excerpts_delete")
+        self.store.close()
+        self.store = ResultStore(os.path.join(self.tmp_dir.name, "results.db"))
+        self.assertEqual(len(self.store.search("numpy", category="installation")), 1)
+
+    def test_vacuum(self):
+        for name in ("numpy", "scipy", "requests"):
+            self.store.upsert(f"https://github.com/owner/{name}", repository(name, 0.9))
+        self.store.remove("https://github.com/owner/scipy")
+        self.store.connection.execute("VACUUM")
+        # the index still points to the right excerpts
+        self.store.connection.execute("INSERT INTO excerpts_index (excerpts_index) VALUES ('integrity-check')")
+        self.assertEqual([hit[2] for hit in self.store.search("requests", category="installation")],
+                         ["pip install requests"])
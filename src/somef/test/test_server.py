@@ -0,0 +1,115 @@
+import threading
+import unittest
+
+import requests
+
+from somef.server import DescribeServer
+
+
+# describes without the classifiers: "missing" repositories are not found, "broken" ones raise an error,
+# and "slow" ones wait until released
+class FakeDescriber:
+    threshold = 0.8
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.sessions = []
+
+    def describe(self, repo_url=None, readme_text=None, profiler=None, threshold=None, session=None):
+        self.sessions.append(session)
+        profiler.start_repo(repo_url)
+        with profiler.stage("fetch"):
+            if repo_url is not None and "slow" in repo_url:
+                self.released.wait(5)
+        profiler.end_repo("described")
+        if repo_url is not None and "missing" in repo_url:
+            return None
+        if repo_url is not None and "broken" in repo_url:
+            raise KeyError("name")
+        return {"description": [{"excerpt": readme_text or repo_url, "confidence": [threshold],
+                                  "technique": "metadata"}]}
+
+
+class DescribeServerTest(unittest.TestCase):
+    def start(self, max_concurrency=2, queue_timeout=0.1):
+        self.describer = FakeDescriber()
+        server = DescribeServer(("127.0.0.1", 0), self.describer, max_concurrency, queue_timeout)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def test_health(self):
+        url = self.start()
+        self.assertEqual(requests.get(f"{url}/health").json(), {"status": "ok"})
+        self.assertEqual(requests.get(f"{url}/other").status_code, 404)
+
+    def test_describe(self):
+        url = self.start()
+        response = requests.post(f"{url}/describe", json={"readme": "# Tool", "threshold": 0.5})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["result"]["description"][0], {"excerpt": "# Tool", "confidence": [0.5],
+                                                            "technique": "metadata"})
+        self.assertEqual([stage["stage"] for stage in body["timing"]["stages"]], ["fetch"])
+        self.assertIsNotNone(self.describer.sessions[0])
+
+        response = requests.post(f"{url}/describe", json={"repo_url": "https://github.com/owner/missing"})
+        self.assertEqual((response.status_code, response.json()["error"]), (404, "Repository not found"))
+        response = requests.post(f"{url}/describe", json={"repo_url": "https://github.com/owner/broken"})
+        self.assertEqual((response.status_code, response.json()["error"]), (500, "'name'"))
+        self.assertEqual(requests.post(f"{url}/other", json={"readme": "# Tool"}).status_code, 404)
+
+    def test_bad_requests(self):
+        url = self.start()
+        for body in ('{"readme": ', '["readme"]', '{}', '{"readme": "# Tool", "repo_url": "a"}',
+                     '{"readme": "# Tool", "threshold": "high"}', '{"readme": "# Tool", "threshold": 2}'):
+            self.assertEqual(requests.post(f"{url}/describe", data=body).status_code, 400, body)
+        self.assertEqual(self.describer.sessions, [])
+
+    def test_too_many_requests(self):
+        url = self.start(max_concurrency=1)
+        slow = threading.Thread(target=requests.post, args=(f"{url}/describe",),
+                                kwargs={"json": {"repo_url": "https://github.com/owner/slow"}})
+        slow.start()
+        try:
+            while len(self.describer.sessions) == 0:
+                slow.join(0.01)
+            response = requests.post(f"{url}/describe", json={"readme": "# Tool"})
+            self.assertEqual((response.status_code, response.json()["error"]), (503, "Too many concurrent requests"))
+        finally:
+            self.describer.released.set()
+            slow.join()
+        self.assertEqual(requests.post(f"{url}/describe", json={"readme": "# Tool"}).status_code, 200)
+
+    def test_sessions(self):
+        url = self.start(max_concurrency=2)
+        slow = threading.Thread(target=requests.post, args=(f"{url}/describe",),
+                                kwargs={"json": {"repo_url": "https://github.com/owner/slow"}})
+        slow.start()
+        try:
+            while len(self.describer.sessions) == 0:
+                slow.join(0.01)
+            requests.post(f"{url}/describe", json={"readme": "# Tool"})
+        finally:
+            self.describer.released.set()
+            slow.join()
+        # concurrent requests do not share a session, and the sessions are reused
+        self.assertNotEqual(self.describer.sessions[0], self.describer.sessions[1])
+        requests.post(f"{url}/describe", json={"readme": "# Tool"})
+        self.assertIn(self.describer.sessions[2], self.describer.sessions[:2])
+
+    def test_metrics(self):
+        url = self.start()
+        requests.post(f"{url}/describe", json={"readme": "# Tool"})
+        response = requests.get(f"{url}/metrics")
+        self.assertTrue(response.headers["Content-Type"].startswith("application/openmetrics-text"))
+        lines = response.text.splitlines()
+        self.assertIn('somef_repositories_total{outcome="described"} 1', lines)
+        self.assertIn('somef_stage_duration_seconds_count{stage="fetch"} 1', lines)
+        self.assertEqual(lines[-1], "# EOF")
+
+
+if __name__ == '__main__':
+    unittest.main()
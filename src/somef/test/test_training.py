@@ -0,0 +1,94 @@
+import os
+import pickle
+import tempfile
+import types
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from somef import training
+
+texts = {
+    "description": "this library is a tool for the analysis of {} data",
+    "installation": "pip install package{} and its requirements",
+    "invocation": "run python main{}.py --input file",
+    "citation": "@article{{paper{}, title={{A paper}}, author={{Someone}}}}",
+    "none": "the weather was nice on day {}",
+}
+
+
+## Function writes a small corpus, with 40 excerpts of every file
+def write_corpus(corpus_dir):
+    os.makedirs(corpus_dir)
+    for category, text in texts.items():
+        pd.DataFrame({"URL": "https://github.com/owner/repo", "contributor": "somef",
+                      "excerpt": [text.format(i) for i in range(40)]}).to_csv(
+            os.path.join(corpus_dir, f"{category}.csv"), index=False)
+
+
+class Training(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.corpus_dir = os.path.join(self.tmp_dir.name, "corpus")
+        write_corpus(self.corpus_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def check_models(self, output_dir, metrics):
+        for category in training.training_categories:
+            with open(os.path.join(output_dir, f"{category}.sk"), "rb") as fh:
+                model = pickle.load(fh)
+            scores = model.predict_proba([texts[category].format(100), texts["none"].format(100)])
+            self.assertGreater(scores[0, 1], scores[1, 1])
+            self.assertIn("f1", metrics["categories"][category]["cross_validation"])
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "metrics.json")))
+
+    def test_train(self):
+        output_dir = os.path.join(self.tmp_dir.name, "models")
+        metrics = training.train(self.corpus_dir, output_dir, folds=2, negative_ratio=0.5)
+        self.check_models(output_dir, metrics)
+
+    def test_train_streaming(self):
+        output_dir = os.path.join(self.tmp_dir.name, "models")
+        metrics = training.train(self.corpus_dir, output_dir, folds=2, negative_ratio=0.5, streaming=True,
+                                 n_features=2 ** 12, chunk_size=10)
+        self.check_models(output_dir, metrics)
+
+    def test_build_training_set(self):
+        corpus = training.load_corpus(self.corpus_dir)
+        excerpts, labels = training.build_training_set(corpus, "citation", negative_ratio=0.25)
+        self.assertEqual(labels.sum(), 40)
+        self.assertEqual(len(excerpts), 40 + 4 * 10)
+
+    def test_score_counts(self):
+        rng = np.random.RandomState(0)
+        labels, predictions = rng.random_sample(200) < 0.3, rng.random_sample(200) < 0.4
+        counts = training.confusion_counts(labels[:50], predictions[:50]) + \
+            training.confusion_counts(labels[50:], predictions[50:])
+        for metric, value in training.score(labels, predictions).items():
+            self.assertAlmostEqual(training.score_counts(counts)[metric], value)
+        # no positive predictions
+        self.assertEqual(training.score_counts(training.confusion_counts([True, False], [False, False])),
+                         {"accuracy": 0.5, "precision": 0.0, "recall": 0.0, "f1": 0.0})
+
+    def test_streaming_held_out(self):
+        settings = training.TrainingSettings(self.corpus_dir, folds=2, negative_ratio=0.5, streaming=True,
+                                             n_features=2 ** 12, chunk_size=10, epochs=2)
+        row_counts = training.count_rows(self.corpus_dir, 10)
+        model, held_out = training.fit("installation", 1, row_counts, settings)
+        # the left out fold is read as it is scored
+        self.assertIsInstance(held_out, types.GeneratorType)
+        held_out_excerpts = [excerpt for excerpts, _ in held_out for excerpt in excerpts]
+        self.assertTrue(all(training.fold_of(excerpt, 2) == 1 for excerpt in held_out_excerpts))
+        # the samples of the first epoch that are in the fold
+        first_epoch = [excerpt for excerpts, _ in training.stream_training_set(self.corpus_dir, "installation",
+                                                                             row_counts, 0.5, 10, seed=0)
+                       for excerpt in excerpts if training.fold_of(excerpt, 2) == 1]
+        self.assertEqual(held_out_excerpts, first_epoch)
+
+        training.init_worker(row_counts, settings)
+        _, _, result = training.run_task(("installation", 1))
+        self.assertEqual(result["test_samples"], len(first_epoch))
+        self.assertIn("f1", result)
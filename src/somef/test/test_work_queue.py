@@ -0,0 +1,124 @@
+import os
+import tempfile
+import time
+import unittest
+
+import requests
+
+from somef.errors import GithubApiError
+from somef.work_queue import WorkQueue, run_worker, run_workers
+
+
+# describes the repositories without the GitHub API: "missing" repositories are not found, "flaky" ones fail
+# with a connection error and "limited" ones with a GitHub API error the first time, "broken" ones always
+# raise an unexpected error, and "crash" ones kill the worker process
+class FakeDescriber:
+    def __init__(self):
+        self.calls = []
+
+    def describe(self, repo_url):
+        self.calls.append(repo_url)
+        if "missing" in repo_url:
+            return None
+        if "flaky" in repo_url and self.calls.count(repo_url) == 1:
+            raise requests.ConnectionError("connection reset")
+        if "limited" in repo_url and self.calls.count(repo_url) == 1:
+            raise GithubApiError("API rate limit exceeded")
+        if "broken" in repo_url:
+            raise KeyError("name")
+        if "crash" in repo_url:
+            os._exit(1)
+        return {"fullName": {"excerpt": repo_url, "confidence": [1.0], "technique": "metadata"}}
+
+
+class WorkQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.tmp_dir.name, "queue.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lease(self):
+        queue = WorkQueue(self.queue_path, lease_time=60)
+        self.assertEqual(queue.enqueue(["a", "b", "c"]), 3)
+        self.assertEqual(queue.enqueue(["a", "d"]), 1)
+
+        first = queue.lease("worker1", 2)
+        second = queue.lease("worker2", 5)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(sorted(first + second), ["a", "b", "c", "d"])
+        self.assertEqual(queue.lease("worker3"), [])
+
+        self.assertEqual(queue.heartbeat("worker1", first), 2)
+        self.assertEqual(queue.heartbeat("worker2", first), 0)
+        queue.complete("worker1", first[0], {"name": first[0]})
+        self.assertEqual(queue.stats(), {"pending": 0, "leased": 3, "done": 1, "failed": 0})
+        self.assertEqual(list(queue.results()), [(first[0], {"name": first[0]})])
+        queue.close()
+
+    def test_expired_lease(self):
+        queue = WorkQueue(self.queue_path, lease_time=0.05)
+        queue.enqueue(["a"])
+        self.assertEqual(queue.lease("crashed"), ["a"])
+        time.sleep(0.1)
+        self.assertEqual(queue.lease("worker"), ["a"])
+        queue.close()
+
+    def test_crashing_source(self):
+        # a source whose worker dies every time is not leased more than max_attempts times
+        queue = WorkQueue(self.queue_path, lease_time=0.05, max_attempts=2)
+        queue.enqueue(["a"])
+        leases = 0
+        for _ in range(5):
+            leases += len(queue.lease("crashed"))
+            time.sleep(0.1)
+        self.assertEqual(leases, 2)
+        self.assertEqual(queue.stats(), {"pending": 0, "leased": 0, "done": 0, "failed": 1})
+        self.assertEqual(list(queue.failures()), [("a", "The lease expired 2 times")])
+        self.assertEqual(queue.requeue(), 0)
+        queue.close()
+
+    def test_fail(self):
+        queue = WorkQueue(self.queue_path, max_attempts=2)
+        queue.enqueue(["a"])
+        for _ in range(2):
+            self.assertEqual(queue.lease("worker"), ["a"])
+            queue.fail("worker", "a", "error")
+        self.assertEqual(queue.lease("worker"), [])
+        self.assertEqual(list(queue.failures()), [("a", "error")])
+        self.assertEqual(queue.requeue(failed_sources=True), 1)
+        self.assertEqual(queue.lease("worker"), ["a"])
+        queue.close()
+
+    def test_run_worker(self):
+        queue = WorkQueue(self.queue_path)
+        queue.enqueue(["https://github.com/owner/a", "https://github.com/owner/flaky",
+                       "https://github.com/owner/missing"])
+        describer = FakeDescriber()
+        self.assertEqual(run_worker(self.queue_path, describer, "worker", batch_size=2), 2)
+        self.assertEqual(queue.stats(), {"pending": 0, "leased": 0, "done": 2, "failed": 1})
+        self.assertEqual(list(queue.failures()), [("https://github.com/owner/missing", "Repository not found")])
+        queue.close()
+
+    def test_run_worker_errors(self):
+        queue = WorkQueue(self.queue_path, max_attempts=2)
+        queue.enqueue(["https://github.com/owner/limited", "https://github.com/owner/broken",
+                       "https://github.com/owner/a"])
+        describer = FakeDescriber()
+        self.assertEqual(run_worker(self.queue_path, describer, "worker", max_attempts=2), 2)
+        # the unexpected error is retried, and does not stop the worker
+        self.assertEqual(describer.calls.count("https://github.com/owner/broken"), 2)
+        self.assertEqual(describer.calls.count("https://github.com/owner/limited"), 2)
+        self.assertEqual(queue.stats(), {"pending": 0, "leased": 0, "done": 2, "failed": 1})
+        self.assertEqual(list(queue.failures()), [("https://github.com/owner/broken", "KeyError: 'name'")])
+        queue.close()
+
+    def test_crashed_workers(self):
+        queue = WorkQueue(self.queue_path)
+        queue.enqueue(["https://github.com/owner/a", "https://github.com/owner/crash", "https://github.com/owner/b"])
+        crashed = run_workers(self.queue_path, FakeDescriber(), workers=2, lease_time=0.2, max_attempts=1,
+                              poll_interval=0.05)
+        self.assertEqual(crashed, 1)
+        self.assertEqual(queue.stats(), {"pending": 0, "leased": 0, "done": 2, "failed": 1})
+        queue.close()
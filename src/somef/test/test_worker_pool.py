@@ -0,0 +1,97 @@
+import os
+import unittest
+
+from somef.worker_pool import RecyclingPool, WorkerLostError
+
+# memory kept by a worker process, to go over its memory ceiling
+kept = []
+
+
+def process_id(task):
+    return task, os.getpid()
+
+
+def keep_memory(task):
+    kept.append(bytearray(8 * 2 ** 20))
+    return task, os.getpid()
+
+
+def exit_on_two(task):
+    if task == 2:
+        os._exit(3)
+    return task, os.getpid()
+
+
+def fail_on_two(task):
+    if task == 2:
+        raise ValueError("two")
+    return task, os.getpid()
+
+
+def run(pool, tasks, **kwargs):
+    try:
+        return list(pool.imap_unordered(tasks, **kwargs))
+    finally:
+        pool.close()
+        pool.join()
+
+
+class RecyclingPoolTest(unittest.TestCase):
+    def test_without_recycling(self):
+        pool = RecyclingPool(process_id, 2)
+        results = run(pool, range(10))
+        self.assertEqual(sorted(task for task, _ in results), list(range(10)))
+        self.assertLessEqual(len({pid for _, pid in results}), 2)
+        self.assertEqual(pool.recycled, 0)
+
+    def test_max_tasks(self):
+        pool = RecyclingPool(process_id, 1, max_tasks=3)
+        results = run(pool, range(10))
+        self.assertEqual(sorted(task for task, _ in results), list(range(10)))
+        # 10 tasks, 3 per process
+        self.assertEqual(len({pid for _, pid in results}), 4)
+        self.assertEqual(pool.recycled, 3)
+
+        # with several workers, the number of processes depends on how the tasks were spread
+        pool = RecyclingPool(process_id, 2, max_tasks=3)
+        results = run(pool, range(10))
+        self.assertEqual(sorted(task for task, _ in results), list(range(10)))
+        pids = [pid for _, pid in results]
+        self.assertTrue(all(pids.count(pid) <= 3 for pid in pids))
+        self.assertEqual(pool.recycled, sum(pids.count(pid) == 3 for pid in set(pids)))
+
+    def test_max_rss(self):
+        pool = RecyclingPool(keep_memory, 1, max_rss=4 * 2 ** 20)
+        results = run(pool, range(4))
+        # every task goes over the ceiling, so every task has its own process
+        self.assertEqual(len({pid for _, pid in results}), 4)
+        self.assertEqual(pool.recycled, 4)
+
+    def test_lost_worker(self):
+        pool = RecyclingPool(exit_on_two, 2)
+        results = run(pool, range(6), on_lost=lambda task, error: (task, str(error)))
+        self.assertEqual(sorted(task for task, _ in results), list(range(6)))
+        self.assertIn("exited with code 3", dict(results)[2])
+        self.assertEqual(pool.lost, 1)
+
+        pool = RecyclingPool(exit_on_two, 1)
+        with self.assertRaises(WorkerLostError):
+            run(pool, range(6))
+
+    def test_error(self):
+        pool = RecyclingPool(fail_on_two, 2)
+        with self.assertRaisesRegex(ValueError, "two"):
+            run(pool, range(6))
+
+    def test_early_stop(self):
+        pool = RecyclingPool(process_id, 2)
+        results = pool.imap_unordered(range(1000))
+        self.assertEqual(len([next(results) for _ in range(3)]), 3)
+        results.close()
+        pool.terminate()
+        pool.join()
+        self.assertFalse(any(worker.process.is_alive() for worker in pool.workers))
+
+
+if __name__ == '__main__':
+    unittest.main()
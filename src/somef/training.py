@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import pickle
+import random
+import time
+import zlib
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from sklearn.pipeline import Pipeline, make_pipeline
+
+logger = logging.getLogger(__name__)
+
+# the categories a classifier is trained for. The excerpts of none.csv are only used as negative samples
+training_categories = ('description', 'installation', 'invocation', 'citation')
+negative_only_categories = ('none',)
+
+# the logistic loss of SGDClassifier was renamed in scikit-learn 1.1
+sgd_log_loss = "log" if tuple(int(part) for part in sklearn.__version__.split(".")[:2]) < (1, 1) else "log_loss"
+
+
+def corpus_file(corpus_dir, category):
+    return os.path.join(corpus_dir, f"{category}.csv")
+
+
+## Function reads the excerpts of every CSV file of the corpus, once for all the categories
+## Returns a dictionary category -> list of excerpts
+def load_corpus(corpus_dir):
+    corpus = {}
+    for category in training_categories + negative_only_categories:
+        excerpts = pd.read_csv(corpus_file(corpus_dir, category), usecols=["excerpt"])["excerpt"]
+        corpus[category] = excerpts.dropna().astype(str).tolist()
+        logger.info("%s has %d samples", category, len(corpus[category]))
+    return corpus
+
+
+## Function builds the training set of a category: all of its excerpts as positive samples, and a sample of
+## each of the other files (negative_ratio times the number of positive samples) as negative samples
+## Returns the excerpts and the labels
+def build_training_set(corpus, category, negative_ratio=0.25, seed=0):
+    rng = random.Random(f"{seed}:{category}")
+    positives = corpus[category]
+    negative_sample_size = int(len(positives) * negative_ratio)
+    excerpts = list(positives)
+    for other_category, other_excerpts in corpus.items():
+        if other_category != category:
+            excerpts += rng.sample(other_excerpts, min(negative_sample_size, len(other_excerpts)))
+    labels = np.zeros(len(excerpts), dtype=bool)
+    labels[:len(positives)] = True
+    return excerpts, labels
+
+
+## Function assigns an excerpt to a cross validation fold from its content, so that the folds are the same
+## in every process and can be computed while streaming
+def fold_of(excerpt, folds):
+    return zlib.crc32(excerpt.encode("utf-8")) % folds
+
+
+def make_model(n_features=2 ** 20, streaming=False, seed=0):
+    if streaming:
+        return Pipeline([
+            ("hashingvectorizer", HashingVectorizer(n_features=n_features, alternate_sign=False)),
+            ("sgdclassifier", SGDClassifier(loss=sgd_log_loss, random_state=seed)),
+        ])
+    return make_pipeline(TfidfVectorizer(), LogisticRegression(solver='liblinear'))
+
+
+## Function counts the rows of every file of the corpus without loading them
+def count_rows(corpus_dir, chunk_size):
+    return {category: sum(len(chunk) for chunk in pd.read_csv(corpus_file(corpus_dir, category), usecols=["excerpt"],
+                                                              chunksize=chunk_size))
+            for category in training_categories + negative_only_categories}
+
+
+## Function reads the training set of a category in chunks, one chunk of each file at a time, so that
+## the classifier sees positive and negative samples in every batch. Negative samples are kept with the
+## probability that gives negative_ratio times the number of positive samples of each file
+## Yields (excerpts, labels) batches
+def stream_training_set(corpus_dir, category, row_counts, negative_ratio=0.25, chunk_size=10000, seed=0):
+    rng = np.random.RandomState(zlib.crc32(f"{seed}:{category}".encode("utf-8")))
+    readers = {other_category: pd.read_csv(corpus_file(corpus_dir, other_category), usecols=["excerpt"],
+                                           chunksize=chunk_size)
+               for other_category in row_counts}
+    while len(readers) > 0:
+        excerpts, labels = [], []
+        for other_category in list(readers):
+            chunk = next(readers[other_category], None)
+            if chunk is None:
+                del readers[other_category]
+                continue
+            chunk_excerpts = chunk["excerpt"].dropna().astype(str).tolist()
+            if other_category != category:
+                keep_rate = min(1.0, row_counts[category] * negative_ratio / max(row_counts[other_category], 1))
+                chunk_excerpts = [excerpt for excerpt in chunk_excerpts if rng.random_sample() < keep_rate]
+            excerpts += chunk_excerpts
+            labels += [other_category == category] * len(chunk_excerpts)
+        if len(excerpts) > 0:
+            order = rng.permutation(len(excerpts))
+            yield [excerpts[i] for i in order], np.array(labels, dtype=bool)[order]
+
+
+def score(labels, predictions):
+    return {
+        "accuracy": accuracy_score(labels, predictions),
+        "precision": precision_score(labels, predictions),
+        "recall": recall_score(labels, predictions),
+        "f1": f1_score(labels, predictions),
+    }
+
+
+## Function counts the true positives, false positives, false negatives and true negatives of the predictions
+def confusion_counts(labels, predictions):
+    labels, predictions = np.asarray(labels, dtype=bool), np.asarray(predictions, dtype=bool)
+    return np.array([np.sum(labels & predictions), np.sum(~labels & predictions), np.sum(labels & ~predictions),
+                     np.sum(~labels & ~predictions)])
+
+
+## Function computes the metrics of score from the sum of the confusion_counts of several batches
+## (a metric that divides by zero is 0, as in scikit-learn)
+def score_counts(counts):
+    true_positives, false_positives, false_negatives, true_negatives = (int(count) for count in counts)
+
+    def ratio(numerator, denominator):
+        return numerator / denominator if denominator > 0 else 0.0
+
+    return {
+        "accuracy": ratio(true_positives + true_negatives, sum(int(count) for count in counts)),
+        "precision": ratio(true_positives, true_positives + false_positives),
+        "recall": ratio(true_positives, true_positives + false_negatives),
+        "f1": ratio(2 * true_positives, 2 * true_positives + false_positives + false_negatives),
+    }
+
+
+# settings of a training run, shared by the worker processes
+class TrainingSettings:
+    def __init__(self, corpus_dir, folds=5, negative_ratio=0.25, streaming=False, n_features=2 ** 20,
+                 chunk_size=10000, epochs=5, seed=0):
+        self.corpus_dir = corpus_dir
+        self.folds = folds
+        self.negative_ratio = negative_ratio
+        self.streaming = streaming
+        self.n_features = n_features
+        self.chunk_size = chunk_size
+        self.epochs = epochs
+        self.seed = seed
+
+
+# the corpus (or the row counts of the files, when streaming) and the settings of a worker process,
+# set by init_worker
+worker_corpus = None
+worker_settings = None
+
+
+def init_worker(corpus, settings):
+    global worker_corpus, worker_settings
+    worker_corpus = corpus
+    worker_settings = settings
+
+
+## Function fits the model of a category, leaving out the excerpts of one fold (none if fold is None)
+## Returns the model and the (excerpts, labels) batches of the left out fold. When streaming, the batches are
+## read again from the corpus as they are scored, so the left out fold is never kept in memory
+def fit(category, fold, corpus, settings):
+    model = make_model(settings.n_features, settings.streaming, settings.seed)
+    if not settings.streaming:
+        excerpts, labels = build_training_set(corpus, category, settings.negative_ratio, settings.seed)
+        in_fold = np.array([fold is not None and fold_of(excerpt, settings.folds) == fold for excerpt in excerpts],
+                           dtype=bool)
+        model.fit([excerpt for excerpt, held_out in zip(excerpts, in_fold) if not held_out], labels[~in_fold])
+        return model, [([excerpt for excerpt, held_out in zip(excerpts, in_fold) if held_out], labels[in_fold])]
+
+    vectorizer, classifier = model.steps[0][1], model.steps[1][1]
+    for epoch in range(settings.epochs):
+        for excerpts, labels in stream_training_set(settings.corpus_dir, category, corpus, settings.negative_ratio,
+                                                    settings.chunk_size, settings.seed + epoch):
+            if fold is not None:
+                in_fold = np.array([fold_of(excerpt, settings.folds) == fold for excerpt in excerpts], dtype=bool)
+                excerpts = [excerpt for excerpt, held_out in zip(excerpts, in_fold) if not held_out]
+                labels = labels[~in_fold]
+            if len(excerpts) > 0:
+                classifier.partial_fit(vectorizer.transform(excerpts), labels, classes=np.array([False, True]))
+    return model, stream_held_out(category, fold, corpus, settings) if fold is not None else []
+
+
+## Function reads the samples of the first epoch again, and keeps the ones of the left out fold
+## Yields (excerpts, labels) batches
+def stream_held_out(category, fold, row_counts, settings):
+    for excerpts, labels in stream_training_set(settings.corpus_dir, category, row_counts, settings.negative_ratio,
+                                                settings.chunk_size, settings.seed):
+        in_fold = np.array([fold_of(excerpt, settings.folds) == fold for excerpt in excerpts], dtype=bool)
+        yield [excerpt for excerpt, held_out in zip(excerpts, in_fold) if held_out], labels[in_fold]
+
+
+## Function runs one task of the training: a cross validation fold of a category, or the final model
+## (trained with all the samples) if fold is None
+## Returns (category, fold, result)
+def run_task(task):
+    category, fold = task
+    start = time.perf_counter()
+    model, held_out = fit(category, fold, worker_corpus, worker_settings)
+    fit_time = time.perf_counter() - start
+    if fold is None:
+        return category, fold, {"model": model, "fit_time": fit_time}
+    start = time.perf_counter()
+    # the left out fold is scored batch by batch
+    counts = np.zeros(4, dtype=int)
+    for excerpts, labels in held_out:
+        if len(excerpts) > 0:
+            counts += confusion_counts(labels, model.predict(excerpts))
+    test_samples = int(counts.sum())
+    result = score_counts(counts) if test_samples > 0 else {}
+    result.update({"fit_time": fit_time, "score_time": time.perf_counter() - start, "test_samples": test_samples})
+    return category, fold, result
+
+
+## Function summarizes the cross validation folds of a category with the mean and standard deviation
+def summarize_folds(fold_results):
+    summary = {}
+    for metric in ("accuracy", "precision", "recall", "f1", "fit_time", "score_time"):
+        values = [result[metric] for result in fold_results if metric in result]
+        if len(values) > 0:
+            summary[metric] = {"mean": float(np.mean(values)), "std": float(np.std(values))}
+    return summary
+
+
+## Function trains the classifiers of all the categories, with the cross validation folds and the final
+## models of every category run in parallel by a pool of worker processes. The corpus is read once, or
+## streamed in chunks (with a hashing vectorizer and a classifier trained incrementally) if streaming is True.
+## The models are saved as output_dir/<category>.sk, which can be used in config.json, and the metrics as
+## output_dir/metrics.json
+## Returns the metrics
+def train(corpus_dir, output_dir, categories=training_categories, workers=1, folds=5, negative_ratio=0.25,
+          streaming=False, n_features=2 ** 20, chunk_size=10000, epochs=5, seed=0):
+    settings = TrainingSettings(corpus_dir, folds, negative_ratio, streaming, n_features, chunk_size, epochs, seed)
+    start = time.perf_counter()
+    if streaming:
+        corpus = count_rows(corpus_dir, chunk_size)
+    else:
+        corpus = load_corpus(corpus_dir)
+    load_time = time.perf_counter() - start
+
+    tasks = [(category, fold) for category in categories for fold in list(range(folds)) + [None]]
+    logger.info("Training %d categories with %d cross validation folds in %d processes", len(categories), folds,
+                workers)
+    if workers > 1:
+        pool = Pool(workers, initializer=init_worker, initargs=(corpus, settings))
+        results = pool.imap_unordered(run_task, tasks)
+    else:
+        pool = None
+        init_worker(corpus, settings)
+        results = map(run_task, tasks)
+
+    fold_results = {category: [] for category in categories}
+    metrics = {"corpus": corpus_dir, "streaming": streaming, "folds": folds, "workers": workers,
+               "load_time": load_time, "categories": {}}
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        for category, fold, result in results:
+            if fold is not None:
+                fold_results[category].append(result)
+                continue
+            model_file = os.path.join(output_dir, f"{category}.sk")
+            logger.info("Saving model of %s to %s", category, model_file)
+            with open(model_file, "wb") as fh:
+                pickle.dump(result["model"], fh)
+            metrics["categories"][category] = {"model": model_file, "fit_time": result["fit_time"],
+                                               "model_size": os.path.getsize(model_file)}
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    for category in categories:
+        metrics["categories"][category]["cross_validation"] = summarize_folds(fold_results[category])
+    metrics["total_time"] = time.perf_counter() - start
+    metrics_file = os.path.join(output_dir, "metrics.json")
+    logger.info("Saving training metrics to %s", metrics_file)
+    with open(metrics_file, "w") as fh:
+        json.dump(metrics, fh, indent=2)
+    return metrics
@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from multiprocessing import Process
+
+import requests
+
+from somef.errors import GithubApiError, SomefError
+
+logger = logging.getLogger(__name__)
+
+pending = "pending"
+leased = "leased"
+done = "done"
+failed = "failed"
+
+
+# queue of the repositories of a batch, in a SQLite database that the workers of every node can open.
+# A worker leases repositories for lease_time seconds and renews the lease (heartbeat) while it describes
+# them. The leases of crashed workers expire, and their repositories are leased again by other workers.
+# A repository that fails max_attempts times is not leased anymore
+class WorkQueue:
+    def __init__(self, queue_path, lease_time=300, max_attempts=3):
+        self.queue_path = queue_path
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        # transactions are started explicitly, so that a lease is taken by a single worker
+        self.connection = sqlite3.connect(queue_path, timeout=60, isolation_level=None)
+        # not WAL: its shared memory index only works for processes of the same host, and the queue is shared
+        # by the workers of several machines
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks (source TEXT PRIMARY KEY, state TEXT NOT NULL, worker TEXT, "
+            "lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, updated REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_expires)")
+
+    def transaction(self):
+        return Transaction(self.connection)
+
+    ## Function adds the sources to the queue. Sources already in the queue are left as they are
+    ## Returns the number of sources added
+    def enqueue(self, sources):
+        with self.transaction():
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO tasks (source, state, updated) VALUES (?, ?, ?)",
+                ((source, pending, time.time()) for source in sources)
+            )
+            return self.connection.total_changes - before
+
+    # marks as failed the sources whose lease expired max_attempts times (e.g. because they crash their worker
+    # every time), so that they are not leased forever. Runs inside a transaction
+    def fail_expired(self, now):
+        self.connection.execute(
+            "UPDATE tasks SET state = ?, error = ?, updated = ? WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+            (failed, f"The lease expired {self.max_attempts} times", now, leased, now, self.max_attempts)
+        )
+
+    ## Function leases up to count sources to the worker: pending ones, or leased ones whose lease expired
+    ## and that did not reach max_attempts
+    ## Returns the list of sources leased
+    def lease(self, worker, count=1):
+        now = time.time()
+        with self.transaction():
+            self.fail_expired(now)
+            sources = [source for (source,) in self.connection.execute(
+                "SELECT source FROM tasks WHERE state = ? OR (state = ? AND lease_expires < ? AND attempts < ?) "
+                "LIMIT ?",
+                (pending, leased, now, self.max_attempts, count)
+            )]
+            self.connection.executemany(
+                "UPDATE tasks SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                "WHERE source = ?",
+                ((leased, worker, now + self.lease_time, now, source) for source in sources)
+            )
+        return sources
+
+    ## Function renews the leases of the sources that the worker still holds
+    ## Returns the number of leases renewed
+    def heartbeat(self, worker, sources):
+        now = time.time()
+        with self.transaction():
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE source = ? AND state = ? AND worker = ?",
+                ((now + self.lease_time, now, source, leased, worker) for source in sources)
+            )
+            return self.connection.total_changes - before
+
+    ## Function stores the result of a source. If the lease expired and the source was leased again,
+    ## the first result is kept
+    def complete(self, worker, source, result):
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE tasks SET state = ?, worker = ?, result = ?, error = NULL, updated = ? "
+                "WHERE source = ? AND state != ?",
+                (done, worker, json.dumps(result), time.time(), source, done)
+            )
+
+    ## Function records the failure of a source, which is leased again if it can be retried and it
+    ## did not reach max_attempts
+    def fail(self, worker, source, error, retry=True):
+        with self.transaction():
+            (attempts,) = self.connection.execute("SELECT attempts FROM tasks WHERE source = ?", (source,)).fetchone()
+            state = pending if retry and attempts < self.max_attempts else failed
+            self.connection.execute(
+                "UPDATE tasks SET state = ?, worker = ?, error = ?, updated = ? WHERE source = ? AND state != ?",
+                (state, worker, str(error), time.time(), source, done)
+            )
+
+    ## Function puts the sources with an expired lease, and the failed ones if failed is True, back in the queue
+    ## Returns the number of sources put back
+    def requeue(self, failed_sources=False):
+        now = time.time()
+        with self.transaction():
+            self.fail_expired(now)
+            before = self.connection.total_changes
+            self.connection.execute("UPDATE tasks SET state = ? WHERE state = ? AND lease_expires < ?",
+                                    (pending, leased, now))
+            if failed_sources:
+                self.connection.execute("UPDATE tasks SET state = ?, attempts = 0 WHERE state = ?", (pending, failed))
+            return self.connection.total_changes - before
+
+    ## Function counts the sources in each state
+    def stats(self):
+        counts = {pending: 0, leased: 0, done: 0, failed: 0}
+        for state, count in self.connection.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"):
+            counts[state] = count
+        return counts
+
+    ## Function yields the (source, result) pairs of the sources that are done
+    def results(self):
+        for source, result in self.connection.execute(
+                "SELECT source, result FROM tasks WHERE state = ? ORDER BY source", (done,)):
+            yield source, json.loads(result)
+
+    ## Function yields the (source, error) pairs of the sources that failed
+    def failures(self):
+        yield from self.connection.execute("SELECT source, error FROM tasks WHERE state = ? ORDER BY source",
+                                           (failed,))
+
+    def close(self):
+        self.connection.close()
+
+
+# BEGIN IMMEDIATE ... COMMIT, so that two workers never read the same pending sources
+class Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# renews the leases of the sources being described in a background thread, with its own connection
+class Heartbeat(threading.Thread):
+    def __init__(self, queue_path, lease_time, worker, sources):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.lease_time = lease_time
+        self.worker = worker
+        self.sources = sources
+        self.stopped = threading.Event()
+
+    def run(self):
+        queue = WorkQueue(self.queue_path, self.lease_time)
+        try:
+            while not self.stopped.wait(self.lease_time / 3):
+                queue.heartbeat(self.worker, self.sources)
+        finally:
+            queue.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+## Function leases repositories from the queue and describes them until the queue is finished. When there is
+## nothing to lease but other workers still hold leases, it waits, in case their leases expire
+## Returns the number of repositories described
+def run_worker(queue_path, describer, worker=None, batch_size=1, lease_time=300, max_attempts=3, poll_interval=5):
+    if worker is None:
+        worker = default_worker_id()
+    queue = WorkQueue(queue_path, lease_time, max_attempts)
+    described = 0
+    try:
+        while True:
+            sources = queue.lease(worker, batch_size)
+            if len(sources) == 0:
+                if queue.stats()[leased] == 0:
+                    break
+                time.sleep(poll_interval)
+                continue
+            heartbeat = Heartbeat(queue_path, lease_time, worker, sources)
+            heartbeat.start()
+            try:
+                for source in sources:
+                    try:
+                        result = describer.describe(repo_url=source)
+                    except (requests.RequestException, GithubApiError) as error:
+                        # network and GitHub API errors are transient, the repository is tried again
+                        logger.error("Error describing %s: %s", source, error)
+                        queue.fail(worker, source, error)
+                        continue
+                    except SomefError as error:
+                        logger.error("Error describing %s: %s", source, error)
+                        queue.fail(worker, source, error, retry=False)
+                        continue
+                    except Exception as error:
+                        # an unexpected error only loses this repository, after max_attempts attempts
+                        logger.exception("Error describing %s", source)
+                        queue.fail(worker, source, f"{type(error).__name__}: {error}")
+                        continue
+                    if result is None:
+                        queue.fail(worker, source, "Repository not found", retry=False)
+                    else:
+                        queue.complete(worker, source, result)
+                        described += 1
+            finally:
+                heartbeat.stop()
+    finally:
+        queue.close()
+    logger.info("Worker %s described %d repositories", worker, described)
+    return described
+
+
+## Function runs several workers in this node, one per process
+## Returns the number of worker processes that crashed
+def run_workers(queue_path, describer, workers=1, worker=None, **kwargs):
+    if workers == 1:
+        run_worker(queue_path, describer, worker, **kwargs)
+        return 0
+    processes = [Process(target=run_worker, args=(queue_path, describer, f"{worker}-{index}" if worker else None),
+                         kwargs=kwargs)
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    crashed = 0
+    for process in processes:
+        process.join()
+        if process.exitcode != 0:
+            logger.error("Worker process %d exited with code %s", process.pid, process.exitcode)
+            crashed += 1
+    return crashed
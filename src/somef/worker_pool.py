@@ -0,0 +1,147 @@
+import logging
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+from somef.profiling import private_memory
+
+logger = logging.getLogger(__name__)
+
+
+# error of a task whose worker process died (e.g. killed by the out of memory killer) before answering
+class WorkerLostError(Exception):
+    pass
+
+
+## Function runs the tasks sent by the pool until it is told to stop, or until it has to be recycled: after
+## max_tasks tasks, or after a task that leaves its private memory (the resident memory that is not shared with
+## the parent process) over max_rss bytes. The memory is only checked between tasks, so a task can go over it
+def worker_loop(connection, func, initializer, initargs, max_tasks, max_rss):
+    if initializer is not None:
+        initializer(*initargs)
+    completed = 0
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        try:
+            message = ("result", func(task))
+        except Exception as error:
+            message = ("error", error)
+        completed += 1
+        recycle = None
+        if max_tasks is not None and completed >= max_tasks:
+            recycle = f"after {completed} tasks"
+        elif max_rss is not None:
+            memory = private_memory()
+            if memory > max_rss:
+                recycle = f"with {memory / 2 ** 20:.0f} MiB of private memory after {completed} tasks"
+        connection.send(message + (recycle,))
+        if recycle is not None:
+            break
+    connection.close()
+
+
+class Worker:
+    def __init__(self, pool):
+        self.connection, child_connection = Pipe()
+        self.process = Process(target=worker_loop, daemon=True,
+                               args=(child_connection, pool.func, pool.initializer, pool.initargs, pool.max_tasks,
+                                     pool.max_rss))
+        self.process.start()
+        child_connection.close()
+        self.task = None
+
+
+# pool of worker processes that are replaced (recycled) after max_tasks tasks, or when their private memory
+# is over max_rss bytes after a task, so that the memory that a long batch fragments is given back to the
+# system. A worker that dies is replaced too. Each worker runs one task at a time, so tasks are read from the
+# iterable only when a worker is free. Used like multiprocessing.Pool.imap_unordered, closed with close()
+# (or terminate()) and join()
+class RecyclingPool:
+    def __init__(self, func, workers, initializer=None, initargs=(), max_tasks=None, max_rss=None):
+        self.func = func
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+        self.workers = [Worker(self) for _ in range(workers)]
+        self.recycled = 0
+        self.lost = 0
+
+    def replace(self, worker):
+        worker.connection.close()
+        worker.process.join()
+        self.workers.remove(worker)
+        new_worker = Worker(self)
+        self.workers.append(new_worker)
+        return new_worker
+
+    ## Function runs func on every task. The error raised by a task is raised again here. If the worker of a task
+    ## dies, the task gives on_lost(task, error) if on_lost is given, otherwise WorkerLostError is raised
+    ## Yields the results as soon as they are finished
+    def imap_unordered(self, tasks, on_lost=None):
+        tasks = iter(tasks)
+        idle = list(self.workers)
+        exhausted = False
+        while True:
+            while len(idle) > 0 and not exhausted:
+                try:
+                    task = next(tasks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                worker = idle.pop()
+                if not worker.process.is_alive():
+                    worker = self.replace(worker)
+                worker.task = task
+                worker.connection.send(task)
+            busy = [worker for worker in self.workers if worker.task is not None]
+            if len(busy) == 0:
+                break
+            ready = wait([worker.connection for worker in busy] + [worker.process.sentinel for worker in busy])
+            for worker in busy:
+                if worker.connection not in ready and worker.process.sentinel not in ready:
+                    continue
+                task, worker.task = worker.task, None
+                try:
+                    # a recycled worker exits right after sending its result, so the result is read first
+                    kind, value, recycle = worker.connection.recv()
+                except (EOFError, OSError):
+                    self.lost += 1
+                    worker.process.join()
+                    error = WorkerLostError(f"Worker {worker.process.pid} exited with code "
+                                            f"{worker.process.exitcode}")
+                    logger.error("%s, replacing it", error)
+                    idle.append(self.replace(worker))
+                    if on_lost is None:
+                        raise error
+                    yield on_lost(task, error)
+                    continue
+                if recycle is not None:
+                    self.recycled += 1
+                    logger.info("Recycling worker %d %s", worker.process.pid, recycle)
+                    worker = self.replace(worker)
+                idle.append(worker)
+                if kind == "error":
+                    raise value
+                yield value
+
+    ## Function tells the workers to exit once they are done
+    def close(self):
+        for worker in self.workers:
+            try:
+                worker.connection.send(None)
+            except OSError:
+                pass
+
+    def terminate(self):
+        for worker in self.workers:
+            worker.process.terminate()
+
+    def join(self):
+        for worker in self.workers:
+            worker.process.join()
+            worker.connection.close()